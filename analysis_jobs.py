@@ -0,0 +1,327 @@
+"""
+SQLite-backed queue of analysis jobs run by a bounded worker pool
+
+Full LLM analyses of long documents can take longer than a client wants to
+hold a request open. POST /api/analyze/jobs stores the job in the
+analysis_jobs table and returns its id at once. The pool runs it, and the
+client polls GET /api/analyze/jobs/<id> or follows its events stream.
+
+- Lanes: interactive jobs are taken before batch ones. With more than one
+  worker, the last worker takes batch jobs first, so a steady stream of
+  interactive work cannot starve the batch lane.
+- Retries: a handler that raises is run again after retry_delay *
+  2**(attempt - 1) seconds, up to max_attempts attempts in total.
+- Restarts: a claimed job holds a lease of lease_seconds, renewed every
+  third of that while its handler runs. A job whose worker died is queued
+  again once the lease runs out, and the crashed attempt counts towards
+  max_attempts. An attempt that finds its lease taken over (status or
+  attempts changed) discards its outcome instead of overwriting the newer
+  attempt's.
+- TTL: finished jobs are deleted result_ttl seconds after they finish.
+
+Every server process runs its own workers against the shared table. A job
+is claimed in a write transaction, so it runs in exactly one of them.
+Handlers take the job's payload dict and return a JSON-serializable
+result.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+LANES = ('interactive', 'batch')
+MAINTENANCE_INTERVAL = 30.0
+
+_JOB_COLUMNS = 'id, kind, lane, status, attempts, max_attempts, result, error, created_at, started_at, finished_at'
+
+
+def create_job_queue(cursor):
+    """Job table and the index workers claim from"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            lane TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            run_after REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            lease_expires REAL,
+            expires_at REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_jobs_claim ON analysis_jobs (status, lane, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_jobs_expiry ON analysis_jobs (expires_at) WHERE expires_at IS NOT NULL')
+
+
+def _job_dict(row):
+    job = dict(zip([column.strip() for column in _JOB_COLUMNS.split(',')], row))
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+
+class JobQueue:
+    """Analysis jobs in SQLite, run by `workers` daemon threads"""
+
+    def __init__(self, db_path, handlers, workers=4, max_attempts=3, retry_delay=5.0,
+                 lease_seconds=300.0, result_ttl=86400.0, poll_interval=1.0):
+        self.db_path = db_path
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = {}
+        self._last_maintenance = 0.0
+        self._stats = {lane: {'submitted_total': 0, 'succeeded_total': 0, 'failed_total': 0,
+                              'retried_total': 0, 'run_seconds_total': 0.0}
+                       for lane in LANES}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA busy_timeout = 30000')
+        return conn
+
+    def submit(self, kind, payload, lane='interactive'):
+        """Store a job and wake a worker; returns the job id"""
+        conn = self._connect()
+        try:
+            job_id = self.add(conn.cursor(), kind, payload, lane)
+            conn.commit()
+        finally:
+            conn.close()
+        self.wake()
+        return job_id
+
+    def add(self, cursor, kind, payload, lane='interactive'):
+        """Queue a job in the caller's transaction; returns the job id
+
+        Call wake() once the transaction has committed.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+        if lane not in LANES:
+            raise ValueError(f"lane must be one of {', '.join(LANES)}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        cursor.execute('''
+            INSERT INTO analysis_jobs (id, kind, lane, payload, max_attempts, created_at, run_after)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (job_id, kind, lane, json.dumps(payload), self.max_attempts, now, now))
+        with self._lock:
+            self._stats[lane]['submitted_total'] += 1
+        return job_id
+
+    def wake(self):
+        """Start the workers if needed and have one look for work now"""
+        self.start()
+        with self._ready:
+            self._ready.notify()
+
+    def get(self, job_id):
+        """The job's status and result, or None if unknown or expired"""
+        conn = self._connect()
+        try:
+            row = conn.execute(f'''
+                SELECT {_JOB_COLUMNS} FROM analysis_jobs
+                WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)
+            ''', (job_id, time.time())).fetchone()
+        finally:
+            conn.close()
+        return _job_dict(row) if row else None
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                # The last worker looks at the batch lane first
+                lanes = LANES[::-1] if self.workers > 1 and index == self.workers - 1 else LANES
+                thread = threading.Thread(target=self._run, args=(lanes,), name=f'analysis-worker-{index}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            thread = threading.Thread(target=self._renew_leases, name='analysis-leases', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+
+    def metrics(self):
+        with self._lock:
+            stats = {lane: dict(counts) for lane, counts in self._stats.items()}
+        conn = self._connect()
+        try:
+            for lane, status, count in conn.execute('''
+                SELECT lane, status, COUNT(*) FROM analysis_jobs
+                WHERE status IN ('queued', 'running') GROUP BY lane, status
+            '''):
+                if lane in stats:
+                    stats[lane][status] = count
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+        stats['workers'] = self.workers
+        return stats
+
+    def _run(self, lanes):
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                job = None
+                try:
+                    self._maintain(conn)
+                    job = self.claim(conn, lanes)
+                    if job is not None:
+                        self._execute(conn, *job)
+                except sqlite3.Error as e:
+                    # A job left running is picked up again when its lease expires
+                    print(f"Analysis job queue error: {e}")
+                if job is None:
+                    with self._ready:
+                        self._ready.wait(self.poll_interval)
+        finally:
+            conn.close()
+
+    def _renew_leases(self):
+        """Extend the leases of the jobs this process is running"""
+        interval = self.lease_seconds / 3
+        conn = self._connect()
+        try:
+            while not self._stop.wait(interval):
+                with self._lock:
+                    running = list(self._running.items())
+                if not running:
+                    continue
+                try:
+                    conn.executemany('''
+                        UPDATE analysis_jobs SET lease_expires = ?
+                        WHERE id = ? AND status = 'running' AND attempts = ?
+                    ''', [(time.time() + self.lease_seconds, job_id, attempt) for job_id, attempt in running])
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    print(f"Analysis job lease renewal error: {e}")
+        finally:
+            conn.close()
+
+    def claim(self, conn, lanes=LANES):
+        """Take the oldest runnable job, trying lanes in order
+
+        Returns (job_id, kind, lane, payload, attempt) or None.
+        """
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for lane in lanes:
+                row = conn.execute('''
+                    SELECT id, kind, payload, attempts FROM analysis_jobs
+                    WHERE status = 'queued' AND lane = ? AND run_after <= ?
+                    ORDER BY created_at LIMIT 1
+                ''', (lane, now)).fetchone()
+                if row is not None:
+                    conn.execute('''
+                        UPDATE analysis_jobs
+                        SET status = 'running', attempts = attempts + 1, started_at = ?, lease_expires = ?
+                        WHERE id = ?
+                    ''', (now, now + self.lease_seconds, row[0]))
+                    conn.commit()
+                    return row[0], row[1], lane, json.loads(row[2]), row[3] + 1
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return None
+
+    def _execute(self, conn, job_id, kind, lane, payload, attempt):
+        started = time.perf_counter()
+        with self._lock:
+            self._running[job_id] = attempt
+        try:
+            result = json.dumps(self.handlers[kind](payload))
+        except Exception as e:
+            print(f"Analysis job {job_id} ({kind}) attempt {attempt} failed: {e}")
+            self._record_failure(conn, job_id, lane, attempt, f'{type(e).__name__}: {e}')
+        else:
+            now = time.time()
+            if self._write(conn, '''
+                UPDATE analysis_jobs
+                SET status = 'succeeded', result = ?, error = NULL, finished_at = ?, lease_expires = NULL, expires_at = ?
+                WHERE id = ? AND status = 'running' AND attempts = ?
+            ''', (result, now, now + self.result_ttl, job_id, attempt)):
+                self._count(lane, 'succeeded_total')
+            else:
+                print(f"Analysis job {job_id} attempt {attempt} lost its lease; result discarded")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+                self._stats[lane]['run_seconds_total'] += time.perf_counter() - started
+
+    def _record_failure(self, conn, job_id, lane, attempt, error):
+        now = time.time()
+        row = conn.execute('SELECT max_attempts FROM analysis_jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is not None and attempt < row[0]:
+            outcome = 'retried_total'
+            updated = self._write(conn, '''
+                UPDATE analysis_jobs SET status = 'queued', error = ?, run_after = ?, lease_expires = NULL
+                WHERE id = ? AND status = 'running' AND attempts = ?
+            ''', (error, now + self.retry_delay * 2 ** (attempt - 1), job_id, attempt))
+        else:
+            outcome = 'failed_total'
+            updated = self._write(conn, '''
+                UPDATE analysis_jobs
+                SET status = 'failed', error = ?, finished_at = ?, lease_expires = NULL, expires_at = ?
+                WHERE id = ? AND status = 'running' AND attempts = ?
+            ''', (error, now, now + self.result_ttl, job_id, attempt))
+        if updated:
+            self._count(lane, outcome)
+        else:
+            print(f"Analysis job {job_id} attempt {attempt} lost its lease; failure discarded")
+
+    def _maintain(self, conn):
+        """Requeue jobs whose worker died and delete expired results"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_maintenance < MAINTENANCE_INTERVAL:
+                return
+            self._last_maintenance = now
+        self._write(conn, '''
+            UPDATE analysis_jobs
+            SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                error = 'Worker stopped before the job finished',
+                finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END,
+                expires_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END,
+                lease_expires = NULL
+            WHERE status = 'running' AND lease_expires <= ?
+        ''', (now, now + self.result_ttl, now))
+        self._write(conn, 'DELETE FROM analysis_jobs WHERE expires_at <= ?', (now,))
+
+    def _write(self, conn, sql, params):
+        """Run one statement in its own transaction; returns the rows changed"""
+        try:
+            changed = conn.execute(sql, params).rowcount
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return changed
+
+    def _count(self, lane, outcome):
+        with self._lock:
+            self._stats[lane][outcome] += 1
@@ -1,19 +1,45 @@
 from flask import Flask, render_template, request, jsonify, session
 import sqlite3
 import os
+import sys
+import tempfile
 from datetime import datetime, timedelta
 import random
 import math
-from geopy.distance import geodesic
+import numpy as np
 from openai import OpenAI
 import json
 import requests
 from bs4 import BeautifulSoup
 import re
 
+# Shared modules live in the project root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from geo_distance import ACCURACY_MODES, DEFAULT_ACCURACY, distances_km, nearest_within_radius, parse_coordinates
+from report_tiles import add_report_to_grid, get_tile_clusters, is_valid_tile
+from report_store import store_from_env
+from report_listing import list_reports, parse_listing_args
+from report_stats import get_stats
+from reverse_geocoder import get_gazetteer
+from http_caching import cache_control, init_http_caching
+from assets import init_assets
+from rate_limit import init_rate_limits, rate_limit
+
 # Initialize Flask app for Vercel
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'civic-lens-solutions-2025-secret-key')
+init_http_caching(app)
+init_assets(app, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sw.js'))
+init_rate_limits(app)
+
+# GeoNames cities file for offline reverse geocoding
+GAZETTEER_PATH = os.environ.get(
+    'GAZETTEER_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cities15000.txt')
+)
+# Serverless deploys have no build step and a read-only bundle, so a missing
+# gazetteer is downloaded into the temp dir on first use instead
+GAZETTEER_FETCH_PATH = os.path.join(tempfile.gettempdir(), 'cities15000.txt')
 
 # DeepSeek API Configuration
 deepseek_api_key = os.environ.get('DEEPSEEK_API_KEY', 'sk-0c6cc3046e3a4d0a8c16442cc4796e08')
@@ -22,52 +48,15 @@ deepseek_client = OpenAI(
     base_url="https://api.deepseek.com"
 )
 
-# Database initialization for Vercel (using in-memory SQLite for serverless)
-def init_db():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect(':memory:')  # In-memory database for serverless
-    cursor = conn.cursor()
-    
-    # Create reports table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            url TEXT,
-            report_type TEXT NOT NULL,
-            location TEXT,
-            latitude REAL,
-            longitude REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            credibility_score INTEGER DEFAULT 0,
-            user_ip TEXT
-        )
-    ''')
-    
-    # Insert sample data for demonstration
-    sample_reports = [
-        ("Traffic Disruption Downtown", "Major road closure affecting commuter routes", "https://example.com/traffic", "critical_event", "Downtown Area", 40.7128, -74.0060, datetime.now().isoformat(), 85, "127.0.0.1"),
-        ("Weather Alert Issued", "Severe weather warning for metropolitan area", "https://example.com/weather", "critical_event", "Metro Area", 40.7589, -73.9851, datetime.now().isoformat(), 92, "127.0.0.1"),
-        ("Community Safety Notice", "Enhanced security measures in downtown district", "https://example.com/safety", "critical_event", "Downtown", 40.7505, -73.9934, datetime.now().isoformat(), 78, "127.0.0.1")
-    ]
-    
-    cursor.executemany('''
-        INSERT INTO reports (title, content, url, report_type, location, latitude, longitude, timestamp, credibility_score, user_ip)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', sample_reports)
-    
-    conn.commit()
-    return conn
-
-# Global database connection (will be recreated for each request in serverless)
-db_conn = None
+# Report storage: in-memory, a volume-backed file or a memory-mapped
+# snapshot (REPORTS_STORE). Module state, so warm invocations reuse it.
+report_store = store_from_env(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'reports_snapshot.db'),
+    os.path.join(tempfile.gettempdir(), 'reports.db')
+)
 
-def get_db():
-    global db_conn
-    if db_conn is None:
-        db_conn = init_db()
-    return db_conn
+def get_db(write=False):
+    return report_store.connection(write)
 
 # Sample news data for Vercel deployment
 def get_sample_news_articles():
@@ -206,6 +195,7 @@ def map_page():
     return render_template('map.html')
 
 @app.route('/chat', methods=['POST'])
+@rate_limit('llm')
 def chat():
     try:
         data = request.json
@@ -279,19 +269,25 @@ def chat():
         return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
 
 @app.route('/submit-report', methods=['POST'])
+@rate_limit('write')
 def submit_report():
+    data = request.json or {}
+    
+    # Validate required fields
+    required_fields = ['title', 'content', 'type']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({'error': f'{field} is required'}), 400
+    
+    # Coordinates are checked before anything touches the shared connection
+    try:
+        latitude, longitude = parse_coordinates(data.get('latitude'), data.get('longitude'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db(write=True)
+    cursor = conn.cursor()
     try:
-        data = request.json
-        
-        # Validate required fields
-        required_fields = ['title', 'content', 'type']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        
         # Get user IP
         user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
         
@@ -305,13 +301,17 @@ def submit_report():
             data.get('url', ''),
             data['type'],
             data.get('location', ''),
-            data.get('latitude'),
-            data.get('longitude'),
+            latitude,
+            longitude,
             user_ip
         ))
+        report_id = cursor.lastrowid
+        if latitude is not None:
+            # The grid must count the score the table stored (its column default)
+            cursor.execute('SELECT credibility_score FROM reports WHERE id = ?', (report_id,))
+            add_report_to_grid(cursor, latitude, longitude, data['type'], cursor.fetchone()[0])
         
         conn.commit()
-        report_id = cursor.lastrowid
         
         return jsonify({
             'success': True,
@@ -320,48 +320,116 @@ def submit_report():
         })
         
     except Exception as e:
+        # The connection is shared across requests; never leave a half-written report behind
+        conn.rollback()
         return jsonify({'error': f'Failed to submit report: {str(e)}'}), 500
 
 @app.route('/recent-reports', methods=['GET'])
+@app.route('/api/recent-reports', methods=['GET'])
 def get_recent_reports():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
+        try:
+            options = parse_listing_args(request.args, default_limit=10)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        cursor.execute('''
-            SELECT title, content, report_type, location, timestamp, credibility_score
-            FROM reports
-            ORDER BY timestamp DESC
-            LIMIT 10
-        ''')
+        conn = get_db()
+        rows, next_cursor = list_reports(conn.cursor(), preview_chars=100, **options)
         
         reports = []
-        for row in cursor.fetchall():
+        for row in rows:
             reports.append({
-                'title': row[0],
-                'content': row[1][:100] + '...' if len(row[1]) > 100 else row[1],
-                'type': row[2],
-                'location': row[3] or 'Unknown',
-                'timestamp': row[4],
-                'credibility_score': row[5] or random.randint(70, 95)
+                'id': row['id'],
+                'title': row['title'],
+                'content': row['content'],
+                'type': row['report_type'],
+                'report_type': row['report_type'],
+                'location': row['location'] or 'Unknown',
+                'timestamp': row['timestamp'],
+                'credibility_score': row['credibility_score'] or random.randint(70, 95)
             })
         
-        return jsonify(reports)
+        response = jsonify(reports)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
     except Exception as e:
         return jsonify({'error': f'Failed to fetch reports: {str(e)}'}), 500
 
-@app.route('/nearby-news', methods=['POST'])
+@app.route('/api/stats')
+def report_stats():
+    """Dashboard statistics read only from the report_rollups table"""
+    try:
+        return jsonify(get_stats(get_db().cursor(), request.args.get('bucket', 'hour'), request.args.get('window')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/store/stats')
+@cache_control('no-store')
+def store_stats():
+    """Which report store this instance uses and how long it took to open"""
+    return jsonify(report_store.metrics())
+
+@app.route('/api/reports/tiles/<int:z>/<int:x>/<int:y>')
+def report_tile(z, x, y):
+    """Clustered reports for one map tile, read from precomputed grid aggregates"""
+    if not is_valid_tile(z, x, y):
+        return jsonify({'error': 'Tile out of range'}), 404
+    
+    clusters = get_tile_clusters(get_db().cursor(), z, x, y, request.args.get('type'))
+    
+    response = jsonify({'z': z, 'x': x, 'y': y, 'clusters': clusters})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/reverse-geocode')
+def reverse_geocode():
+    """Nearest known place for a coordinate, from the local gazetteer"""
+    try:
+        lat = float(request.args.get('lat', ''))
+        lng = float(request.args.get('lng', ''))
+    except ValueError:
+        return jsonify({'error': 'lat and lng must be numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'error': 'lat or lng out of range'}), 400
+    
+    if os.path.exists(GAZETTEER_PATH):
+        gazetteer = get_gazetteer(GAZETTEER_PATH)
+    else:
+        gazetteer = get_gazetteer(GAZETTEER_FETCH_PATH, fetch=True)
+    if gazetteer is None:
+        return jsonify({'error': 'Reverse geocoding is not available'}), 503
+    
+    place = gazetteer.reverse(lat, lng)
+    if place is None:
+        return jsonify({'error': 'No known place nearby'}), 404
+    
+    response = jsonify(place)
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@app.route('/nearby-news', methods=['GET', 'POST'])
+@cache_control('private, no-cache')
 def get_nearby_news():
     try:
-        data = request.json
+        # GET lets browsers revalidate repeat polls with If-None-Match
+        data = request.args if request.method == 'GET' else request.json
         user_lat = data.get('lat')
         user_lng = data.get('lng')
         radius = float(data.get('radius', 10))
+        accuracy = data.get('accuracy', DEFAULT_ACCURACY)
         
         if not user_lat or not user_lng:
             return jsonify({'error': 'Location coordinates required'}), 400
         
+        if accuracy not in ACCURACY_MODES:
+            return jsonify({'error': f"accuracy must be one of {', '.join(ACCURACY_MODES)}"}), 400
+        
+        user_lat = float(user_lat)
+        user_lng = float(user_lng)
+        
         conn = get_db()
         cursor = conn.cursor()
         
@@ -374,39 +442,48 @@ def get_nearby_news():
         ''')
         
         all_reports = cursor.fetchall()
-        nearby_news = []
         
-        for report in all_reports:
-            if report[5] and report[6]:  # latitude and longitude exist
-                distance = geodesic((user_lat, user_lng), (report[5], report[6])).kilometers
-                
-                if distance <= radius:
-                    nearby_news.append({
-                        'title': report[0],
-                        'content': report[1],
-                        'url': report[2],
-                        'type': report[3],
-                        'location': report[4],
-                        'timestamp': report[7],
-                        'credibility_score': report[8] or random.randint(70, 95),
-                        'distance': round(distance, 1)
-                    })
+        # Distance, radius filter and sort in one vectorized pass
+        indices, distances = nearest_within_radius(
+            user_lat, user_lng,
+            [report[5] for report in all_reports],
+            [report[6] for report in all_reports],
+            radius, limit=10, accuracy=accuracy
+        )
+        
+        nearby_news = []
+        for index, distance in zip(indices, distances):
+            report = all_reports[index]
+            nearby_news.append({
+                'title': report[0],
+                'content': report[1],
+                'url': report[2],
+                'type': report[3],
+                'location': report[4],
+                'timestamp': report[7],
+                'credibility_score': report[8] or random.randint(70, 95),
+                'distance': round(float(distance), 1)
+            })
         
         # Add sample events if few real reports
         if len(nearby_news) < 3:
-            sample_events = generate_sample_nearby_events(user_lat, user_lng, radius)
+            sample_events = generate_sample_nearby_events(user_lat, user_lng, radius, accuracy)
             nearby_news.extend(sample_events)
-        
-        # Sort by distance
-        nearby_news.sort(key=lambda x: x['distance'])
+            # Sort by distance
+            nearby_news.sort(key=lambda x: x['distance'])
         
         return jsonify(nearby_news[:10])
         
     except Exception as e:
         return jsonify({'error': f'Failed to fetch nearby news: {str(e)}'}), 500
 
-def generate_sample_nearby_events(user_lat, user_lng, radius):
-    """Generate sample nearby events for demonstration"""
+def generate_sample_nearby_events(user_lat, user_lng, radius, accuracy=DEFAULT_ACCURACY):
+    """Generate sample nearby events for demonstration
+    
+    Seeded by the query and stamped to the hour, so repeat polls from the
+    same place get identical events (and a matching ETag).
+    """
+    sample_time = datetime.now().replace(minute=0, second=0, microsecond=0).isoformat()
     sample_events = [
         {
             'title': 'Traffic Disruption on Main Highway',
@@ -414,7 +491,7 @@ def generate_sample_nearby_events(user_lat, user_lng, radius):
             'type': 'critical_event',
             'location': 'Highway intersection',
             'credibility_score': 85,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': sample_time
         },
         {
             'title': 'Local Weather Alert Issued',
@@ -422,7 +499,7 @@ def generate_sample_nearby_events(user_lat, user_lng, radius):
             'type': 'critical_event',
             'location': 'Metropolitan area',
             'credibility_score': 92,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': sample_time
         },
         {
             'title': 'Community Safety Notice',
@@ -430,29 +507,25 @@ def generate_sample_nearby_events(user_lat, user_lng, radius):
             'type': 'critical_event',
             'location': 'Downtown district',
             'credibility_score': 78,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': sample_time
         }
     ]
     
-    nearby_events = []
-    for i, event in enumerate(sample_events):
-        # Generate random coordinates within radius
-        angle = random.uniform(0, 2 * math.pi)
-        distance = random.uniform(1, radius * 0.8)
-        
-        # Calculate offset coordinates
-        lat_offset = distance * math.cos(angle) / 111.0
-        lng_offset = distance * math.sin(angle) / (111.0 * math.cos(math.radians(user_lat)))
-        
-        event_lat = user_lat + lat_offset
-        event_lng = user_lng + lng_offset
-        
-        actual_distance = geodesic((user_lat, user_lng), (event_lat, event_lng)).kilometers
-        
-        event['distance'] = round(actual_distance, 1)
-        nearby_events.append(event)
+    # Generate random coordinates within radius
+    rng = np.random.default_rng(abs(hash((round(user_lat, 3), round(user_lng, 3), radius))))
+    angles = rng.uniform(0, 2 * math.pi, len(sample_events))
+    offsets = rng.uniform(1, radius * 0.8, len(sample_events))
+    
+    # Calculate offset coordinates
+    event_lats = user_lat + offsets * np.cos(angles) / 111.0
+    event_lngs = user_lng + offsets * np.sin(angles) / (111.0 * math.cos(math.radians(user_lat)))
+    
+    actual_distances = distances_km(user_lat, user_lng, event_lats, event_lngs, accuracy)
+    
+    for event, actual_distance in zip(sample_events, actual_distances):
+        event['distance'] = round(float(actual_distance), 1)
     
-    return nearby_events
+    return sample_events
 
 # Vercel serverless function handler
 def handler(request):
@@ -460,7 +533,8 @@ def handler(request):
 
 # For local development
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Local runs only; Vercel imports `app`. Production serving is serve.py
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1')
 
 # Export the Flask app for Vercel
 app = app
@@ -1,23 +1,56 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, url_for
 import sqlite3
 import os
 from datetime import datetime
 import requests
 from textblob import TextBlob
 import json
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
 import re
 import random
 import math
+import time
+from urllib.parse import urlencode
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
+from geo_distance import (ACCURACY_MODES, DEFAULT_ACCURACY, bounding_box,
+                          distances_km, nearest_within_radius, parse_coordinates)
+from report_tiles import add_report_to_grid, ensure_grid, get_tile_clusters, is_valid_tile
+from report_listing import create_listing_indexes, list_reports, parse_listing_args
+from analysis_jobs import LANES, JobQueue, create_job_queue
+from bulk_ingest import ingest_reports, iter_bulk_items
+from write_behind import WriteBehindQueue
+import report_search
+from report_stats import create_rollups, get_stats
+from report_archive import MaintenanceScheduler, archive_partitions, attach_archive
+from report_export import EXPORT_FORMATS, export_reports, parse_export_args
+from geocoder import Geocoder, create_geocode_cache
+from geocode_worker import GeocodeWorker, create_geocode_queue
+from reverse_geocoder import get_gazetteer
+from http_caching import cache_control, init_http_caching
+from report_events import ReportEventFeed, create_report_events, format_event, parse_event_filters
+from assets import init_assets
+from shared_cache import SharedCache, cache_key
+from process_lock import run_in_one_process
+from metrics import TimedConnection, init_metrics, register_collector, timed
+from profiler import init_profiling
+from rate_limit import init_rate_limits, rate_limit
+from tracing import current_span, init_tracing, span
+from url_ingest import UrlIngester, find_urls
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import queue
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'news_detector_secret_key_2024')
+init_http_caching(app)
+init_assets(app, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sw.js'))
+init_metrics(app)
+init_profiling(app)
+init_tracing(app)
+rate_limiter = init_rate_limits(app)
 
 # DeepSeek API Configuration
 deepseek_api_key = os.environ.get('DEEPSEEK_API_KEY', 'sk-0c6cc3046e3a4d0a8c16442cc4796e08')
@@ -30,6 +63,65 @@ deepseek_client = OpenAI(
 news_api_key = os.environ.get('NEWS_API_KEY', '1b6a325b95364d4bad0745356986ff45')
 news_api_base_url = 'https://newsapi.org/v2'
 
+# LLM answers, NewsAPI responses and parsed social posts, shared by every
+# server process on the host
+shared_cache = SharedCache(os.environ.get('SHARED_CACHE_PATH', 'news_cache.db'))
+CHATBOT_CACHE_TTL = int(os.environ.get('CHATBOT_CACHE_TTL', 86400))
+NEWS_CACHE_TTL = int(os.environ.get('NEWS_CACHE_TTL', 300))
+SOCIAL_POSTS_CACHE_TTL = int(os.environ.get('SOCIAL_POSTS_CACHE_TTL', 600))
+
+# Links pasted into the chatbot or attached to reports, fetched once per host
+# and revalidated with ETag/Last-Modified once stale
+url_ingester = UrlIngester(
+    shared_cache,
+    concurrency=int(os.environ.get('URL_FETCH_CONCURRENCY', 8)),
+    timeout=float(os.environ.get('URL_FETCH_TIMEOUT', 10)),
+    max_bytes=int(os.environ.get('URL_FETCH_MAX_BYTES', 2 * 1024 * 1024)),
+    fresh_for=int(os.environ.get('URL_CACHE_FRESH', 600)),
+    ttl=int(os.environ.get('URL_CACHE_TTL', 86400))
+)
+MAX_LINKS_PER_MESSAGE = 3
+LINKED_PAGE_CHARS = 6000
+
+# Write-behind queue for report and chat-history inserts
+write_queue = WriteBehindQueue(
+    'news_reports.db',
+    flush_interval=int(os.environ.get('WRITE_BEHIND_INTERVAL_MS', 50)) / 1000,
+    batch_size=int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 200)),
+    max_queue=int(os.environ.get('WRITE_BEHIND_MAX_QUEUE', 10000))
+)
+
+# Shared Nominatim client: persistent cache, one upstream request per second.
+# Each of the WEB_CONCURRENCY server processes spaces its own requests, so
+# each takes an equal share of that budget.
+geocoder = Geocoder(
+    'news_reports.db',
+    user_agent=os.environ.get('NOMINATIM_USER_AGENT', 'news_detector'),
+    min_interval=float(os.environ.get('GEOCODE_MIN_INTERVAL', 1.0)) * int(os.environ.get('WEB_CONCURRENCY', 1))
+)
+GEOCODE_TIMEOUT = float(os.environ.get('GEOCODE_TIMEOUT', 15))
+
+# Fills in coordinates for reports submitted with only a location name
+geocode_worker = GeocodeWorker(
+    'news_reports.db', geocoder,
+    poll_interval=float(os.environ.get('GEOCODE_POLL_INTERVAL', 5))
+)
+
+# Pushes new reports to /api/events subscribers
+event_feed = ReportEventFeed(
+    'news_reports.db',
+    poll_interval=float(os.environ.get('EVENT_POLL_INTERVAL', 0.5)),
+    max_subscribers=int(os.environ.get('EVENT_MAX_SUBSCRIBERS', 500))
+)
+
+# GeoNames cities file for offline reverse geocoding
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', 'data/cities15000.txt')
+
+# Cold storage for old reports, moved there by the nightly maintenance job
+ARCHIVE_DB_PATH = os.environ.get('ARCHIVE_DB_PATH', 'news_reports_archive.db')
+ARCHIVE_MAX_AGE_DAYS = int(os.environ.get('ARCHIVE_MAX_AGE_DAYS', 90))
+MAINTENANCE_HOUR_UTC = int(os.environ.get('MAINTENANCE_HOUR_UTC', 3))
+
 # Initialize database
 def init_db():
     conn = sqlite3.connect('news_reports.db')
@@ -63,19 +155,40 @@ def init_db():
         )
     ''')
     
+    # Indexes for keyset-paginated listings
+    create_listing_indexes(cursor)
+    
+    conn.commit()
+    
+    # Precomputed map clusters for the tile endpoint
+    ensure_grid(conn)
+    
+    # Full-text indexes, kept in sync by triggers
+    report_search.create_search_indexes(conn)
+    
+    # Dashboard rollups, kept in sync by triggers
+    create_rollups(conn)
+    
+    create_geocode_cache(cursor)
+    create_geocode_queue(cursor)
+    
+    # Event log behind /api/events, filled by triggers
+    create_report_events(cursor)
+    
+    create_job_queue(cursor)
     conn.commit()
     conn.close()
 
 # News credibility analysis function
+@timed('scorer_duration_seconds', scorer='analyze_news_credibility')
 def analyze_news_credibility(text):
     """Analyze news credibility using basic NLP techniques"""
-    blob = TextBlob(text)
-    
     # Basic credibility indicators
     credibility_score = 50  # Start with neutral score
     
     # Check for emotional language (high emotion = lower credibility)
-    polarity = abs(blob.sentiment.polarity)
+    with timed('scorer_duration_seconds', scorer='textblob'):
+        polarity = abs(TextBlob(text).sentiment.polarity)
     if polarity > 0.5:
         credibility_score -= 15
     
@@ -99,72 +212,136 @@ def analyze_news_credibility(text):
     
     return credibility_score
 
+# System prompts per analysis type
+CHATBOT_SYSTEM_PROMPTS = {
+    'full': "You are Civic Lens Solutions AI Analyst, an advanced professional news verification specialist powered by cutting-edge AI technology. Provide comprehensive analysis of news credibility, source verification, bias detection, and factual accuracy. Always include a credibility score (0-100), specific recommendations, and actionable insights for civic engagement.",
+    'quick': "You are Civic Lens Solutions AI Analyst. Provide a rapid but thorough credibility assessment with a score (0-100), brief explanation, and key warning signs or validation points.",
+    'source': "You are Civic Lens Solutions AI Analyst specializing in source verification. Focus on analyzing the reliability and credibility of news sources, publication history, journalistic standards, and institutional trustworthiness. Provide detailed source credibility metrics.",
+    'bias': "You are Civic Lens Solutions AI Analyst specializing in bias detection and media literacy. Analyze political bias, emotional language, selective reporting, presentation bias, and provide educational insights about media manipulation techniques."
+}
+CHATBOT_MODEL = "deepseek-chat"
+CHATBOT_MAX_TOKENS = 1000
+CHATBOT_TEMPERATURE = 0.3
+
+def linked_pages(text):
+    """Fetched pages of the first links in `text`, skipping ones that failed"""
+    urls = find_urls(text, MAX_LINKS_PER_MESSAGE)
+    if not urls:
+        return []
+    with span('links.fetch') as step:
+        pages = [page for page in url_ingester.fetch_many(urls) if page is not None]
+        step.set('link.count', len(urls))
+        step.set('page.count', len(pages))
+    return pages
+
+def with_linked_pages(text, pages):
+    """`text` followed by the title and main text of each linked page"""
+    parts = [text]
+    for page in pages:
+        parts.append(f"Linked page: {page['final_url']}\nTitle: {page['title']}\n{page['text'][:LINKED_PAGE_CHARS]}")
+    return '\n\n'.join(parts)
+
+def prepare_chatbot_request(user_message, analysis_type='full', content=None):
+    """(reply, messages): a canned reply that needs no LLM call, or the DeepSeek messages
+    
+    `content` is the text to analyze, the message plus its linked pages;
+    it defaults to the message itself.
+    """
+    content = user_message if content is None else content
+    system_prompt = CHATBOT_SYSTEM_PROMPTS.get(analysis_type, CHATBOT_SYSTEM_PROMPTS['full'])
+    
+    # Check if it's a simple question or news analysis
+    user_message_lower = user_message.lower()
+    
+    if any(keyword in user_message_lower for keyword in ['help', 'what can you do', 'how to use']):
+        return {
+            'response': "I'm your Civic Lens AI Analyst, specialized in news verification and civic information assessment. I can help you:\n\n🔍 **Analyze News Credibility** - Paste any news article for comprehensive analysis\n🛡️ **Verify Sources** - Check the reliability of news sources and publications\n📊 **Detect Bias** - Identify political or editorial bias in reporting\n⚡ **Quick Fact-Check** - Get rapid credibility assessments\n📍 **Local News Monitoring** - Find critical events near your location\n\nJust paste a news article, URL, or ask me to verify any information!",
+            'credibility_score': None,
+            'analysis_type': 'help'
+        }, None
+    
+    if len(content) < 50:
+        return {
+            'response': "Please provide a news article, URL, or more detailed information for me to analyze. I need sufficient content to perform a thorough credibility assessment.",
+            'credibility_score': None,
+            'analysis_type': analysis_type
+        }, None
+    
+    return None, [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Please analyze this news content for credibility and provide insights: {content}"}
+    ]
+
+def chatbot_cache_key(messages, analysis_type):
+    # The stored reply echoes analysis_type, so it is part of the key
+    return cache_key(CHATBOT_MODEL, CHATBOT_MAX_TOKENS, CHATBOT_TEMPERATURE, analysis_type, messages)
+
+def chatbot_result(ai_response, user_message, analysis_type):
+    """Chatbot reply from the LLM answer"""
+    # Extract credibility score from response or calculate fallback
+    credibility_score = extract_credibility_score(ai_response) or analyze_news_credibility(user_message)
+    
+    return {
+        'response': ai_response,
+        'credibility_score': credibility_score,
+        'analysis_type': analysis_type,
+        'sources_checked': True,
+        'bias_detected': 'bias' in analysis_type or 'full' in analysis_type
+    }
+
+def chatbot_fallback(user_message, analysis_type):
+    """Chatbot reply from the local scorer when the LLM is unavailable"""
+    score = analyze_news_credibility(user_message)
+    return {
+        'response': f"I've analyzed this content using our backup systems. Credibility Score: {score}/100. {get_fallback_analysis(score, user_message)}",
+        'credibility_score': score,
+        'analysis_type': analysis_type,
+        'sources_checked': False,
+        'bias_detected': False
+    }
+
 # Enhanced AI chatbot response using DeepSeek API
-def get_chatbot_response(user_message, analysis_type='full'):
-    """Generate enhanced chatbot response using DeepSeek API"""
+def get_chatbot_response(user_message, analysis_type='full', fallback=True):
+    """Generate enhanced chatbot response using DeepSeek API
+    
+    With fallback=False an API error is raised instead of answered with the
+    basic analysis, so a queued job can retry it.
+    """
+    content = user_message
     try:
-        # Create system prompt based on analysis type
-        system_prompts = {
-            'full': "You are Civic Lens Solutions AI Analyst, an advanced professional news verification specialist powered by cutting-edge AI technology. Provide comprehensive analysis of news credibility, source verification, bias detection, and factual accuracy. Always include a credibility score (0-100), specific recommendations, and actionable insights for civic engagement.",
-            'quick': "You are Civic Lens Solutions AI Analyst. Provide a rapid but thorough credibility assessment with a score (0-100), brief explanation, and key warning signs or validation points.",
-            'source': "You are Civic Lens Solutions AI Analyst specializing in source verification. Focus on analyzing the reliability and credibility of news sources, publication history, journalistic standards, and institutional trustworthiness. Provide detailed source credibility metrics.",
-            'bias': "You are Civic Lens Solutions AI Analyst specializing in bias detection and media literacy. Analyze political bias, emotional language, selective reporting, presentation bias, and provide educational insights about media manipulation techniques."
-        }
-        
-        system_prompt = system_prompts.get(analysis_type, system_prompts['full'])
-        
-        # Check if it's a simple question or news analysis
-        user_message_lower = user_message.lower()
-        
-        if any(keyword in user_message_lower for keyword in ['help', 'what can you do', 'how to use']):
-            return {
-                'response': "I'm your Civic Lens AI Analyst, specialized in news verification and civic information assessment. I can help you:\n\n🔍 **Analyze News Credibility** - Paste any news article for comprehensive analysis\n🛡️ **Verify Sources** - Check the reliability of news sources and publications\n📊 **Detect Bias** - Identify political or editorial bias in reporting\n⚡ **Quick Fact-Check** - Get rapid credibility assessments\n📍 **Local News Monitoring** - Find critical events near your location\n\nJust paste a news article, URL, or ask me to verify any information!",
-                'credibility_score': None,
-                'analysis_type': 'help'
-            }
-        
-        if len(user_message) < 50:
-            return {
-                'response': "Please provide a news article, URL, or more detailed information for me to analyze. I need sufficient content to perform a thorough credibility assessment.",
-                'credibility_score': None,
-                'analysis_type': analysis_type
-            }
-        
-        # Use DeepSeek API for comprehensive analysis
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Please analyze this news content for credibility and provide insights: {user_message}"}
-            ],
-            max_tokens=1000,
-            temperature=0.3
-        )
-        
-        ai_response = response.choices[0].message.content
+        # Pasted links are analyzed by their page text, not the bare URL
+        content = with_linked_pages(user_message, linked_pages(user_message))
+        reply, messages = prepare_chatbot_request(user_message, analysis_type, content)
+        if reply is not None:
+            return reply
         
-        # Extract credibility score from response or calculate fallback
-        credibility_score = extract_credibility_score(ai_response) or analyze_news_credibility(user_message)
-        
-        return {
-            'response': ai_response,
-            'credibility_score': credibility_score,
-            'analysis_type': analysis_type,
-            'sources_checked': True,
-            'bias_detected': 'bias' in analysis_type or 'full' in analysis_type
-        }
+        # Use DeepSeek API for comprehensive analysis; identical requests
+        # reuse the stored answer, and fallbacks are never stored
+        with span('chatbot.response', analysis_type=analysis_type) as step:
+            step.set('cache.hit', True)
+            
+            def ask_deepseek():
+                step.set('cache.hit', False)
+                with timed('upstream_request_duration_seconds', upstream='deepseek'):
+                    response = deepseek_client.chat.completions.create(
+                        model=CHATBOT_MODEL,
+                        messages=messages,
+                        max_tokens=CHATBOT_MAX_TOKENS,
+                        temperature=CHATBOT_TEMPERATURE
+                    )
+                    if response.usage is not None:
+                        current_span().set('llm.total_tokens', response.usage.total_tokens)
+                return chatbot_result(response.choices[0].message.content, content, analysis_type)
+            
+            return shared_cache.get_or_set('chatbot', chatbot_cache_key(messages, analysis_type), CHATBOT_CACHE_TTL,
+                                           ask_deepseek)
         
     except Exception as e:
         print(f"DeepSeek API error: {e}")
+        if not fallback:
+            raise
         # Fallback to basic analysis
-        score = analyze_news_credibility(user_message)
-        return {
-            'response': f"I've analyzed this content using our backup systems. Credibility Score: {score}/100. {get_fallback_analysis(score, user_message)}",
-            'credibility_score': score,
-            'analysis_type': analysis_type,
-            'sources_checked': False,
-            'bias_detected': False
-        }
+        return chatbot_fallback(content, analysis_type)
 
 def extract_credibility_score(text):
     """Extract credibility score from AI response"""
@@ -194,30 +371,54 @@ def get_fallback_analysis(score, content):
         return "This content shows significant credibility issues including potential bias, lack of sources, or misleading information."
 
 # NewsAPI Integration Functions
+def top_headlines_params(country='us', category=None, page_size=20):
+    """Query parameters for a NewsAPI top-headlines request"""
+    params = {
+        'apiKey': news_api_key,
+        'country': country,
+        'pageSize': page_size,
+        'sortBy': 'publishedAt'
+    }
+    
+    if category:
+        params['category'] = category
+    return params
+
+def news_cache_key(params):
+    # The API key is left out so rotating it keeps the cache warm
+    return cache_key({name: value for name, value in params.items() if name != 'apiKey'})
+
+def news_cacheable(data):
+    return data.get('status') == 'ok'
+
+def news_articles(data):
+    """Articles from a NewsAPI response body, or [] on an API error"""
+    if data['status'] == 'ok':
+        return data['articles']
+    print(f"NewsAPI Error: {data.get('message', 'Unknown error')}")
+    return []
+
 def fetch_todays_news(country='us', category=None, page_size=20):
     """Fetch today's top news from NewsAPI"""
     try:
-        url = f"{news_api_base_url}/top-headlines"
-        params = {
-            'apiKey': news_api_key,
-            'country': country,
-            'pageSize': page_size,
-            'sortBy': 'publishedAt'
-        }
+        params = top_headlines_params(country, category, page_size)
         
-        if category:
-            params['category'] = category
+        with span('news.fetch', country=country, category=category or '', page_size=page_size) as step:
+            step.set('cache.hit', True)
             
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        if data['status'] == 'ok':
-            return data['articles']
-        else:
-            print(f"NewsAPI Error: {data.get('message', 'Unknown error')}")
-            return []
+            def request_headlines():
+                step.set('cache.hit', False)
+                with timed('upstream_request_duration_seconds', upstream='newsapi'):
+                    response = requests.get(f"{news_api_base_url}/top-headlines", params=params)
+                    current_span().set('http.status_code', response.status_code)
+                    response.raise_for_status()
+                return response.json()
+            
+            data = shared_cache.get_or_set('newsapi', news_cache_key(params), NEWS_CACHE_TTL,
+                                           request_headlines, cacheable=news_cacheable)
+            articles = news_articles(data)
+            step.set('article.count', len(articles))
+            return articles
             
     except requests.exceptions.RequestException as e:
         print(f"Request error: {e}")
@@ -226,6 +427,7 @@ def fetch_todays_news(country='us', category=None, page_size=20):
         print(f"Error fetching news: {e}")
         return []
 
+@timed('scorer_duration_seconds', scorer='analyze_news_article_credibility')
 def analyze_news_article_credibility(article):
     """Analyze a news article from NewsAPI and return credibility score"""
     try:
@@ -306,7 +508,8 @@ def social_news():
         from html_parser import get_all_social_posts
         
         # Get real posts from HTML files
-        all_posts = get_all_social_posts()
+        with timed('html_parse_duration_seconds', source='social'):
+            all_posts = get_all_social_posts()
         
         # Enhanced credibility scoring with multiple factors
         for post in all_posts:
@@ -348,51 +551,23 @@ def modern_news():
     return render_template('modern_news.html')
 
 @app.route('/news')
+@cache_control('public, max-age=120')
 def unified_news():
     """Unified news page combining all news sources"""
     try:
         # Get latest news articles
         articles = []
         try:
-            news_articles = fetch_todays_news(page_size=10)
-            if news_articles:
-                for article in news_articles:
-                    analyzed_article = analyze_news_article_credibility(article)
-                    articles.append(analyzed_article)
+            articles = fetch_todays_news(page_size=10)
+            with span('news.score_articles', article_count=len(articles)):
+                articles = [analyze_news_article_credibility(article) for article in articles]
         except Exception as e:
             print(f"Error fetching news articles: {e}")
         
         # Get social media posts
         social_posts = []
         try:
-            from html_parser import get_all_social_posts
-            all_posts = get_all_social_posts()
-            
-            # Enhanced credibility scoring for social posts
-            for post in all_posts:
-                base_score = analyze_news_credibility(post['content'])
-                
-                credibility_factors = {
-                    'source_verification': 15 if post.get('verified', False) else 0,
-                    'engagement_quality': min(10, post.get('likes', 0) // 10),
-                    'post_type_bonus': 5 if 'breaking' in post.get('content', '').lower() else 0,
-                }
-                
-                final_score = base_score + sum(credibility_factors.values()) + random.uniform(-3, 3)
-                post['credibility_score'] = max(30, min(95, int(final_score)))
-                
-                # Add credibility level and color
-                if post['credibility_score'] >= 80:
-                    post['credibility_level'] = 'High'
-                    post['credibility_color'] = 'high'
-                elif post['credibility_score'] >= 60:
-                    post['credibility_level'] = 'Medium'
-                    post['credibility_color'] = 'medium'
-                else:
-                    post['credibility_level'] = 'Low'
-                    post['credibility_color'] = 'low'
-            
-            social_posts = all_posts
+            social_posts = scored_social_posts()
         except Exception as e:
             print(f"Error fetching social posts: {e}")
         
@@ -402,6 +577,49 @@ def unified_news():
         print(f"Error in unified_news route: {e}")
         return render_template('unified_news.html', articles=[], social_posts=[])
 
+def scored_social_posts():
+    """Posts parsed from the saved social media pages, with credibility scores"""
+    from html_parser import get_all_social_posts, social_sources_version
+    # Parsing the saved pages is slow; re-parse when they change
+    with span('social.posts') as step:
+        step.set('cache.hit', True)
+        
+        def parse_posts():
+            step.set('cache.hit', False)
+            with timed('html_parse_duration_seconds', source='social'):
+                return get_all_social_posts()
+        
+        all_posts = shared_cache.get_or_set('social_posts', cache_key(social_sources_version()),
+                                            SOCIAL_POSTS_CACHE_TTL, parse_posts)
+        step.set('post.count', len(all_posts))
+    
+    # Enhanced credibility scoring for social posts
+    with span('social.score', post_count=len(all_posts)):
+        for post in all_posts:
+            base_score = analyze_news_credibility(post['content'])
+            
+            credibility_factors = {
+                'source_verification': 15 if post.get('verified', False) else 0,
+                'engagement_quality': min(10, post.get('likes', 0) // 10),
+                'post_type_bonus': 5 if 'breaking' in post.get('content', '').lower() else 0,
+            }
+            
+            final_score = base_score + sum(credibility_factors.values()) + random.uniform(-3, 3)
+            post['credibility_score'] = max(30, min(95, int(final_score)))
+            
+            # Add credibility level and color
+            if post['credibility_score'] >= 80:
+                post['credibility_level'] = 'High'
+                post['credibility_color'] = 'high'
+            elif post['credibility_score'] >= 60:
+                post['credibility_level'] = 'Medium'
+                post['credibility_color'] = 'medium'
+            else:
+                post['credibility_level'] = 'Low'
+                post['credibility_color'] = 'low'
+    
+    return all_posts
+
 @app.route('/enhanced-map')
 @app.route('/enhanced-map.html')
 def enhanced_map():
@@ -410,6 +628,7 @@ def enhanced_map():
 
 @app.route('/latest-news')
 @app.route('/latest-news.html')
+@cache_control('public, max-age=120')
 def latest_news():
     """Display latest news with credibility scores"""
     try:
@@ -422,27 +641,7 @@ def latest_news():
             print("No articles returned from NewsAPI")
             return render_template('latest-news.html', articles=[], error="No news articles available at this time")
         
-        # Analyze each article and add credibility score
-        analyzed_articles = []
-        for i, article in enumerate(articles):
-            try:
-                if article.get('title') and article.get('description'):
-                    print(f"Analyzing article {i+1}: {article.get('title', '')[:50]}...")
-                    credibility_score = analyze_news_article_credibility(article)
-                    
-                    # Add credibility info to article
-                    article['credibility_score'] = credibility_score
-                    article['credibility_level'] = get_credibility_level(credibility_score)
-                    article['credibility_color'] = get_credibility_color(credibility_score)
-                    
-                    analyzed_articles.append(article)
-                else:
-                    print(f"Skipping article {i+1} - missing title or description")
-            except Exception as article_error:
-                print(f"Error analyzing article {i+1}: {article_error}")
-                continue
-        
-        print(f"Successfully analyzed {len(analyzed_articles)} articles")
+        analyzed_articles = analyze_latest_articles(articles)
         return render_template('latest-news.html', articles=analyzed_articles)
         
     except Exception as e:
@@ -451,6 +650,37 @@ def latest_news():
         traceback.print_exc()
         return render_template('latest-news.html', articles=[], error=f"Unable to fetch news: {str(e)}")
 
+def analyze_latest_articles(articles):
+    """Articles with a title and description, with credibility info added"""
+    with span('news.score_articles', article_count=len(articles)) as step:
+        analyzed_articles = score_articles(articles)
+        step.set('analyzed_count', len(analyzed_articles))
+    return analyzed_articles
+
+def score_articles(articles):
+    # Analyze each article and add credibility score
+    analyzed_articles = []
+    for i, article in enumerate(articles):
+        try:
+            if article.get('title') and article.get('description'):
+                print(f"Analyzing article {i+1}: {article.get('title', '')[:50]}...")
+                credibility_score = analyze_news_article_credibility(article)
+                
+                # Add credibility info to article
+                article['credibility_score'] = credibility_score
+                article['credibility_level'] = get_credibility_level(credibility_score)
+                article['credibility_color'] = get_credibility_color(credibility_score)
+                
+                analyzed_articles.append(article)
+            else:
+                print(f"Skipping article {i+1} - missing title or description")
+        except Exception as article_error:
+            print(f"Error analyzing article {i+1}: {article_error}")
+            continue
+    
+    print(f"Successfully analyzed {len(analyzed_articles)} articles")
+    return analyzed_articles
+
 def get_credibility_level(score):
     """Get credibility level text based on score"""
     if score >= 80:
@@ -501,6 +731,7 @@ def dashboard_page():
     return render_template('dashboard.html')
 
 @app.route('/api/chatbot', methods=['POST'])
+@rate_limit('llm')
 def api_chatbot():
     data = request.json
     user_message = data.get('message', '')
@@ -526,149 +757,548 @@ def api_chatbot():
         return jsonify({'success': False, 'error': 'Internal server error'})
 
 @app.route('/chat', methods=['POST'])
+@rate_limit('llm')
 def chat():
-    # Legacy endpoint - redirect to new API
-    return api_chatbot()
+    # Legacy endpoint - same analysis as the new API, plus chat history
+    response = api_chatbot()
+    result = response.get_json()
     
-    if not user_message:
-        return jsonify({'error': 'Message is required'}), 400
-    
-    try:
-        # Adjust analysis type based on chatbot type
-        if chatbot_type == 'quick':
-            analysis_type = 'quick'
-        elif chatbot_type == 'comprehensive':
-            analysis_type = 'full'
-            
-        # Get AI response
-        bot_response = get_chatbot_response(user_message, analysis_type)
+    if result.get('success'):
+        record = (request.json.get('message', ''), result['response'], session.get('session_id', 'anonymous'))
         
-        # Store chat history with chatbot type
-        conn = sqlite3.connect('news_reports.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO chat_history (user_message, bot_response, session_id)
-            VALUES (?, ?, ?)
-        ''', (user_message, f"[{chatbot_type.upper()}] {bot_response}", session.get('session_id', 'anonymous')))
-        conn.commit()
-        conn.close()
+        def write_chat_history(cursor):
+            cursor.execute('''
+                INSERT INTO chat_history (user_message, bot_response, session_id)
+                VALUES (?, ?, ?)
+            ''', record)
+            return cursor.lastrowid
         
-        return jsonify({
-            'response': bot_response,
-            'chatbot_type': chatbot_type,
-            'analysis_type': analysis_type
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        try:
+            write_queue.submit(write_chat_history)
+        except queue.Full:
+            # History is best effort; never fail the chat because of it
+            print("Write-behind queue full, dropping chat history entry")
+    
+    return response
+
+# Analysis jobs: long analyses run by a worker pool instead of the request
+def run_chatbot_job(payload):
+    return get_chatbot_response(payload['message'], payload['analysis_type'], fallback=False)
+
+def run_credibility_job(payload):
+    return {'credibility_score': analyze_news_credibility(payload['text'])}
+
+def run_report_link_job(payload):
+    """Rescore a stored report with the text of the page its url links to"""
+    pages = linked_pages(payload['url'])
+    if not pages:
+        return {'credibility_score': None, 'page_count': 0}
+    score = analyze_news_credibility(with_linked_pages(payload['content'], pages))
+    
+    def update_score(cursor):
+        row = cursor.execute('''
+            SELECT latitude, longitude, report_type, credibility_score FROM reports WHERE id = ?
+        ''', (payload['report_id'],)).fetchone()
+        if row is None:
+            # Archived in the meantime
+            return
+        latitude, longitude, report_type, old_score = row
+        cursor.execute('UPDATE reports SET credibility_score = ? WHERE id = ?', (score, payload['report_id']))
+        if latitude is not None and old_score != score:
+            add_report_to_grid(cursor, latitude, longitude, report_type, old_score, count=-1)
+            add_report_to_grid(cursor, latitude, longitude, report_type, score)
+    
+    # Through the write-behind queue like every other report write; a full
+    # queue raises and the job is retried
+    write_queue.submit(update_score).result(timeout=30)
+    return {'credibility_score': score, 'page_count': len(pages)}
+
+ANALYSIS_JOB_INPUTS = {'chatbot': 'message', 'credibility': 'text'}
+ANALYSIS_JOB_MAX_CHARS = int(os.environ.get('ANALYSIS_JOB_MAX_CHARS', 100000))
+ANALYSIS_JOB_EVENTS_TIMEOUT = int(os.environ.get('ANALYSIS_JOB_EVENTS_TIMEOUT', 300))
+
+# Each of the WEB_CONCURRENCY server processes runs its share of the workers
+job_queue = JobQueue(
+    'news_reports.db',
+    {'chatbot': run_chatbot_job, 'credibility': run_credibility_job, 'report_link': run_report_link_job},
+    workers=max(1, int(os.environ.get('ANALYSIS_WORKERS', 4)) // int(os.environ.get('WEB_CONCURRENCY', 1))),
+    max_attempts=int(os.environ.get('ANALYSIS_JOB_MAX_ATTEMPTS', 3)),
+    retry_delay=float(os.environ.get('ANALYSIS_JOB_RETRY_DELAY', 5)),
+    lease_seconds=float(os.environ.get('ANALYSIS_JOB_LEASE', 300)),
+    result_ttl=float(os.environ.get('ANALYSIS_JOB_TTL', 86400))
+)
+
+@app.route('/api/analyze/jobs', methods=['POST'])
+@rate_limit('llm', upstream=False)
+def submit_analysis_job():
+    """Queue an analysis and return its id at once (202)
+    
+    Body: {"kind": "chatbot", "message": ..., "analysis_type": ...} or
+    {"kind": "credibility", "text": ...}, plus an optional
+    "priority": "interactive" (default) or "batch".
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+    
+    kind = data.get('kind', 'chatbot')
+    if kind not in ANALYSIS_JOB_INPUTS:
+        return jsonify({'success': False, 'error': f"kind must be one of {', '.join(ANALYSIS_JOB_INPUTS)}"}), 400
+    field = ANALYSIS_JOB_INPUTS[kind]
+    text = data.get(field)
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'success': False, 'error': f'No {field} provided'}), 400
+    if len(text) > ANALYSIS_JOB_MAX_CHARS:
+        return jsonify({'success': False, 'error': f'{field} is longer than {ANALYSIS_JOB_MAX_CHARS} characters'}), 413
+    
+    priority = data.get('priority', 'interactive')
+    if priority not in LANES:
+        return jsonify({'success': False, 'error': f"priority must be one of {', '.join(LANES)}"}), 400
+    
+    payload = {field: text}
+    if kind == 'chatbot':
+        payload['analysis_type'] = data.get('analysis_type', 'comprehensive')
+    job_id = job_queue.submit(kind, payload, priority)
+    
+    status_url = url_for('get_analysis_job', job_id=job_id)
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': status_url,
+        'events_url': url_for('analysis_job_events', job_id=job_id)
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+@app.route('/api/analyze/jobs/<job_id>')
+@cache_control('no-store')
+def get_analysis_job(job_id):
+    """Status of a job, with its result once it has succeeded"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found (results expire after a while)'}), 404
+    return jsonify(dict(job, success=True))
+
+@app.route('/api/analyze/jobs/<job_id>/events')
+def analysis_job_events(job_id):
+    """Server-Sent Events: a status event per change, then the finished job
+    
+    The stream closes once the job has finished, or after
+    ANALYSIS_JOB_EVENTS_TIMEOUT seconds; reconnect to keep waiting.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found (results expire after a while)'}), 404
+    
+    def generate(job):
+        deadline = time.monotonic() + ANALYSIS_JOB_EVENTS_TIMEOUT
+        last_ping = time.monotonic()
+        seen = None
+        while job is not None:
+            if job['status'] in ('succeeded', 'failed'):
+                yield format_event('done', job)
+                return
+            if (job['status'], job['attempts']) != seen:
+                seen = (job['status'], job['attempts'])
+                yield format_event('status', {key: job[key] for key in ('id', 'status', 'attempts', 'error')})
+            elif time.monotonic() - last_ping >= 15:
+                last_ping = time.monotonic()
+                yield ': ping\n\n'
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(0.5)
+            job = job_queue.get(job_id)
+    
+    response = Response(stream_with_context(generate(job)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/report', methods=['POST'])
+@rate_limit('write')
 def report_news():
     data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
     
-    title = data.get('title', '')
-    content = data.get('content', '')
-    url = data.get('url', '')
-    report_type = data.get('type', 'fake_news')
-    location = data.get('location', '')
+    # The write is acknowledged before it runs, so anything the INSERT
+    # would reject has to be rejected here, on the request thread.
+    # Form fields left out arrive as null and take their default.
+    fields = {}
+    for field, default in (('title', ''), ('content', ''), ('url', ''), ('type', 'fake_news'), ('location', '')):
+        value = data.get(field)
+        fields[field] = default if value is None else value
+        if not isinstance(fields[field], str):
+            return jsonify({'success': False, 'error': f'{field} must be a string'}), 400
+    title, content, url = fields['title'], fields['content'], fields['url']
+    report_type, location = fields['type'], fields['location']
     user_ip = request.remote_addr
     
-    # Analyze credibility
+    if not title.strip():
+        return jsonify({'success': False, 'error': 'title is required'}), 400
+    if not report_type.strip():
+        return jsonify({'success': False, 'error': 'type is required'}), 400
+    try:
+        latitude, longitude = parse_coordinates(data.get('latitude'), data.get('longitude'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Score the text now; the linked page is fetched and counted by a
+    # background job once the report is stored
     credibility_score = analyze_news_credibility(content)
+    link_pending = bool(find_urls(url, 1))
     
-    # Save report to database
-    conn = sqlite3.connect('news_reports.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO reports (title, content, url, report_type, location, credibility_score, user_ip)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (title, content, url, report_type, location, credibility_score, user_ip))
-    conn.commit()
-    conn.close()
+    # Save report to database (batched by the write-behind queue)
+    def write_report(cursor):
+        cursor.execute('''
+            INSERT INTO reports (title, content, url, report_type, location, latitude, longitude,
+                                 credibility_score, user_ip)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, content, url, report_type, location, latitude, longitude, credibility_score, user_ip))
+        report_id = cursor.lastrowid
+        if latitude is not None:
+            add_report_to_grid(cursor, latitude, longitude, report_type, credibility_score)
+        if link_pending:
+            job_queue.add(cursor, 'report_link', {'report_id': report_id, 'content': content, 'url': url}, 'batch')
+        return report_id
     
-    return jsonify({
+    try:
+        pending = write_queue.submit(write_report)
+    except queue.Full:
+        response = jsonify({'success': False, 'error': 'Server is busy, please retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    # Coordinates for a location-only report are filled in in the background
+    if location and latitude is None:
+        pending.add_done_callback(lambda _: geocode_worker.wake())
+    if link_pending:
+        pending.add_done_callback(lambda _: job_queue.wake())
+    
+    result = {
         'success': True,
         'message': 'Report submitted successfully',
-        'credibility_score': credibility_score
-    })
+        'credibility_score': credibility_score,
+        'credibility_pending': link_pending
+    }
+    
+    # Callers that need the row id wait for the batch to commit
+    if data.get('sync') or request.args.get('sync') in ('1', 'true'):
+        try:
+            result['report_id'] = pending.result(timeout=10)
+        except Exception as e:
+            return jsonify({'success': False, 'error': f'Failed to save report: {e}'}), 500
+    
+    return jsonify(result)
+
+@app.route('/api/reports/bulk', methods=['POST'])
+@rate_limit('write')
+def bulk_report_news():
+    """Ingest many reports from a streamed NDJSON (default) or JSON array body
+    
+    Responds with NDJSON: one result line per item in input order, then a
+    final summary line.
+    """
+    items = iter_bulk_items(request.stream, request.mimetype)
+    user_ip = request.remote_addr
+    
+    def generate():
+        # Autocommit mode: ingest_reports runs one explicit transaction per chunk.
+        # Under asgi.py successive chunks may come from different pool threads
+        # (one at a time), hence check_same_thread=False.
+        conn = sqlite3.connect('news_reports.db', isolation_level=None, check_same_thread=False,
+                               factory=TimedConnection)
+        try:
+            for result in ingest_reports(conn, items, analyze_news_credibility, user_ip):
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        finally:
+            conn.close()
+            geocode_worker.wake()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/reports')
 def view_reports():
-    conn = sqlite3.connect('news_reports.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT title, content, url, report_type, location, timestamp, credibility_score
-        FROM reports
-        ORDER BY timestamp DESC
-        LIMIT 20
-    ''')
-    reports = cursor.fetchall()
+    try:
+        options = parse_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = sqlite3.connect('news_reports.db', factory=TimedConnection)
+    reports, next_cursor = list_reports(conn.cursor(), preview_chars=200, tables=listing_tables(conn), **options)
+    conn.close()
+    
+    response = jsonify([{
+        'title': r['title'],
+        'content': r['content'],
+        'url': r['url'],
+        'type': r['report_type'],
+        'location': r['location'],
+        'timestamp': r['timestamp'],
+        'credibility_score': r['credibility_score']
+    } for r in reports])
+    return add_next_cursor(response, next_cursor)
+
+@app.route('/api/recent-reports')
+def recent_reports():
+    """Recent reports for the report page, same paging and filters as /reports"""
+    try:
+        options = parse_listing_args(request.args, default_limit=10)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = sqlite3.connect('news_reports.db', factory=TimedConnection)
+    reports, next_cursor = list_reports(conn.cursor(), preview_chars=150, tables=listing_tables(conn), **options)
     conn.close()
     
-    return jsonify([{
-        'title': r[0],
-        'content': r[1][:200] + '...' if len(r[1]) > 200 else r[1],
-        'url': r[2],
-        'type': r[3],
-        'location': r[4],
-        'timestamp': r[5],
-        'credibility_score': r[6]
+    response = jsonify([{
+        'id': r['id'],
+        'title': r['title'],
+        'content': r['content'],
+        'type': r['report_type'],
+        'report_type': r['report_type'],
+        'location': r['location'] or 'Unknown',
+        'timestamp': r['timestamp'],
+        'credibility_score': r['credibility_score']
     } for r in reports])
+    return add_next_cursor(response, next_cursor)
+
+@app.route('/api/reports/export')
+def export_reports_file():
+    """Stream all matching reports as CSV, NDJSON or Parquet, oldest first"""
+    try:
+        export_format, compress, filters = parse_export_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filename = f'reports.{export_format}' + ('.gz' if compress else '')
+    
+    def generate():
+        # Chunks may be produced on different threads under asgi.py, one at a time
+        conn = sqlite3.connect('news_reports.db', check_same_thread=False, factory=TimedConnection)
+        try:
+            tables = list(reversed(listing_tables(conn)))
+            yield from export_reports(conn.cursor(), export_format, compress, tables, **filters)
+        finally:
+            conn.close()
+    
+    response = Response(
+        stream_with_context(generate()),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def include_archived():
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
 
-@app.route('/nearby-news', methods=['POST'])
+def listing_tables(conn):
+    """Live reports table, plus archive partitions when include_archived is set"""
+    if include_archived() and attach_archive(conn, ARCHIVE_DB_PATH):
+        return ['reports'] + archive_partitions(conn.cursor())
+    return ['reports']
+
+def add_next_cursor(response, next_cursor):
+    """Expose the next page cursor without changing the JSON array body"""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+@app.route('/api/search')
+def search_reports():
+    """BM25-ranked full-text search over reports"""
+    source = request.args.get('source', 'reports')
+    if source not in report_search.PUBLIC_SOURCES:
+        return jsonify({'error': f"source must be one of {', '.join(report_search.PUBLIC_SOURCES)}"}), 400
+    
+    try:
+        cursor_token = request.args.get('cursor')
+        after = report_search.decode_cursor(cursor_token) if cursor_token else None
+        limit = int(request.args.get('limit', report_search.DEFAULT_PAGE_SIZE))
+        
+        conn = sqlite3.connect('news_reports.db', factory=TimedConnection)
+        try:
+            archived = include_archived() and attach_archive(conn, ARCHIVE_DB_PATH)
+            results, next_cursor = report_search.search(
+                conn.cursor(), request.args.get('q', ''), source, limit, after,
+                include_archived=archived
+            )
+        finally:
+            conn.close()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'query': request.args.get('q', ''),
+        'results': results,
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/stats')
+def report_stats():
+    """Dashboard statistics read only from the report_rollups table"""
+    conn = sqlite3.connect('news_reports.db', factory=TimedConnection)
+    try:
+        stats = get_stats(conn.cursor(), request.args.get('bucket', 'hour'), request.args.get('window'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    return jsonify(stats)
+
+@app.route('/api/events')
+def event_stream():
+    """Server-Sent Events stream of new reports and report-count deltas
+    
+    Optional filters: bbox=min_lat,min_lng,max_lat,max_lng and
+    type=<report_type>[,...]. Reconnects resume from Last-Event-ID.
+    """
+    try:
+        bbox, types = parse_event_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    try:
+        stream = event_feed.subscribe(last_event_id, bbox, types)
+    except RuntimeError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/events/stats')
+@cache_control('no-store')
+def report_events_stats():
+    """Open event streams and feed polling counters"""
+    return jsonify(event_feed.metrics())
+
+@app.route('/api/write-queue/stats')
+@cache_control('no-store')
+def write_queue_stats():
+    """Depth, throughput and flush timings of the write-behind queue"""
+    return jsonify(write_queue.metrics())
+
+@app.route('/api/reports/tiles/<int:z>/<int:x>/<int:y>')
+def report_tile(z, x, y):
+    """Clustered reports for one map tile, read from precomputed grid aggregates"""
+    if not is_valid_tile(z, x, y):
+        return jsonify({'error': 'Tile out of range'}), 404
+    
+    conn = sqlite3.connect('news_reports.db', factory=TimedConnection)
+    cursor = conn.cursor()
+    clusters = get_tile_clusters(cursor, z, x, y, request.args.get('type'))
+    conn.close()
+    
+    response = jsonify({'z': z, 'x': x, 'y': y, 'clusters': clusters})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/nearby-news', methods=['GET', 'POST'])
+@cache_control('private, no-cache')
 def get_nearby_news():
-    data = request.json
+    # GET lets browsers revalidate repeat polls with If-None-Match
+    data = request.args if request.method == 'GET' else request.json
+    try:
+        query = parse_nearby_query(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(find_nearby_news(*query))
+
+def parse_nearby_query(data):
+    """(lat, lng, radius, accuracy) from a nearby-news request; ValueError if unusable"""
     user_lat = data.get('lat')
     user_lng = data.get('lng')
     radius = float(data.get('radius', 10))  # Default 10km radius
+    accuracy = data.get('accuracy', DEFAULT_ACCURACY)  # fast, ellipsoidal or exact
     
     if not user_lat or not user_lng:
-        return jsonify({'error': 'Location coordinates required'}), 400
+        raise ValueError('Location coordinates required')
     
-    conn = sqlite3.connect('news_reports.db')
+    if accuracy not in ACCURACY_MODES:
+        raise ValueError(f"accuracy must be one of {', '.join(ACCURACY_MODES)}")
+    
+    return float(user_lat), float(user_lng), radius, accuracy
+
+def find_nearby_news(user_lat, user_lng, radius, accuracy=DEFAULT_ACCURACY):
+    """Up to 10 reports nearest to a point within `radius` km, padded with sample events"""
+    conn = sqlite3.connect('news_reports.db', factory=TimedConnection)
     cursor = conn.cursor()
     
-    # Get all reports with location data
-    cursor.execute('''
+    # Only pull candidate rows inside the bounding box of the search circle
+    min_lat, max_lat, min_lng, max_lng = bounding_box(user_lat, user_lng, radius)
+    query = '''
         SELECT title, content, url, report_type, location, latitude, longitude, 
                timestamp, credibility_score
         FROM reports
         WHERE latitude IS NOT NULL AND longitude IS NOT NULL
-        ORDER BY timestamp DESC
-    ''')
+          AND latitude BETWEEN ? AND ?
+    '''
+    params = [min_lat, max_lat]
+    if min_lng is not None:
+        query += ' AND longitude BETWEEN ? AND ?'
+        params += [min_lng, max_lng]
+    query += ' ORDER BY timestamp DESC'
     
-    all_reports = cursor.fetchall()
+    cursor.execute(query, params)
+    candidates = cursor.fetchall()
     conn.close()
     
-    nearby_news = []
+    # Distance, radius filter and sort in one vectorized pass
+    lats = [report[5] for report in candidates]
+    lngs = [report[6] for report in candidates]
+    indices, distances = nearest_within_radius(user_lat, user_lng, lats, lngs, radius,
+                                               limit=10, accuracy=accuracy)
     
-    for report in all_reports:
-        if report[5] and report[6]:  # latitude and longitude exist
-            distance = geodesic((user_lat, user_lng), (report[5], report[6])).kilometers
-            
-            if distance <= radius:
-                nearby_news.append({
-                    'title': report[0],
-                    'content': report[1],
-                    'url': report[2],
-                    'type': report[3],
-                    'location': report[4],
-                    'timestamp': report[7],
-                    'credibility_score': report[8],
-                    'distance': round(distance, 1)
-                })
+    nearby_news = []
+    for index, distance in zip(indices, distances):
+        report = candidates[index]
+        nearby_news.append({
+            'title': report[0],
+            'content': report[1],
+            'url': report[2],
+            'type': report[3],
+            'location': report[4],
+            'timestamp': report[7],
+            'credibility_score': report[8],
+            'distance': round(float(distance), 1)
+        })
     
     # Add some sample critical events for demonstration
     if len(nearby_news) < 3:
-        sample_events = generate_sample_nearby_events(user_lat, user_lng, radius)
+        sample_events = generate_sample_nearby_events(user_lat, user_lng, radius, accuracy)
         nearby_news.extend(sample_events)
+        # Sort by distance
+        nearby_news.sort(key=lambda x: x['distance'])
     
-    # Sort by distance
-    nearby_news.sort(key=lambda x: x['distance'])
-    
-    return jsonify(nearby_news[:10])  # Return max 10 items
+    return nearby_news[:10]  # Return max 10 items
 
-def generate_sample_nearby_events(user_lat, user_lng, radius):
-    """Generate sample nearby events for demonstration"""
+def generate_sample_nearby_events(user_lat, user_lng, radius, accuracy=DEFAULT_ACCURACY):
+    """Generate sample nearby events for demonstration
+    
+    Seeded by the query and stamped to the hour, so repeat polls from the
+    same place get identical events (and a matching ETag).
+    """
+    sample_time = datetime.now().replace(minute=0, second=0, microsecond=0).isoformat()
     sample_events = [
         {
             'title': 'Traffic Disruption on Main Highway',
@@ -676,7 +1306,7 @@ def generate_sample_nearby_events(user_lat, user_lng, radius):
             'type': 'critical_event',
             'location': 'Highway intersection',
             'credibility_score': 85,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': sample_time
         },
         {
             'title': 'Local Weather Alert Issued',
@@ -684,7 +1314,7 @@ def generate_sample_nearby_events(user_lat, user_lng, radius):
             'type': 'critical_event',
             'location': 'Metropolitan area',
             'credibility_score': 92,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': sample_time
         },
         {
             'title': 'Community Safety Notice',
@@ -692,31 +1322,28 @@ def generate_sample_nearby_events(user_lat, user_lng, radius):
             'type': 'critical_event',
             'location': 'Downtown district',
             'credibility_score': 78,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': sample_time
         }
     ]
     
-    nearby_events = []
-    for i, event in enumerate(sample_events):
-        # Generate random coordinates within radius
-        angle = random.uniform(0, 2 * math.pi)
-        distance = random.uniform(1, radius * 0.8)
-        
-        # Calculate offset coordinates
-        lat_offset = distance * math.cos(angle) / 111.0  # Rough conversion
-        lng_offset = distance * math.sin(angle) / (111.0 * math.cos(math.radians(user_lat)))
-        
-        event_lat = user_lat + lat_offset
-        event_lng = user_lng + lng_offset
-        
-        actual_distance = geodesic((user_lat, user_lng), (event_lat, event_lng)).kilometers
-        
-        event['distance'] = round(actual_distance, 1)
-        nearby_events.append(event)
+    # Generate random coordinates within radius
+    rng = np.random.default_rng(abs(hash((round(user_lat, 3), round(user_lng, 3), radius))))
+    angles = rng.uniform(0, 2 * math.pi, len(sample_events))
+    offsets = rng.uniform(1, radius * 0.8, len(sample_events))
     
-    return nearby_events
+    # Calculate offset coordinates
+    event_lats = user_lat + offsets * np.cos(angles) / 111.0  # Rough conversion
+    event_lngs = user_lng + offsets * np.sin(angles) / (111.0 * math.cos(math.radians(user_lat)))
+    
+    actual_distances = distances_km(user_lat, user_lng, event_lats, event_lngs, accuracy)
+    
+    for event, actual_distance in zip(sample_events, actual_distances):
+        event['distance'] = round(float(actual_distance), 1)
+    
+    return sample_events
 
 @app.route('/geocode', methods=['POST'])
+@rate_limit('geocode')
 def geocode_location():
     """Convert address to coordinates"""
     data = request.json
@@ -726,22 +1353,120 @@ def geocode_location():
         return jsonify({'error': 'Address required'}), 400
     
     try:
-        geolocator = Nominatim(user_agent="news_detector")
-        location = geolocator.geocode(address)
-        
-        if location:
-            return jsonify({
-                'lat': location.latitude,
-                'lng': location.longitude,
-                'formatted_address': location.address
-            })
-        else:
-            return jsonify({'error': 'Location not found'}), 404
-            
+        location, cached = geocoder.geocode(address, timeout=GEOCODE_TIMEOUT)
+    except queue.Full:
+        response = jsonify({'error': 'Geocoding is busy, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except FutureTimeoutError:
+        return jsonify({'error': 'Geocoding timed out, please retry shortly'}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    if location:
+        return jsonify(dict(location, cached=cached))
+    return jsonify({'error': 'Location not found', 'cached': cached}), 404
+
+@app.route('/api/reverse-geocode')
+def reverse_geocode():
+    """Nearest known place for a coordinate, from the local gazetteer"""
+    try:
+        lat = float(request.args.get('lat', ''))
+        lng = float(request.args.get('lng', ''))
+    except ValueError:
+        return jsonify({'error': 'lat and lng must be numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'error': 'lat or lng out of range'}), 400
+    
+    gazetteer = get_gazetteer(GAZETTEER_PATH)
+    if gazetteer is None:
+        return jsonify({'error': 'Reverse geocoding is not available'}), 503
+    
+    place = gazetteer.reverse(lat, lng)
+    if place is None:
+        return jsonify({'error': 'No known place nearby'}), 404
+    
+    response = jsonify(place)
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@app.route('/api/cache/stats')
+@cache_control('no-store')
+def shared_cache_stats():
+    """Shared cache hit ratios per namespace, for this worker process"""
+    return jsonify(shared_cache.metrics())
+
+@app.route('/api/geocode/stats')
+@cache_control('no-store')
+def geocode_stats():
+    """Geocode cache hit rates, upstream request counts and report backlog"""
+    return jsonify(dict(geocoder.metrics(), worker=geocode_worker.metrics()))
+
+def cache_counters():
+    """Shared cache and geocoder lookups as cache_requests_total samples"""
+    samples = []
+    for namespace, counts in shared_cache.metrics().items():
+        samples.append(('cache_requests_total', {'cache': namespace, 'result': 'hit'}, counts['hits']))
+        samples.append(('cache_requests_total', {'cache': namespace, 'result': 'miss'}, counts['misses']))
+    stats = geocoder.metrics()
+    samples.append(('cache_requests_total', {'cache': 'geocode', 'result': 'hit'},
+                    stats['memory_hits_total'] + stats['cache_hits_total']))
+    samples.append(('cache_requests_total', {'cache': 'geocode', 'result': 'miss'}, stats['misses_total']))
+    return samples
+
+register_collector(cache_counters)
+
+def rate_limit_counters():
+    """Requests turned away by rate_limit, per endpoint class and reason"""
+    samples = []
+    for endpoint_class, counts in rate_limiter.metrics().items():
+        if endpoint_class == 'tracked_clients':
+            continue
+        samples.append(('rate_limited_total', {'class': endpoint_class, 'reason': 'client_budget'}, counts['limited_total']))
+        samples.append(('rate_limited_total', {'class': endpoint_class, 'reason': 'upstream_busy'}, counts['shed_total']))
+    return samples
+
+register_collector(rate_limit_counters)
+
+def analysis_job_counters():
+    """Finished and retried analysis jobs per lane"""
+    samples = []
+    for lane, counts in job_queue.metrics().items():
+        if lane == 'workers':
+            continue
+        for outcome in ('succeeded', 'failed', 'retried'):
+            samples.append(('analysis_jobs_total', {'lane': lane, 'outcome': outcome}, counts[f'{outcome}_total']))
+    return samples
+
+register_collector(analysis_job_counters)
+
+def url_fetch_counters():
+    """Links served fresh from cache, fetched, revalidated or failed"""
+    stats = url_ingester.metrics()
+    samples = [('url_fetches_total', {'result': result}, stats[f'{result}_total'])
+               for result in ('fresh', 'fetched', 'not_modified')]
+    samples.extend(('url_fetches_total', {'result': f'error_{reason}'}, count)
+                   for reason, count in stats['errors_total'].items())
+    return samples
+
+register_collector(url_fetch_counters)
+
+def start_background_jobs():
+    """Nightly maintenance and the geocode worker, in one server process per host
+    
+    Every worker calls this; a lock file picks the one that runs the jobs.
+    The analysis job workers run in every process, so queued jobs continue
+    after a restart.
+    """
+    job_queue.start()
+    def start():
+        MaintenanceScheduler('news_reports.db', ARCHIVE_DB_PATH, ARCHIVE_MAX_AGE_DAYS, MAINTENANCE_HOUR_UTC).start()
+        geocode_worker.start()
+    
+    run_in_one_process(os.environ.get('BACKGROUND_JOBS_LOCK', 'news_reports.db.jobs.lock'), start)
 
 if __name__ == '__main__':
     init_db()
+    start_background_jobs()
     port = int(os.environ.get('PORT', 8080))
     app.run(debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,512 @@
+"""
+ASGI entry point: upstream-bound routes on async clients, the rest on Flask
+
+The Flask views that wait on a third party (/api/chatbot on DeepSeek,
+/latest-news and /news on NewsAPI, /geocode on Nominatim) hold a server
+thread for as long as the upstream takes. Here they are served by
+coroutines using AsyncOpenAI and httpx.AsyncClient, so thousands of
+in-flight upstream waits share one event loop. /nearby-news runs its SQLite
+query on a worker thread for the same reason.
+
+These views reuse app.py's helpers, templates and after_request hooks
+(ETags, compression, Cache-Control), so responses match the WSGI ones.
+Every other route is passed through to the Flask app on a thread pool,
+streaming responses such as /api/events included. Request bodies are
+streamed to those routes as they arrive, so /api/reports/bulk parses an
+upload without it ever being held in memory whole.
+
+Run with `python serve.py` (gunicorn with uvicorn workers), or
+`uvicorn asgi:app --host 0.0.0.0 --port $PORT` for a single process.
+Background jobs (geocode worker, nightly maintenance) start on the ASGI
+lifespan startup event, in one worker per host.
+"""
+import asyncio
+import contextvars
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from io import BytesIO
+import queue
+import sqlite3
+
+import httpx
+from flask import jsonify, render_template, request
+from openai import AsyncOpenAI
+from werkzeug.exceptions import HTTPException
+
+import app as flask_module
+from app import app as flask_app
+from geocoder import normalize_address
+from metrics import timed
+from tracing import current_span, span
+
+# Threads for the Flask routes and for blocking work of the async views
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 64))
+# Streamed Flask responses (event streams, exports) hold a thread while they
+# wait for their next chunk, so they get a pool of their own
+STREAM_THREADS = int(os.environ.get('ASGI_STREAM_THREADS', 600))
+UPSTREAM_TIMEOUT = float(os.environ.get('ASGI_UPSTREAM_TIMEOUT', 30))
+MAX_CONNECTIONS = int(os.environ.get('ASGI_MAX_CONNECTIONS', 200))
+# The async views take small JSON bodies, read into memory before they run.
+# Bodies for the Flask routes are streamed to them instead (see RequestBody).
+MAX_ASYNC_BODY_BYTES = int(os.environ.get('ASGI_MAX_ASYNC_BODY_BYTES', 1024 * 1024))
+BODY_QUEUE_CHUNKS = 16
+
+_executor = ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+_stream_executor = ThreadPoolExecutor(STREAM_THREADS, thread_name_prefix='asgi-stream')
+
+deepseek_client = AsyncOpenAI(
+    api_key=flask_module.deepseek_api_key,
+    base_url="https://api.deepseek.com",
+    timeout=UPSTREAM_TIMEOUT
+)
+http_client = httpx.AsyncClient(
+    timeout=UPSTREAM_TIMEOUT,
+    limits=httpx.Limits(max_connections=MAX_CONNECTIONS)
+)
+
+
+async def run_blocking(function, *args):
+    """Run a blocking call on the shared thread pool"""
+    # In a copy of this context, so spans opened there join the request's trace
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(context.run, function, *args))
+
+
+async def cached(namespace, key, ttl, compute, cacheable=None):
+    """Async SharedCache.get_or_set: `compute` is a coroutine function"""
+    shared_cache = flask_module.shared_cache
+    try:
+        value = await run_blocking(shared_cache.get, namespace, key)
+    except sqlite3.Error as e:
+        print(f"Shared cache read error: {e}")
+        value = None
+    if value is not None:
+        return value
+
+    value = await compute()
+    if value is not None and (cacheable is None or cacheable(value)):
+        try:
+            await run_blocking(shared_cache.set, namespace, key, value, ttl)
+        except sqlite3.Error as e:
+            print(f"Shared cache write error: {e}")
+    return value
+
+
+# --- Async views: same URLs, templates and JSON shapes as app.py ---
+
+async def get_chatbot_response(user_message, analysis_type='full'):
+    """Async counterpart of app.get_chatbot_response"""
+    content = user_message
+    try:
+        pages = await run_blocking(flask_module.linked_pages, user_message)
+        content = flask_module.with_linked_pages(user_message, pages)
+        reply, messages = flask_module.prepare_chatbot_request(user_message, analysis_type, content)
+        if reply is not None:
+            return reply
+
+        with span('chatbot.response', analysis_type=analysis_type) as step:
+            step.set('cache.hit', True)
+
+            async def ask_deepseek():
+                step.set('cache.hit', False)
+                with timed('upstream_request_duration_seconds', upstream='deepseek'):
+                    response = await deepseek_client.chat.completions.create(
+                        model=flask_module.CHATBOT_MODEL,
+                        messages=messages,
+                        max_tokens=flask_module.CHATBOT_MAX_TOKENS,
+                        temperature=flask_module.CHATBOT_TEMPERATURE
+                    )
+                    if response.usage is not None:
+                        current_span().set('llm.total_tokens', response.usage.total_tokens)
+                return flask_module.chatbot_result(response.choices[0].message.content, content, analysis_type)
+
+            return await cached('chatbot', flask_module.chatbot_cache_key(messages, analysis_type),
+                                flask_module.CHATBOT_CACHE_TTL, ask_deepseek)
+
+    except Exception as e:
+        print(f"DeepSeek API error: {e}")
+        return flask_module.chatbot_fallback(content, analysis_type)
+
+
+async def fetch_todays_news(country='us', category=None, page_size=20):
+    """Async counterpart of app.fetch_todays_news"""
+    try:
+        params = flask_module.top_headlines_params(country, category, page_size)
+
+        with span('news.fetch', country=country, category=category or '', page_size=page_size) as step:
+            step.set('cache.hit', True)
+
+            async def request_headlines():
+                step.set('cache.hit', False)
+                with timed('upstream_request_duration_seconds', upstream='newsapi'):
+                    response = await http_client.get(f"{flask_module.news_api_base_url}/top-headlines", params=params)
+                    current_span().set('http.status_code', response.status_code)
+                    response.raise_for_status()
+                return response.json()
+
+            data = await cached('newsapi', flask_module.news_cache_key(params), flask_module.NEWS_CACHE_TTL,
+                                request_headlines, cacheable=flask_module.news_cacheable)
+            articles = flask_module.news_articles(data)
+            step.set('article.count', len(articles))
+            return articles
+
+    except httpx.HTTPError as e:
+        print(f"Request error: {e}")
+        return []
+    except Exception as e:
+        print(f"Error fetching news: {e}")
+        return []
+
+
+async def api_chatbot():
+    data = request.json
+    user_message = data.get('message', '')
+    analysis_type = data.get('analysis_type', 'comprehensive')
+
+    if not user_message:
+        return jsonify({'success': False, 'error': 'No message provided'})
+
+    try:
+        response_data = await get_chatbot_response(user_message, analysis_type)
+
+        return jsonify({
+            'success': True,
+            'response': response_data['response'],
+            'credibility_score': response_data['credibility_score'],
+            'analysis_type': response_data['analysis_type'],
+            'sources_checked': response_data['sources_checked'],
+            'bias_detected': response_data['bias_detected']
+        })
+    except Exception as e:
+        print(f"Chatbot API error: {e}")
+        return jsonify({'success': False, 'error': 'Internal server error'})
+
+
+async def latest_news():
+    try:
+        articles = await fetch_todays_news(page_size=15)
+        print(f"Fetched {len(articles)} articles")
+
+        if not articles:
+            return render_template('latest-news.html', articles=[], error="No news articles available at this time")
+
+        # Scoring and rendering are CPU work; they must not hold up the event loop
+        articles = await run_blocking(flask_module.analyze_latest_articles, articles)
+        return await run_blocking(lambda: render_template('latest-news.html', articles=articles))
+
+    except Exception as e:
+        print(f"Error in latest_news route: {e}")
+        return render_template('latest-news.html', articles=[], error=f"Unable to fetch news: {str(e)}")
+
+
+async def unified_news():
+    # HTML parsing of the saved pages runs alongside the NewsAPI request
+    news_task = asyncio.ensure_future(fetch_todays_news(page_size=10))
+
+    social_posts = []
+    try:
+        social_posts = await run_blocking(flask_module.scored_social_posts)
+    except Exception as e:
+        print(f"Error fetching social posts: {e}")
+
+    articles = []
+    try:
+        articles = await news_task
+        with span('news.score_articles', article_count=len(articles)):
+            articles = await run_blocking(
+                lambda: [flask_module.analyze_news_article_credibility(article) for article in articles])
+    except Exception as e:
+        print(f"Error fetching news articles: {e}")
+
+    try:
+        return await run_blocking(lambda: render_template(
+            'unified_news.html', articles=articles, social_posts=social_posts))
+    except Exception as e:
+        print(f"Error in unified_news route: {e}")
+        return render_template('unified_news.html', articles=[], social_posts=[])
+
+
+async def geocode_location():
+    data = request.json
+    address = data.get('address')
+
+    if not address:
+        return jsonify({'error': 'Address required'}), 400
+
+    geocoder = flask_module.geocoder
+    key = normalize_address(address)
+    try:
+        cached, location = await run_blocking(geocoder.cached, key) if key else (True, None)
+        if not cached:
+            # Shielded: a timed-out waiter must not cancel a lookup other
+            # requests are sharing
+            pending = asyncio.wrap_future(geocoder.submit(address, key))
+            location = await asyncio.wait_for(asyncio.shield(pending), flask_module.GEOCODE_TIMEOUT)
+    except queue.Full:
+        response = jsonify({'error': 'Geocoding is busy, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except (asyncio.TimeoutError, FutureTimeoutError):
+        return jsonify({'error': 'Geocoding timed out, please retry shortly'}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if location:
+        return jsonify(dict(location, cached=cached))
+    return jsonify({'error': 'Location not found', 'cached': cached}), 404
+
+
+async def get_nearby_news():
+    data = request.args if request.method == 'GET' else request.json
+    try:
+        query = flask_module.parse_nearby_query(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(await run_blocking(flask_module.find_nearby_news, *query))
+
+
+# Flask endpoint name -> async view
+ASYNC_VIEWS = {
+    'api_chatbot': api_chatbot,
+    'latest_news': latest_news,
+    'unified_news': unified_news,
+    'geocode_location': geocode_location,
+    'get_nearby_news': get_nearby_news
+}
+
+
+# --- ASGI plumbing ---
+
+def _environ(scope, body_stream):
+    """WSGI environ for an ASGI HTTP scope, reading the body from `body_stream`"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body_stream,
+        # Werkzeug reads the stream to its end when there is no Content-Length
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _read_body(receive, limit):
+    """Whole body, None on disconnect, or False when it is over `limit` bytes"""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        size += len(chunks[-1])
+        if size > limit:
+            return False
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+class RequestBody:
+    """Request body streamed from the event loop to a WSGI worker thread
+
+    The only reader of ASGI receive() for a Flask route. pump() runs on the
+    loop and queues body chunks as they arrive, at most BODY_QUEUE_CHUNKS
+    ahead of the view, so a large upload such as /api/reports/bulk is never
+    held in memory whole. After the body it keeps listening, to notice
+    the client going away. The view reads through the file-like side
+    (read, readline, iteration) on its worker thread.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunks = asyncio.Queue(BODY_QUEUE_CHUNKS)
+        self._buffer = b''
+        self._eof = False
+        self.disconnected = asyncio.Event()
+
+    async def pump(self):
+        complete = False
+        while True:
+            message = await self._receive()
+            if message['type'] == 'http.disconnect':
+                self.disconnected.set()
+                if not complete and not self._chunks.full():
+                    # Wakes a reader waiting for more; a full queue is drained first
+                    self._chunks.put_nowait(b'')
+                return
+            if complete:
+                continue
+            body = message.get('body', b'')
+            if body:
+                await self._chunks.put(body)
+            if not message.get('more_body'):
+                complete = True
+                await self._chunks.put(b'')
+
+    async def _next_chunk(self):
+        if self._chunks.empty() and self.disconnected.is_set():
+            return b''
+        return await self._chunks.get()
+
+    def _fill(self):
+        # On the worker thread: wait for the loop to hand over the next chunk
+        if self._eof:
+            return False
+        chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while self._fill():
+                pass
+            data, self._buffer = self._buffer, b''
+            return data
+        while len(self._buffer) < size and self._fill():
+            pass
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        while b'\n' not in self._buffer and (size is None or size < 0 or len(self._buffer) < size) and self._fill():
+            pass
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        if size is not None and size >= 0:
+            end = min(end, size)
+        data, self._buffer = self._buffer[:end], self._buffer[end:]
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+
+def _headers(header_list):
+    return [(name.encode('latin-1'), value.encode('latin-1')) for name, value in header_list]
+
+
+async def _serve_async(view, environ, send):
+    # Mirrors Flask.full_dispatch_request, so before/after_request hooks
+    # and error handlers apply as they do on the WSGI path
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view()
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            response = flask_app.handle_exception(e)
+        body = response.get_data() if environ['REQUEST_METHOD'] != 'HEAD' else b''
+        status, headers = response.status_code, _headers(response.headers.to_wsgi_list())
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _serve_wsgi(environ, body, send):
+    loop = asyncio.get_running_loop()
+    started = {}
+    disconnected = body.disconnected
+
+    def start_response(status, header_list, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = _headers(header_list)
+
+    # One context for the whole response: a stream_with_context generator
+    # pushes the request context on its first chunk and pops it on the last,
+    # and those may run on different pool threads
+    context = contextvars.copy_context()
+    pump = asyncio.ensure_future(body.pump())
+    iterable = None
+    try:
+        iterable = await loop.run_in_executor(_executor, context.run, flask_app, environ, start_response)
+        chunks = iter(iterable)
+        # Buffered responses are done after the first chunk; only streams
+        # reach the second, which may block for a long time
+        chunk = await loop.run_in_executor(_executor, context.run, next, chunks, None)
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not None and not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(_stream_executor, context.run, next, chunks, None)
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        pump.cancel()
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(_executor, context.run, close)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await run_blocking(flask_module.init_db)
+            flask_module.start_background_jobs()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await http_client.aclose()
+            await deepseek_client.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = RequestBody(receive, asyncio.get_running_loop())
+    environ = _environ(scope, body)
+    try:
+        endpoint, _ = flask_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        endpoint = None
+    view = ASYNC_VIEWS.get(endpoint)
+    if view is None:
+        await _serve_wsgi(environ, body, send)
+        return
+
+    data = await _read_body(receive, MAX_ASYNC_BODY_BYTES)
+    if data is None:
+        return
+    if data is False:
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': b'{"success": false, "error": "Request body too large"}'})
+        return
+    environ['wsgi.input'] = BytesIO(data)
+    environ['CONTENT_LENGTH'] = str(len(data))
+    await _serve_async(view, environ, send)
@@ -0,0 +1,239 @@
+"""
+Per-page CSS/JS bundles with fingerprinted filenames
+
+`python assets.py` concatenates and minifies each bundle in BUNDLES into
+static/dist/<bundle>.<hash>.<ext> (plus a gzipped twin) and records them in
+static/dist/manifest.json. It also generates static/dist/sw.js from the
+hand-written sw.js: the precache list becomes the built files and the cache
+name is derived from their hashes, so any asset change rotates the service
+worker cache.
+
+Templates call asset_tags('<bundle>'). With a build present this emits one
+fingerprinted tag, otherwise one tag per source file, so development works
+without a build. Built files never change once written and are served with
+a one-year immutable Cache-Control.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+CACHE_NAME_PREFIX = 'civic-lens-solutions'
+
+# Bundle name -> source files in static/, in the order the page loaded them
+BUNDLES = {
+    'chatbot.css': ['civic-lens-design-system.css', 'ultra-index.css', 'chatbot-unified.css',
+                    'unified-header-footer.css'],
+    'chatbot.js': ['script.js', 'chatbot-3d.js', 'mobile-2025.js'],
+    'civic-chatbot.css': ['civic-lens-design-system.css', 'unified-header-footer.css', 'civic-chatbot.css'],
+    'civic-chatbot.js': ['civic-chatbot.js'],
+    'dashboard.css': ['civic-lens-design-system.css', 'dashboard-unified.css', 'unified-header-footer.css'],
+    'dashboard.js': ['dashboard.js'],
+    'enhanced-chatbot.css': ['civic-lens-design-system.css', 'unified-header-footer.css', 'enhanced-chatbot.css'],
+    'enhanced-chatbot.js': ['script.js', 'mobile-2025.js', 'enhanced-chatbot.js'],
+    'index.css': ['civic-lens-design-system.css', 'style.css', 'unified-header-footer.css', 'ultra-index.css'],
+    'latest-news.css': ['style.css', 'style-professional.css', 'unified-header-footer.css'],
+    'map.css': ['civic-lens-design-system.css', 'ultra-index.css', 'map-unified.css', 'unified-header-footer.css'],
+    'near-me.css': ['civic-lens-design-system.css', 'unified-header-footer.css', 'near-me.css'],
+    'near-me.js': ['near-me.js'],
+    'news.css': ['civic-lens-design-system.css', 'style.css', 'unified-header-footer.css'],
+    'report.css': ['civic-lens-design-system.css', 'ultra-index.css', 'report-unified.css',
+                   'unified-header-footer.css'],
+    'site.js': ['script.js', 'mobile-2025.js'],
+    'ultra-index.css': ['civic-lens-design-system.css', 'ultra-index.css', 'unified-header-footer.css'],
+    'ultra-index.js': ['ultra-index.js'],
+    'ultra-map.css': ['civic-lens-design-system.css', 'ultra-map.css', 'unified-header-footer.css',
+                      'ultra-index.css'],
+    'ultra-map.js': ['ultra-map.js']
+}
+
+# Pages precached by the service worker alongside the built bundles
+PRECACHE_PAGES = ['/', '/map', '/report', '/chatbot']
+PRECACHE_STATIC = ['logo.png']
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,])\s*')
+_JS_TOP_LEVEL_BINDING = re.compile(r'^(?:const|let|class)\s+([A-Za-z_$][\w$]*)', re.M)
+_CSS_RELATIVE_URL = re.compile(r'''url\((['"]?)(?![a-z]+:|/|#|data:)''', re.I)
+
+
+def minify_css(text):
+    text = _CSS_COMMENT.sub('', text)
+    text = re.sub(r'\s+', ' ', text)
+    # Spaces before ':' are left alone: "a :hover" and "a:hover" differ
+    text = _CSS_SPACE_AROUND.sub(r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Conservative line-based minifier: drops comment lines, indentation and blank lines
+
+    Newlines are kept, so automatic semicolon insertion behaves as before.
+    """
+    lines = []
+    in_comment = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if in_comment:
+            in_comment = '*/' not in stripped
+            continue
+        if stripped.startswith('/*'):
+            in_comment = '*/' not in stripped
+            continue
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines)
+
+
+def _check_js_bindings(bundle, sources):
+    # Classic scripts share one global scope, but a duplicate top-level
+    # const/let/class only breaks the second file; in a bundle it breaks all
+    seen = {}
+    for filename, text in sources:
+        for name in _JS_TOP_LEVEL_BINDING.findall(text):
+            if name in seen:
+                raise ValueError(f"{bundle}: '{name}' is declared in both {seen[name]} and {filename}")
+            seen[name] = filename
+
+
+def build_bundle(static_dir, bundle):
+    """Minified content of one bundle"""
+    sources = []
+    for filename in BUNDLES[bundle]:
+        with open(os.path.join(static_dir, filename), encoding='utf-8') as f:
+            sources.append((filename, f.read()))
+
+    if bundle.endswith('.js'):
+        _check_js_bindings(bundle, sources)
+        # A leading ';' guards against a file that ends without one
+        return '\n'.join(f';/* {filename} */\n{minify_js(text)}' for filename, text in sources)
+
+    # Bundles live one directory below the sources, so relative url()s move up one
+    return '\n'.join(f'/* {filename} */\n' + minify_css(_CSS_RELATIVE_URL.sub(r'url(\1../', text))
+                     for filename, text in sources)
+
+
+def _generate_service_worker(template_path, static_url, built):
+    with open(template_path, encoding='utf-8') as f:
+        template = f.read()
+
+    version = hashlib.sha256(''.join(sorted(built.values())).encode('utf-8')).hexdigest()[:10]
+    urls = PRECACHE_PAGES + [f'{static_url}/{filename}' for filename in PRECACHE_STATIC] + \
+        [f'{static_url}/{DIST_DIR}/{filename}' for filename in sorted(built.values())]
+
+    worker = re.sub(r"const CACHE_NAME = '[^']*';", f"const CACHE_NAME = '{CACHE_NAME_PREFIX}-{version}';",
+                    template, count=1)
+    worker = re.sub(r'const urlsToCache = \[.*?\];', 'const urlsToCache = ' + json.dumps(urls, indent=2) + ';',
+                    worker, count=1, flags=re.S)
+    return worker
+
+
+def build(static_dir='static', sw_template='sw.js', static_url='/static'):
+    """Build every bundle and the service worker; returns the manifest"""
+    dist = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+
+    built = {}
+    for bundle in BUNDLES:
+        content = build_bundle(static_dir, bundle).encode('utf-8')
+        stem, ext = os.path.splitext(bundle)
+        filename = f'{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}'
+        with open(os.path.join(dist, filename), 'wb') as f:
+            f.write(content)
+        with open(os.path.join(dist, filename + '.gz'), 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        built[bundle] = filename
+
+    with open(os.path.join(dist, 'sw.js'), 'w', encoding='utf-8') as f:
+        f.write(_generate_service_worker(sw_template, static_url, built))
+
+    manifest = {'bundles': built, 'sources': BUNDLES}
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Files from earlier builds are no longer referenced
+    keep = set(built.values()) | {name + '.gz' for name in built.values()} | {'sw.js', MANIFEST_NAME}
+    for name in os.listdir(dist):
+        if name not in keep:
+            os.remove(os.path.join(dist, name))
+
+    return manifest
+
+
+def _load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def init_assets(app, sw_template):
+    """Register asset_tags() for templates and the /sw.js and /static/dist routes"""
+    static_dir = app.static_folder
+    dist = os.path.join(static_dir, DIST_DIR)
+    manifest = _load_manifest(static_dir)
+    if manifest is None:
+        print("Asset bundles not built; serving individual static files (run python assets.py)")
+
+    def tag(url, bundle):
+        url = escape(url)
+        if bundle.endswith('.css'):
+            return f'<link rel="stylesheet" href="{url}">'
+        return f'<script src="{url}"></script>'
+
+    def asset_tags(bundle):
+        if manifest and bundle in manifest['bundles']:
+            return Markup(tag(url_for('dist_asset', filename=manifest['bundles'][bundle]), bundle))
+        return Markup('\n    '.join(tag(url_for('static', filename=source), bundle) for source in BUNDLES[bundle]))
+
+    app.jinja_env.globals['asset_tags'] = asset_tags
+
+    @app.route(f'{app.static_url_path}/{DIST_DIR}/<path:filename>')
+    def dist_asset(filename):
+        """Fingerprinted bundle, precompressed when the client accepts gzip"""
+        gzipped = filename + '.gz'
+        if request.accept_encodings['gzip'] and os.path.exists(os.path.join(dist, gzipped)):
+            response = send_from_directory(dist, gzipped, mimetype=_mimetype(filename))
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_from_directory(dist, filename)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        return response
+
+    @app.route('/sw.js')
+    def service_worker():
+        """Generated service worker when built, the hand-written one otherwise"""
+        if os.path.exists(os.path.join(dist, 'sw.js')):
+            response = send_from_directory(dist, 'sw.js', mimetype='application/javascript')
+        else:
+            directory, name = os.path.split(os.path.abspath(sw_template))
+            response = send_from_directory(directory, name, mimetype='application/javascript')
+        # Browsers must always see a new build's cache name
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+def _mimetype(filename):
+    return 'text/css' if filename.endswith('.css') else 'application/javascript'
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.abspath(__file__))
+    try:
+        result = build(os.path.join(root, 'static'), os.path.join(root, 'sw.js'))
+    except (OSError, ValueError) as e:
+        sys.exit(f"Asset build failed: {e}")
+    for bundle, filename in result['bundles'].items():
+        print(f"{bundle} -> {DIST_DIR}/{filename}")
@@ -0,0 +1,366 @@
+"""
+Offline benchmarks for the hot paths, with stored baselines
+
+    python benchmark.py run [--quick] [--only TEXT] [--rounds N] [--output results.json]
+    python benchmark.py compare results.json [--baseline FILE] [--threshold 0.25] [--confirm N]
+    python benchmark.py baseline [--quick] [--only TEXT] [--rounds N]
+
+`run` times every case and writes the results as JSON. `compare` checks
+them against the stored baseline (benchmarks/baseline.json) and exits 1
+when any case's median got slower by more than `threshold` (25% by
+default). A case over the threshold is first run again `confirm` times
+(3 by default), and fails only if even its fastest run is over. `baseline`
+runs the cases and stores the results as the new baseline, keeping
+entries for cases it did not run.
+
+Inputs come from benchmark_data.py, seeded, and are cached in
+BENCH_DATA_DIR (default benchmarks/data). The 1M-report database and the
+50MB page take a few minutes to build the first time; --quick skips them.
+No network access is needed: the cases never reach DeepSeek, NewsAPI or
+Nominatim.
+
+Each case runs in a fresh process, from the directory of its dataset, so
+one case's caches and write queue cannot skew the next. That process also
+times a fixed pure-Python calibration loop, and cases are compared by
+their time relative to it. A baseline recorded on a faster or slower
+machine, or a process that landed on a slower core, still compares
+fairly. On noisy shared machines, --rounds runs each case several times
+and keeps the fastest round. `baseline` does 3 rounds by default, so that
+one lucky run does not become the time every later run is held to.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import benchmark_data
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DATA_DIR = os.environ.get('BENCH_DATA_DIR', os.path.join(ROOT, 'benchmarks', 'data'))
+DEFAULT_THRESHOLD = 0.25
+BASELINE_ROUNDS = 3
+CONFIRM_ROUNDS = 3
+
+# Nearby-news queries: near the city centres, at the edge of a cluster, and
+# in open ocean where nothing matches and sample events are padded in
+NEARBY_POINTS = [(lat + dlat, lng + dlng) for _, lat, lng in benchmark_data.CITIES
+                 for dlat, dlng in ((0.0, 0.0), (0.3, -0.2))] + [(0.0, -140.0), (-45.0, 90.0)]
+INSERT_BATCH = 200
+
+
+def measure(run, repeat, number=1, warmup=1):
+    """Per-operation timings of run(), which performs `number` operations"""
+    for _ in range(warmup):
+        run()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) / number)
+    samples.sort()
+    return {
+        'median': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'min': samples[0],
+        'repeat': repeat,
+        'number': number
+    }
+
+
+def calibrate():
+    """Seconds for a fixed pure-Python workload, the speed yardstick"""
+    def workload():
+        table = {}
+        for i in range(200000):
+            table[i % 1000] = table.get(i % 1000, 0) + len(str(i))
+        return sorted(table.items())
+    return measure(workload, repeat=7)['median']
+
+
+# --- Cases: each returns measure(...) and runs in its own process ---
+
+def scorer_case(words, language):
+    def case():
+        from app import analyze_news_credibility
+        texts = [benchmark_data.news_text(words, language, seed=seed) for seed in range(20)]
+        return measure(lambda: [analyze_news_credibility(text) for text in texts],
+                       repeat=10, number=len(texts))
+    return case
+
+
+def extract_score_case(chars, score):
+    def case():
+        from app import extract_credibility_score
+        texts = [benchmark_data.llm_output(chars, score, seed=seed) for seed in range(20)]
+        return measure(lambda: [extract_credibility_score(text) for text in texts],
+                       repeat=20, number=len(texts))
+    return case
+
+
+def html_case(extractor, size_mb):
+    def case():
+        import html_parser
+        extract = getattr(html_parser, extractor)
+        path = snapshot_path(size_mb)
+        return measure(lambda: extract(path), repeat=3 if size_mb >= 10 else 7)
+    return case
+
+
+def nearby_case():
+    from app import app
+    client = app.test_client()
+
+    def run():
+        for lat, lng in NEARBY_POINTS:
+            response = client.get(f'/nearby-news?lat={lat}&lng={lng}&radius=10')
+            assert response.status_code == 200, response.status_code
+    return measure(run, repeat=5, number=len(NEARBY_POINTS))
+
+
+def listing_case(query, pages=1):
+    def case():
+        from app import app
+        client = app.test_client()
+
+        def run():
+            url = f'/reports?{query}'
+            for _ in range(pages):
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+                url = f"/reports?{query}&cursor={response.headers['X-Next-Cursor']}"
+        return measure(run, repeat=20, number=pages)
+    return case
+
+
+def insert_case():
+    import app as flask_module
+    client = flask_module.app.test_client()
+    rows = benchmark_data.report_rows(INSERT_BATCH * 12, seed=1)
+
+    def run():
+        # Acknowledged on enqueue; timed until the write-behind queue commits them
+        target = flask_module.write_queue.metrics()['written_total'] + INSERT_BATCH
+        for _ in range(INSERT_BATCH):
+            title, content, url, report_type, location, lat, lng = next(rows)[:7]
+            response = client.post('/report', json={
+                'title': title, 'content': content, 'url': url, 'type': report_type,
+                'location': location, 'latitude': lat, 'longitude': lng
+            })
+            assert response.status_code == 200, response.status_code
+        while flask_module.write_queue.metrics()['written_total'] < target:
+            time.sleep(0.001)
+    return measure(run, repeat=10, number=INSERT_BATCH)
+
+
+# name: (function, dataset, full runs only)
+CASES = {
+    'scorer.en.short': (scorer_case(30, 'en'), None, False),
+    'scorer.en.long': (scorer_case(2000, 'en'), None, False),
+    'scorer.ar.short': (scorer_case(30, 'ar'), None, False),
+    'scorer.ar.long': (scorer_case(2000, 'ar'), None, False),
+    'extract_score.llm_4k': (extract_score_case(4000, True), None, False),
+    'extract_score.llm_4k_unscored': (extract_score_case(4000, False), None, False),
+    'extract_score.llm_16k_unscored': (extract_score_case(16000, False), None, False),
+    'html.twitter.1mb': (html_case('extract_twitter_content', 1), 'html-1', False),
+    'html.twitter.10mb': (html_case('extract_twitter_content', 10), 'html-10', False),
+    'html.twitter.50mb': (html_case('extract_twitter_content', 50), 'html-50', True),
+    'html.facebook.1mb': (html_case('extract_facebook_content', 1), 'html-1', False),
+    'html.facebook.10mb': (html_case('extract_facebook_content', 10), 'html-10', False),
+    'html.facebook.50mb': (html_case('extract_facebook_content', 50), 'html-50', True),
+    'nearby.1k': (nearby_case, 'reports-1000', False),
+    'nearby.100k': (nearby_case, 'reports-100000', False),
+    'nearby.1m': (nearby_case, 'reports-1000000', True),
+    'reports.list.first_page': (listing_case('limit=50'), 'reports-100000', False),
+    'reports.list.deep_pages': (listing_case('limit=50', pages=20), 'reports-100000', False),
+    'reports.list.by_type': (listing_case('limit=50&type=critical_event'), 'reports-100000', False),
+    'reports.insert': (insert_case, 'reports-100000', False),
+}
+
+
+def snapshot_path(size_mb):
+    return os.path.join(DATA_DIR, f'html-{size_mb}', 'snapshot.html')
+
+
+def ensure_dataset(dataset):
+    """Directory of a dataset, generated on first use"""
+    directory = os.path.join(DATA_DIR, dataset)
+    kind, size = dataset.split('-')
+    if kind == 'html':
+        if not os.path.exists(snapshot_path(int(size))):
+            print(f"Generating {size}MB HTML snapshot...", file=sys.stderr)
+            os.makedirs(directory, exist_ok=True)
+            benchmark_data.social_snapshot(snapshot_path(int(size)) + '.tmp', int(size))
+            os.replace(snapshot_path(int(size)) + '.tmp', snapshot_path(int(size)))
+    elif not os.path.exists(os.path.join(directory, 'news_reports.db')):
+        print(f"Generating {int(size):,} reports...", file=sys.stderr)
+        benchmark_data.reports_db(directory, int(size))
+    return directory
+
+
+def relative(timings):
+    return timings['median'] / timings['calibration_seconds']
+
+
+def run_case(name, rounds=1):
+    """Timings of the fastest of `rounds` runs of a case"""
+    results = [run_case_once(name) for _ in range(rounds)]
+    return min(results, key=relative)
+
+
+def run_case_once(name):
+    """Run one case in a child process and return its timings"""
+    _, dataset, _ = CASES[name]
+    cwd = scratch = None
+    if dataset and dataset.startswith('reports-'):
+        cwd = ensure_dataset(dataset)
+        if name == 'reports.insert':
+            # Inserts work on a throwaway copy so the dataset stays as generated
+            scratch = tempfile.mkdtemp(prefix='bench-')
+            shutil.copy(os.path.join(cwd, 'news_reports.db'), scratch)
+            cwd = scratch
+    elif dataset:
+        ensure_dataset(dataset)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '_case', name],
+                                   cwd=cwd or ROOT, env=env, capture_output=True, text=True)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{completed.stderr[-2000:]}")
+    # The app prints startup notices; the result is the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def selected_cases(quick=False, only=None):
+    return [name for name, (_, _, full_only) in CASES.items()
+            if not (quick and full_only) and (not only or only in name)]
+
+
+def run_all(names, rounds=1):
+    results = {
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'cases': {}
+    }
+    for name in names:
+        timings = run_case(name, rounds)
+        results['cases'][name] = timings
+        print(f"{name:34} {format_seconds(timings['median']):>10}/op  p95 {format_seconds(timings['p95'])}",
+              file=sys.stderr)
+    return results
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f'{seconds:.2f}s'
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.2f}ms'
+    return f'{seconds * 1e6:.1f}us'
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table; return the names of regressed cases"""
+    regressions = []
+    for name, timings in sorted(results['cases'].items()):
+        expected = baseline['cases'].get(name)
+        if expected is None:
+            print(f"{name:34} {format_seconds(timings['median']):>10}  (no baseline)")
+            continue
+        # The baseline's time, as it would be at this process's speed
+        scaled = expected['median'] * timings['calibration_seconds'] / expected['calibration_seconds']
+        change = relative(timings) / relative(expected) - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:34} {format_seconds(timings['median']):>10}  vs {format_seconds(scaled):>10}"
+              f"  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def load_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for the hot paths')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ('run', 'baseline'):
+        sub = commands.add_parser(command)
+        sub.add_argument('--quick', action='store_true', help='skip the 1M-report and 50MB cases')
+        sub.add_argument('--only', help='run the cases whose name contains this text')
+        sub.add_argument('--rounds', type=int, default=BASELINE_ROUNDS if command == 'baseline' else 1,
+                         help='runs per case, keeping the fastest')
+        if command == 'run':
+            sub.add_argument('--output', help='write the results here (default: stdout)')
+    sub = commands.add_parser('compare')
+    sub.add_argument('results')
+    sub.add_argument('--baseline', default=BASELINE_PATH)
+    sub.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    sub.add_argument('--confirm', type=int, default=CONFIRM_ROUNDS,
+                     help='runs of a regressed case before failing; 0 trusts the results file')
+    sub = commands.add_parser('_case')
+    sub.add_argument('name')
+    args = parser.parse_args(argv)
+
+    if args.command == '_case':
+        # Calibrated on both sides of the case, keeping the faster
+        before = calibrate()
+        timings = CASES[args.name][0]()
+        timings['calibration_seconds'] = min(before, calibrate())
+        print(json.dumps(timings))
+        return 0
+
+    if args.command == 'compare':
+        results, baseline = load_json(args.results), load_json(args.baseline)
+        regressions = compare(results, baseline, args.threshold)
+        rerun = [name for name in regressions if name in CASES]
+        if rerun and args.confirm > 0:
+            # A single slow run is usually noise; the fastest of a few is not
+            print(f"Running {len(rerun)} regressed case(s) {args.confirm} more times to confirm...")
+            confirmed = {'cases': {name: min(results['cases'][name], run_case(name, args.confirm), key=relative)
+                                   for name in rerun}}
+            regressions = [name for name in regressions if name not in rerun] + \
+                compare(confirmed, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        return 0
+
+    names = selected_cases(args.quick, args.only)
+    if not names:
+        sys.exit(f"No case matches {args.only!r}")
+    results = run_all(names, args.rounds)
+
+    if args.command == 'baseline':
+        # Cases not run this time keep their stored timings
+        if os.path.exists(BASELINE_PATH):
+            for name, timings in load_json(BASELINE_PATH)['cases'].items():
+                results['cases'].setdefault(name, timings)
+        write_json(BASELINE_PATH, results)
+        print(f"Stored {len(results['cases'])} baselines in {BASELINE_PATH}", file=sys.stderr)
+    elif args.output:
+        write_json(args.output, results)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
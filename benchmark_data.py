@@ -0,0 +1,167 @@
+"""
+Synthetic, seeded inputs for benchmark.py
+
+Every generator is deterministic for a given seed, so a dataset rebuilt on
+another machine is byte-for-byte the one the baseline was measured on.
+"""
+import os
+import random
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+ENGLISH_WORDS = (
+    'the council announced new measures for the city after residents reported delays on the main '
+    'highway while officials said the budget would cover repairs to schools hospitals and water '
+    'systems across the region according to the ministry statement released on monday'
+).split()
+ARABIC_WORDS = (
+    'أعلن المجلس عن إجراءات جديدة في المدينة بعد أن أبلغ السكان عن تأخيرات على الطريق السريع '
+    'وقال المسؤولون إن الميزانية ستغطي إصلاح المدارس والمستشفيات وشبكات المياه في المنطقة '
+    'وفقا لبيان الوزارة الصادر يوم الاثنين'
+).split()
+SENSATIONAL_WORDS = ('shocking', 'unbelievable', 'breaking', 'urgent')
+REPORT_TYPES = ('fake_news', 'misleading', 'critical_event', 'verified_news')
+
+# Report locations cluster around these, as real reports do
+CITIES = (
+    ('New York', 40.7128, -74.0060), ('London', 51.5074, -0.1278), ('Beirut', 33.8938, 35.5018),
+    ('Cairo', 30.0444, 31.2357), ('Dubai', 25.2048, 55.2708), ('Paris', 48.8566, 2.3522),
+    ('Tokyo', 35.6762, 139.6503), ('Sydney', -33.8688, 151.2093), ('Lagos', 6.5244, 3.3792),
+    ('Sao Paulo', -23.5505, -46.6333)
+)
+
+
+def news_text(words, language='en', seed=0):
+    """Article-like text of `words` words, with the cues the scorer looks for"""
+    rng = random.Random(seed)
+    vocabulary = ARABIC_WORDS if language == 'ar' else ENGLISH_WORDS
+    text = [rng.choice(vocabulary) for _ in range(words)]
+    for position in range(0, words, 40):
+        text[position] = rng.choice(SENSATIONAL_WORDS)
+    text.append('2024-03-15')
+    return ' '.join(text)
+
+
+def llm_output(chars, score=True, seed=0):
+    """Analysis text about `chars` long, like a DeepSeek reply
+
+    With `score`, a "Credibility Score: NN/100" line sits near the end,
+    where the model usually puts it; without, every pattern scans it all.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < chars:
+        sentence_count = rng.randint(3, 6)
+        paragraph = ' '.join(
+            ' '.join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+            for _ in range(sentence_count)
+        )
+        paragraphs.append(f'**{rng.choice(ENGLISH_WORDS).title()} analysis:** {paragraph}')
+        length += len(paragraphs[-1]) + 2
+    if score:
+        paragraphs.insert(len(paragraphs) - 1, f'Credibility Score: {rng.randint(20, 95)}/100')
+    return '\n\n'.join(paragraphs)
+
+
+def social_snapshot(path, size_mb, seed=0):
+    """Write a saved-page-like HTML file of about `size_mb` MB
+
+    Nested divs of Arabic post text with markup noise between them, plus
+    Facebook post embeds, so both html_parser extractors find content.
+    """
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html><html><head><title>Snapshot</title></head><body>\n')
+        post = 0
+        while written < target:
+            text = news_text(rng.randint(12, 40), 'ar', seed=rng.random())
+            chunk = (
+                f'<div class="css-1dbjc4n r-{post}"><article role="article"><div dir="auto" lang="ar">'
+                f'<span>{text}</span></div><div class="r-1wbh5a2"><span>{rng.randint(1, 999)}K</span>'
+                f'<a href="/AnnaharAr/status/{10 ** 17 + post}">status</a></div></article></div>\n'
+            )
+            if post % 20 == 0:
+                chunk += (
+                    '<iframe src="https://www.facebook.com/plugins/post.php?href=https%3A%2F%2F'
+                    f'www.facebook.com%2Fannahar%2Fposts%2F{10 ** 15 + post}&amp;width=500" '
+                    'width="500" height="600"></iframe>\n'
+                )
+            f.write(chunk)
+            written += len(chunk.encode('utf-8'))
+            post += 1
+        f.write('</body></html>\n')
+    return path
+
+
+def report_rows(count, seed=0):
+    """Geotagged report rows for the reports table, oldest first"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=365) / max(count, 1)
+    for index in range(count):
+        city, lat, lng = CITIES[index % len(CITIES)]
+        # Gaussian spread of about 20km around the city centre
+        yield (
+            f'Report {index} near {city}',
+            news_text(rng.randint(20, 60), 'ar' if index % 4 == 0 else 'en', seed=index),
+            f'https://example.com/reports/{index}',
+            REPORT_TYPES[index % len(REPORT_TYPES)],
+            city,
+            lat + rng.gauss(0, 0.18),
+            lng + rng.gauss(0, 0.18),
+            (start + step * index).isoformat(),
+            rng.randint(0, 100),
+            '127.0.0.1'
+        )
+
+
+def reports_db(directory, count, seed=0):
+    """Build `directory`/news_reports.db with `count` reports and the full app schema
+
+    Rows go into a bare table first; init_db then builds the indexes,
+    rollups, grid and search index from them in one pass each, which is
+    much faster than firing every trigger per row.
+    """
+    # Built aside and renamed, so an interrupted build is never mistaken for a dataset
+    building = directory.rstrip(os.sep) + '.building'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+    conn = sqlite3.connect(os.path.join(building, 'news_reports.db'))
+    conn.execute('''
+        CREATE TABLE reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            url TEXT,
+            report_type TEXT NOT NULL,
+            location TEXT,
+            latitude REAL,
+            longitude REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            credibility_score INTEGER,
+            user_ip TEXT
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO reports (title, content, url, report_type, location, latitude, longitude,
+                             timestamp, credibility_score, user_ip)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', report_rows(count, seed))
+    conn.commit()
+    conn.close()
+
+    # init_db works on news_reports.db in the working directory
+    import app
+    cwd = os.getcwd()
+    try:
+        os.chdir(building)
+        app.init_db()
+    finally:
+        os.chdir(cwd)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(building, directory)
+    return os.path.join(directory, 'news_reports.db')
@@ -0,0 +1,251 @@
+"""
+Streaming bulk ingestion of reports (NDJSON or JSON array bodies)
+
+The request body is parsed incrementally, so only one read chunk plus one
+pending item is held in memory. Items are scored and inserted in chunks of
+BULK_CHUNK_SIZE, each chunk in a single transaction with executemany, and a
+result line is produced for every item as soon as its chunk commits.
+"""
+import codecs
+import json
+import sqlite3
+
+from geo_distance import parse_coordinates
+from report_tiles import add_report_to_grid
+
+BULK_CHUNK_SIZE = 500
+READ_SIZE = 64 * 1024
+MAX_ITEM_BYTES = 1024 * 1024
+
+
+class BulkItemError(ValueError):
+    """An item that could not be parsed; ingestion continues with the next one"""
+
+
+def iter_ndjson(stream):
+    """Yield one decoded object per line; bad lines yield BulkItemError"""
+    pending = b''
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+        if len(pending) > MAX_ITEM_BYTES:
+            raise ValueError(f'Line exceeds {MAX_ITEM_BYTES} bytes')
+
+    if pending.strip():
+        yield _decode_line(pending)
+
+
+def _decode_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return BulkItemError(f'Invalid JSON: {e}')
+
+
+def iter_json_array(stream):
+    """Yield the elements of a top-level JSON array without reading it all
+
+    Structural errors (not an array, truncated body) raise ValueError since
+    nothing after them can be trusted.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            eof = True
+        # Drop everything already consumed so memory stays at one chunk + one item
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+
+    def next_char():
+        """Skip whitespace and return the next character ('' at end of body)"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ''
+            read_more()
+
+    if next_char() != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+
+    if next_char() == ']':
+        pos += 1
+    else:
+        while True:
+            while True:
+                next_char()
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError('Truncated or invalid JSON array item')
+                    if len(buffer) - pos > MAX_ITEM_BYTES:
+                        raise ValueError(f'Item exceeds {MAX_ITEM_BYTES} bytes')
+                    read_more()
+            yield item
+
+            separator = next_char()
+            pos += 1
+            if not separator:
+                raise ValueError('Truncated JSON array')
+            if separator == ']':
+                break
+            if separator != ',':
+                raise ValueError("Expected ',' or ']' between array items")
+
+    if next_char():
+        raise ValueError('Unexpected data after JSON array')
+
+
+def iter_bulk_items(stream, mimetype):
+    """Pick the body parser from the request mimetype (NDJSON unless JSON)"""
+    if mimetype == 'application/json':
+        return iter_json_array(stream)
+    return iter_ndjson(stream)
+
+
+def report_row(item):
+    """Validate one bulk item and return its reports-table fields"""
+    if isinstance(item, BulkItemError):
+        raise item
+    if not isinstance(item, dict):
+        raise BulkItemError('Each item must be a JSON object')
+
+    title = item.get('title')
+    content = item.get('content')
+    if not isinstance(title, str) or not title.strip():
+        raise BulkItemError('title is required')
+    if not isinstance(content, str) or not content.strip():
+        raise BulkItemError('content is required')
+
+    # Anything that is not a plain string would fail parameter binding and
+    # take the whole chunk's executemany down with it
+    fields = {}
+    for field, default in (('url', ''), ('type', 'fake_news'), ('location', '')):
+        value = item.get(field)
+        if value is None:
+            value = default
+        if not isinstance(value, str):
+            raise BulkItemError(f'{field} must be a string')
+        fields[field] = value
+    if not fields['type'].strip():
+        raise BulkItemError('type must not be empty')
+
+    try:
+        latitude, longitude = parse_coordinates(item.get('latitude'), item.get('longitude'))
+    except ValueError as e:
+        raise BulkItemError(str(e))
+
+    return {
+        'title': title,
+        'content': content,
+        'url': fields['url'],
+        'report_type': fields['type'],
+        'location': fields['location'],
+        'latitude': latitude,
+        'longitude': longitude
+    }
+
+
+def ingest_reports(conn, items, score, user_ip, chunk_size=BULK_CHUNK_SIZE):
+    """Insert items in chunked transactions, yielding one result dict per item
+
+    `conn` must be in autocommit mode (isolation_level=None) because each
+    chunk manages its own BEGIN IMMEDIATE/COMMIT. The last yielded dict is
+    {'summary': {...}}.
+    """
+    summary = {'received': 0, 'inserted': 0, 'failed': 0}
+    batch = []
+    fatal_error = None
+
+    try:
+        for index, item in enumerate(items):
+            summary['received'] += 1
+            batch.append((index, item))
+            if len(batch) >= chunk_size:
+                yield from _insert_chunk(conn, batch, score, user_ip, summary)
+                batch = []
+    except ValueError as e:
+        fatal_error = str(e)
+
+    if batch:
+        yield from _insert_chunk(conn, batch, score, user_ip, summary)
+    if fatal_error:
+        yield {'success': False, 'error': fatal_error, 'fatal': True}
+    yield {'summary': summary}
+
+
+def _insert_chunk(conn, batch, score, user_ip, summary):
+    """Validate and score a chunk, then insert it in one transaction"""
+    results = []
+    rows = []
+    for index, item in batch:
+        try:
+            report = report_row(item)
+        except BulkItemError as e:
+            summary['failed'] += 1
+            results.append({'index': index, 'success': False, 'error': str(e)})
+            continue
+
+        try:
+            report['credibility_score'] = score(report['content'])
+        except Exception as e:
+            summary['failed'] += 1
+            results.append({'index': index, 'success': False, 'error': f'Scoring failed: {e}'})
+            continue
+        rows.append((index, report))
+
+    if rows:
+        cursor = conn.cursor()
+        try:
+            # The write lock keeps AUTOINCREMENT ids consecutive for this chunk
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reports'")
+            found = cursor.fetchone()
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM reports')
+            first_id = max(found[0] if found else 0, cursor.fetchone()[0]) + 1
+
+            cursor.executemany('''
+                INSERT INTO reports (title, content, url, report_type, location, latitude, longitude,
+                                     credibility_score, user_ip)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(r['title'], r['content'], r['url'], r['report_type'], r['location'],
+                   r['latitude'], r['longitude'], r['credibility_score'], user_ip) for _, r in rows])
+
+            for _, r in rows:
+                if r['latitude'] is not None:
+                    add_report_to_grid(cursor, r['latitude'], r['longitude'], r['report_type'],
+                                       r['credibility_score'])
+            cursor.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            summary['failed'] += len(rows)
+            results.extend({'index': index, 'success': False, 'error': f'Database error: {e}'}
+                           for index, _ in rows)
+        else:
+            summary['inserted'] += len(rows)
+            results.extend({'index': index, 'success': True, 'id': first_id + offset,
+                            'credibility_score': r['credibility_score']}
+                           for offset, (index, r) in enumerate(rows))
+
+    results.sort(key=lambda result: result['index'])
+    return results
@@ -0,0 +1,162 @@
+"""
+Vectorized distance computation for nearby-news queries
+
+All functions take a single origin point and NumPy arrays of target
+coordinates, so thousands of reports are measured in one call instead of
+one geopy call per row.
+
+Accuracy modes:
+    'fast'        Haversine on a sphere of mean Earth radius (6371.0088 km).
+                  Error is at most ~0.6% of the distance (worst along
+                  meridians at the equator), i.e. about 56 m at 10 km.
+    'ellipsoidal' Lambert's formula on the WGS-84 ellipsoid. Relative error
+                  stays below 0.01%, i.e. a few cm at city scale and under
+                  1 km across continents. Not valid for nearly antipodal points.
+    'exact'       geopy geodesic (Karney) per point. Accurate to nanometres
+                  but roughly 1000x slower; use for small inputs only.
+"""
+import math
+
+import numpy as np
+from geopy.distance import geodesic
+
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+ACCURACY_MODES = ('fast', 'ellipsoidal', 'exact')
+DEFAULT_ACCURACY = 'fast'
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distance in km from (lat, lng) to every (lats, lngs)"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def lambert_km(lat, lng, lats, lngs):
+    """Ellipsoidal distance in km using Lambert's formula on WGS-84"""
+    # Reduced (parametric) latitudes
+    beta1 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat)))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lats)))
+    dlng = np.radians(lngs) - math.radians(lng)
+
+    # Central angle between the reduced points on the auxiliary sphere
+    dbeta = beta2 - beta1
+    h = np.sin(dbeta / 2) ** 2 + math.cos(beta1) * np.cos(beta2) * np.sin(dlng / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2
+    q = dbeta / 2
+    sin_sigma = np.sin(sigma)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - sin_sigma) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + sin_sigma) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+
+    # Coincident points make the correction term 0/0
+    return np.where(sigma > 0, distance, 0.0)
+
+
+def geodesic_km(lat, lng, lats, lngs):
+    """Exact geodesic distance in km (one geopy call per point)"""
+    origin = (lat, lng)
+    return np.fromiter(
+        (geodesic(origin, (p_lat, p_lng)).kilometers for p_lat, p_lng in zip(lats, lngs)),
+        dtype=float,
+        count=len(lats)
+    )
+
+
+_DISTANCE_FUNCTIONS = {
+    'fast': haversine_km,
+    'ellipsoidal': lambert_km,
+    'exact': geodesic_km
+}
+
+
+def distances_km(lat, lng, lats, lngs, accuracy=DEFAULT_ACCURACY):
+    """Distance in km from one origin to many points using the chosen accuracy mode"""
+    if accuracy not in _DISTANCE_FUNCTIONS:
+        raise ValueError(f"accuracy must be one of {', '.join(ACCURACY_MODES)}")
+
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    if lats.size == 0:
+        return np.empty(0, dtype=float)
+
+    return _DISTANCE_FUNCTIONS[accuracy](float(lat), float(lng), lats, lngs)
+
+
+def nearest_within_radius(lat, lng, lats, lngs, radius_km, limit=None, accuracy=DEFAULT_ACCURACY):
+    """Indices and distances of points within radius_km, nearest first
+
+    Ties keep their input order, so callers can pre-sort rows (e.g. newest
+    first) and have that order preserved for equal distances.
+    """
+    distances = distances_km(lat, lng, lats, lngs, accuracy)
+    indices = np.flatnonzero(distances <= radius_km)
+
+    if limit is not None and indices.size > limit:
+        # Partial selection first so we only fully sort `limit` items
+        nearest = np.argpartition(distances[indices], limit - 1)[:limit]
+        indices = np.sort(indices[nearest])
+
+    order = np.argsort(distances[indices], kind='stable')
+    indices = indices[order]
+    return indices, distances[indices]
+
+
+def bounding_box(lat, lng, radius_km):
+    """Lat/lng box enclosing a circle of radius_km, for SQL candidate filtering
+
+    Returns (min_lat, max_lat, min_lng, max_lng). Longitude bounds are None
+    when the circle reaches a pole or crosses the antimeridian.
+    """
+    # 110.574 km per degree is the shortest meridian degree (at the equator)
+    dlat = radius_km / 110.574
+    min_lat = lat - dlat
+    max_lat = lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    # Use the latitude closest to a pole, where a degree of longitude is
+    # shortest; 111.195 km is the spherical value, smaller than WGS-84's
+    widest_lat = max(abs(min_lat), abs(max_lat))
+    dlng = radius_km / (111.195 * math.cos(math.radians(widest_lat)))
+    min_lng = lng - dlng
+    max_lng = lng + dlng
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def parse_coordinates(latitude, longitude):
+    """(lat, lng) as floats, or (None, None) when both are missing
+
+    Raises ValueError unless both are given, numeric (not bool), finite and
+    within [-90, 90] / [-180, 180].
+    """
+    if latitude is None and longitude is None:
+        return None, None
+    if latitude is None or longitude is None:
+        raise ValueError('latitude and longitude must be given together')
+    if isinstance(latitude, bool) or isinstance(longitude, bool):
+        raise ValueError('latitude and longitude must be numbers')
+    try:
+        lat = float(latitude)
+        lng = float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('latitude and longitude must be numbers')
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        raise ValueError('latitude and longitude must be finite')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('latitude or longitude out of range')
+    return lat, lng
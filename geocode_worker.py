@@ -0,0 +1,196 @@
+"""
+Background geocoding of reports submitted with only a free-text location
+
+Reports that have a location but no coordinates are picked up by a daemon
+thread, grouped by normalized address and resolved through the shared
+Geocoder, so the cache and the upstream rate limit apply. Coordinates are
+written back together with the report's map tile grid entry, after which
+the report shows up in /nearby-news and the tile endpoint. The submit path
+only wakes the worker; it never waits for a lookup.
+
+Locations the geocoder cannot resolve are recorded in ungeocodable_reports
+and not retried.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from geocoder import normalize_address
+from report_tiles import add_report_to_grid
+
+GEOCODE_BATCH_SIZE = 100
+POLL_INTERVAL = 5.0
+
+# Placeholder locations that should never be sent upstream
+PLACEHOLDER_LOCATIONS = {'', 'unknown', 'n/a', 'none', 'null', 'غير معروف'}
+
+_PENDING_CONDITION = "latitude IS NULL AND location IS NOT NULL AND location <> ''"
+
+
+def create_geocode_queue(cursor):
+    """Skip list for unresolvable locations and a partial index over the backlog"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ungeocodable_reports (
+            report_id INTEGER PRIMARY KEY,
+            address_key TEXT
+        )
+    ''')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_reports_ungeocoded ON reports (id) WHERE {_PENDING_CONDITION}')
+
+
+def _pending_query(count=False):
+    select = 'COUNT(*)' if count else 'id, location, report_type, credibility_score'
+    return f'''
+        SELECT {select} FROM reports
+        WHERE {_PENDING_CONDITION} AND id > ?
+          AND NOT EXISTS (SELECT 1 FROM ungeocodable_reports u WHERE u.report_id = reports.id)
+    '''
+
+
+class GeocodeWorker:
+    """Daemon thread that fills in coordinates for reports with a location"""
+
+    def __init__(self, db_path, geocoder, batch_size=GEOCODE_BATCH_SIZE, poll_interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.geocoder = geocoder
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            'reports_geocoded_total': 0,
+            'reports_unresolvable_total': 0,
+            'lookups_total': 0,
+            'lookup_errors_total': 0,
+            'batches_total': 0,
+            'last_batch_seconds': 0.0,
+            'last_geocoded_at': None
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='geocode-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Ask for a pass now instead of at the next poll"""
+        self._wake.set()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            stats['backlog'] = conn.execute(_pending_query(count=True), (0,)).fetchone()[0]
+        except sqlite3.Error:
+            stats['backlog'] = None
+        finally:
+            conn.close()
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.run_pass()
+            except Exception as e:
+                print(f"Geocode worker error: {e}")
+
+    def run_pass(self):
+        """Geocode the current backlog; returns the number of reports updated"""
+        conn = sqlite3.connect(self.db_path)
+        updated = 0
+        last_id = 0
+        try:
+            while not self._stop.is_set():
+                rows = conn.execute(_pending_query() + ' ORDER BY id LIMIT ?',
+                                    (last_id, self.batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                written, saturated = self._geocode_batch(conn, rows)
+                updated += written
+                if saturated:
+                    # Interactive lookups fill the geocoder queue; retry next pass
+                    break
+        finally:
+            conn.close()
+        return updated
+
+    def _geocode_batch(self, conn, rows):
+        started = time.perf_counter()
+        by_address = {}
+        for row in rows:
+            by_address.setdefault(normalize_address(row[1]), []).append(row)
+
+        coordinates = []
+        unresolvable = []
+        written = 0
+        errors = 0
+        saturated = False
+        for key, reports in by_address.items():
+            if key in PLACEHOLDER_LOCATIONS:
+                unresolvable.extend((report[0], key) for report in reports)
+                continue
+            try:
+                # Blocks behind the shared rate limit; cache hits return at once
+                result, cached = self.geocoder.geocode(reports[0][1])
+            except queue.Full:
+                saturated = True
+                break
+            except Exception as e:
+                print(f"Geocode worker lookup error for {key!r}: {e}")
+                errors += 1
+                continue
+            if result is None:
+                unresolvable.extend((report[0], key) for report in reports)
+            else:
+                coordinates.extend((report, result['lat'], result['lng']) for report in reports)
+            # An upstream lookup took about a second; publish what is ready
+            # instead of holding it until the whole batch is resolved
+            if not cached:
+                written += self._write(conn, coordinates, unresolvable)
+                coordinates, unresolvable = [], []
+
+        written += self._write(conn, coordinates, unresolvable)
+
+        with self._lock:
+            self._stats['lookups_total'] += len(by_address)
+            self._stats['lookup_errors_total'] += errors
+            self._stats['batches_total'] += 1
+            self._stats['last_batch_seconds'] = time.perf_counter() - started
+        return written, saturated
+
+    def _write(self, conn, coordinates, unresolvable):
+        if not coordinates and not unresolvable:
+            return 0
+        cursor = conn.cursor()
+        written = 0
+        try:
+            for (report_id, _, report_type, score), lat, lng in coordinates:
+                cursor.execute('UPDATE reports SET latitude = ?, longitude = ? WHERE id = ? AND latitude IS NULL',
+                               (lat, lng, report_id))
+                if cursor.rowcount:
+                    add_report_to_grid(cursor, lat, lng, report_type, score)
+                    written += 1
+            cursor.executemany('INSERT OR IGNORE INTO ungeocodable_reports (report_id, address_key) VALUES (?, ?)',
+                               unresolvable)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        with self._lock:
+            self._stats['reports_geocoded_total'] += written
+            self._stats['reports_unresolvable_total'] += len(unresolvable)
+            if written:
+                self._stats['last_geocoded_at'] = time.time()
+        return written
@@ -0,0 +1,228 @@
+"""
+Cached, rate-limited geocoding through Nominatim
+
+All lookups go through one shared Geocoder. Answers, including "not found",
+are cached in the geocode_cache table keyed on the normalized address, with
+an in-memory LRU in front of it, so repeated city names never leave the
+process. Cache misses are queued to a single worker thread that owns the
+Nominatim client and spaces upstream requests at least `min_interval`
+apart (Nominatim allows one request per second). Concurrent lookups of the
+same address share one upstream request.
+"""
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from geopy.exc import GeocoderRateLimited
+from geopy.geocoders import Nominatim
+
+from metrics import timed
+from report_search import fold_text
+
+# Not-found answers are retried after this long, in case the address was
+# a temporary upstream gap rather than a typo
+NEGATIVE_TTL_SECONDS = 7 * 24 * 3600
+MEMORY_CACHE_SIZE = 10000
+
+
+def normalize_address(address):
+    """Cache key for an address: case, spacing, punctuation and alef variants folded"""
+    text = fold_text(unicodedata.normalize('NFKC', address or '')).casefold()
+    text = re.sub(r'[\s,;.]+', ' ', text)
+    return text.strip()
+
+
+def create_geocode_cache(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            address_key TEXT PRIMARY KEY,
+            found INTEGER NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            formatted_address TEXT,
+            cached_at REAL NOT NULL
+        )
+    ''')
+
+
+class Geocoder:
+    """Shared geocoding client with a persistent cache and upstream rate limit"""
+
+    def __init__(self, db_path, user_agent='news_detector', min_interval=1.0, timeout=10,
+                 max_pending=100, memory_size=MEMORY_CACHE_SIZE):
+        self.db_path = db_path
+        self.user_agent = user_agent
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            'memory_hits_total': 0,
+            'cache_hits_total': 0,
+            'misses_total': 0,
+            'coalesced_total': 0,
+            'upstream_requests_total': 0,
+            'upstream_errors_total': 0,
+            'rate_limited_total': 0,
+            'rejected_total': 0
+        }
+
+    def geocode(self, address, timeout=None):
+        """(result, cached) for an address; result is None when not found
+
+        result is a dict with lat, lng and formatted_address. Raises
+        queue.Full when too many lookups are already waiting, TimeoutError
+        if the answer takes longer than `timeout` seconds, and the upstream
+        error if Nominatim fails.
+        """
+        key = normalize_address(address)
+        if not key:
+            return None, True
+
+        hit, result = self.cached(key)
+        if hit:
+            return result, True
+        return self.submit(address, key).result(timeout), False
+
+    def cached(self, key):
+        """(hit, result) from the memory or SQLite cache, without going upstream"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits_total'] += 1
+                return True, self._memory[key]
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('''
+                SELECT found, latitude, longitude, formatted_address, cached_at
+                FROM geocode_cache WHERE address_key = ?
+            ''', (key,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        finally:
+            conn.close()
+
+        if row is None or (not row[0] and time.time() - row[4] > NEGATIVE_TTL_SECONDS):
+            return False, None
+
+        result = {'lat': row[1], 'lng': row[2], 'formatted_address': row[3]} if row[0] else None
+        with self._lock:
+            self._stats['cache_hits_total'] += 1
+            self._remember(key, result)
+        return True, result
+
+    def submit(self, address, key=None):
+        """Future for an upstream lookup, shared with any identical lookup in flight"""
+        key = key or normalize_address(address)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self._stats['coalesced_total'] += 1
+                return future
+            future = Future()
+            try:
+                self._queue.put_nowait((key, address, future))
+            except queue.Full:
+                self._stats['rejected_total'] += 1
+                raise
+            self._pending[key] = future
+            self._stats['misses_total'] += 1
+        self._ensure_started()
+        return future
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_cache_size'] = len(self._memory)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    def _remember(self, key, result):
+        # Caller holds self._lock
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='geocoder', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        client = Nominatim(user_agent=self.user_agent, timeout=self.timeout)
+        conn = sqlite3.connect(self.db_path)
+        create_geocode_cache(conn.cursor())
+        conn.commit()
+        next_request = 0.0
+
+        while True:
+            key, address, future = self._queue.get()
+
+            # Another caller may have cached it while this one waited in line
+            hit, result = self.cached(key)
+            if not hit:
+                delay = next_request - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    with self._lock:
+                        self._stats['upstream_requests_total'] += 1
+                    with timed('upstream_request_duration_seconds', upstream='nominatim'):
+                        location = client.geocode(address)
+                    next_request = time.monotonic() + self.min_interval
+                except GeocoderRateLimited as e:
+                    # Back off for as long as the server asks before the next request
+                    next_request = time.monotonic() + max(self.min_interval, e.retry_after or 60)
+                    self._finish(key, future, error=e, rate_limited=True)
+                    continue
+                except Exception as e:
+                    next_request = time.monotonic() + self.min_interval
+                    self._finish(key, future, error=e)
+                    continue
+
+                result = None
+                if location:
+                    result = {
+                        'lat': location.latitude,
+                        'lng': location.longitude,
+                        'formatted_address': location.address
+                    }
+                try:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO geocode_cache
+                            (address_key, found, latitude, longitude, formatted_address, cached_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (key, int(result is not None), result and result['lat'], result and result['lng'],
+                          result and result['formatted_address'], time.time()))
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Geocode cache write error: {e}")
+
+            self._finish(key, future, result=result)
+
+    def _finish(self, key, future, result=None, error=None, rate_limited=False):
+        with self._lock:
+            self._pending.pop(key, None)
+            if error is None:
+                self._remember(key, result)
+            else:
+                self._stats['upstream_errors_total'] += 1
+                self._stats['rate_limited_total'] += int(rate_limited)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
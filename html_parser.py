@@ -4,6 +4,7 @@ HTML Parser for extracting real social media content from saved HTML files
 from bs4 import BeautifulSoup
 import re
 import json
+import os
 from datetime import datetime, timedelta
 import random
 
@@ -216,10 +217,66 @@ def extract_facebook_content(html_file_path):
         print(f"Error extracting Facebook content: {e}")
         return []
 
+# Elements that never hold the text of an article
+BOILERPLATE_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form', 'button',
+                    'nav', 'header', 'footer', 'aside']
+TEXT_BLOCK_TAGS = ['h1', 'h2', 'h3', 'p', 'li', 'blockquote', 'pre']
+
+def _densest_container(soup):
+    """The element whose direct <p> children hold the most text"""
+    scores = {}
+    for paragraph in soup.find_all('p'):
+        parent = paragraph.parent
+        if parent is not None:
+            scores[id(parent)] = (scores.get(id(parent), (0, parent))[0] + len(paragraph.get_text(strip=True)), parent)
+    return max(scores.values(), key=lambda scored: scored[0])[1] if scores else None
+
+def extract_article_text(html):
+    """(title, text) of a web page's main content
+    
+    Looks for <article>, then <main>, then the element with the most
+    paragraph text, so menus, footers and sidebars are left out. `html` may
+    be bytes, in which case the page's own charset declaration is used.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    title = ''
+    og_title = soup.find('meta', attrs={'property': 'og:title'})
+    if og_title is not None and og_title.get('content'):
+        title = og_title['content'].strip()
+    elif soup.title is not None and soup.title.string:
+        title = soup.title.string.strip()
+    
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    container = soup.find('article') or soup.find('main') or _densest_container(soup) or soup.body or soup
+    
+    blocks = []
+    for block in container.find_all(TEXT_BLOCK_TAGS):
+        # Nested blocks (a <p> inside a <li>) are covered by the outer one
+        if block.find_parent(TEXT_BLOCK_TAGS) is not None:
+            continue
+        text = re.sub(r'\s+', ' ', block.get_text(' ', strip=True))
+        # Short list items and captions are mostly links and bylines
+        if len(text) >= 40 or (block.name in ('h1', 'h2', 'h3') and text):
+            blocks.append(text)
+    if not blocks:
+        blocks = [re.sub(r'\s+', ' ', container.get_text(' ', strip=True))]
+    return title, '\n\n'.join(blocks).strip()
+
+# Saved pages the posts are parsed from
+TWITTER_HTML_PATH = r'c:\Users\FSA\Downloads\(2) Annahar Al Arabi (@AnnaharAr) _ X.html'
+FACEBOOK_HTML_PATH = r'c:\Users\FSA\Downloads\Facebook.html'
+
+def social_sources_version():
+    """Modification times of the saved pages (None when missing), for cache keys"""
+    return [os.path.getmtime(path) if os.path.exists(path) else None
+            for path in (TWITTER_HTML_PATH, FACEBOOK_HTML_PATH)]
+
 def get_all_social_posts():
     """Get all social media posts from both sources"""
-    twitter_posts = extract_twitter_content(r'c:\Users\FSA\Downloads\(2) Annahar Al Arabi (@AnnaharAr) _ X.html')
-    facebook_posts = extract_facebook_content(r'c:\Users\FSA\Downloads\Facebook.html')
+    twitter_posts = extract_twitter_content(TWITTER_HTML_PATH)
+    facebook_posts = extract_facebook_content(FACEBOOK_HTML_PATH)
     
     all_posts = twitter_posts + facebook_posts
     
@@ -0,0 +1,109 @@
+"""
+ETags, conditional requests, compression and cache policies for responses
+
+init_http_caching(app) registers an after_request hook that, for buffered
+200 responses:
+
+- sets Cache-Control from the view's @cache_control policy, or a default
+  per content type (HTML and JSON revalidate on every use);
+- adds a content-hash ETag to GET responses and answers a matching
+  If-None-Match with an empty 304, so unchanged polls cost a few headers;
+- compresses text-like bodies above COMPRESS_MIN_SIZE with brotli (when
+  the optional brotli package is installed) or gzip, whichever the client
+  prefers, tagging the ETag with the encoding.
+
+Streamed responses and files are left alone.
+"""
+import gzip
+import hashlib
+
+from flask import current_app, request
+from werkzeug.http import remove_entity_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'}
+
+DEFAULT_POLICIES = {
+    'text/html': 'no-cache',
+    'application/json': 'no-cache'
+}
+
+
+def cache_control(policy):
+    """Route-level Cache-Control policy, applied by the after_request hook"""
+    def decorator(view):
+        view.cache_control = policy
+        return view
+    return decorator
+
+
+def _is_compressible(mimetype):
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best = max(candidates, key=lambda encoding: accepted[encoding])
+    return best if accepted[best] > 0 else None
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def finalize_response(response):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return response
+
+    view = current_app.view_functions.get(request.endpoint)
+    policy = getattr(view, 'cache_control', None) or DEFAULT_POLICIES.get(response.mimetype)
+    if policy and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+
+    compressible = _is_compressible(response.mimetype) and 'Content-Encoding' not in response.headers
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    encoding = None
+    if compressible and (response.content_length or 0) >= COMPRESS_MIN_SIZE:
+        encoding = _negotiate_encoding()
+
+    etag = None
+    if request.method in ('GET', 'HEAD') and 'no-store' not in (policy or ''):
+        etag, _ = response.get_etag()
+        if etag is None:
+            etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+            response.set_etag(etag)
+
+        # The client may hold any encoding of this body
+        variants = [etag, f'{etag}-gzip', f'{etag}-br']
+        if_none_match = request.if_none_match
+        if if_none_match.star_tag or any(if_none_match.contains_weak(variant) for variant in variants):
+            response.status_code = 304
+            response.set_data(b'')
+            remove_entity_headers(response.headers)
+            if encoding:
+                response.set_etag(f'{etag}-{encoding}')
+            return response
+
+    if encoding:
+        response.set_data(_compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(f'{etag}-{encoding}')
+
+    return response
+
+
+def init_http_caching(app):
+    app.after_request(finalize_response)
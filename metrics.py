@@ -0,0 +1,359 @@
+"""
+Prometheus metrics cheap enough to leave on in production
+
+Each thread records into its own shard, a dict only that thread writes, so
+recording a sample takes no lock: a dict lookup and a few additions. GET
+/metrics sums the shards when scraped. Shards of finished threads are folded
+into one retired shard, so servers that start a thread per request do not
+grow without bound.
+
+With several server processes (serve.py sets METRICS_DIR), every process
+also writes its totals to METRICS_DIR/<pid>.json every FLUSH_INTERVAL
+seconds. The process that answers the scrape adds up all of them, so any
+worker reports for the whole host, at most FLUSH_INTERVAL seconds behind.
+
+Histograms in seconds:
+- http_request_duration_seconds{route, method, status}
+- upstream_request_duration_seconds{upstream, outcome}: deepseek, newsapi,
+  nominatim, url_fetch
+- sqlite_query_duration_seconds{statement}: execute plus fetch, for
+  connections opened with factory=TimedConnection
+- scorer_duration_seconds{scorer}
+- html_parse_duration_seconds{source}
+
+Counters from the registered collectors: cache_requests_total{cache,
+result}, with a derived cache_hit_ratio{cache} gauge,
+rate_limited_total{class, reason}, analysis_jobs_total{lane, outcome} and
+url_fetches_total{result}.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from tracing import span
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FLUSH_INTERVAL = 5
+
+HELP = {
+    'http_request_duration_seconds': 'Time from request start to response, by route and status',
+    'upstream_request_duration_seconds': 'Calls to third-party services',
+    'sqlite_query_duration_seconds': 'SQLite statement execution and fetch',
+    'scorer_duration_seconds': 'Credibility scoring',
+    'html_parse_duration_seconds': 'Parsing saved social media pages and linked pages',
+    'cache_requests_total': 'Cache lookups by result',
+    'cache_hit_ratio': 'Share of cache lookups that hit, host-wide',
+    'rate_limited_total': 'Requests answered 429 by the per-client budget or upstream shedding',
+    'analysis_jobs_total': 'Analysis jobs finished or retried, by lane',
+    'url_fetches_total': 'Linked pages served fresh from cache, fetched, revalidated or failed'
+}
+
+SPAN_NAMES = {
+    'upstream_request_duration_seconds': 'upstream',
+    'sqlite_query_duration_seconds': 'sqlite',
+    'scorer_duration_seconds': 'scorer',
+    'html_parse_duration_seconds': 'html_parse'
+}
+
+_local = threading.local()
+_shards = []
+_retired = {}
+_collectors = []
+_registry_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _registry_lock:
+            _shards.append((threading.current_thread(), shard))
+        _ensure_flusher()
+    return shard
+
+
+def observe(name, seconds, **labels):
+    """Record one histogram sample"""
+    shard = _shard()
+    key = (name, tuple(labels.items()))
+    values = shard.get(key)
+    if values is None:
+        # Per-bucket counts (the last bucket is +Inf), then sum and count
+        values = shard[key] = [0] * (len(BUCKETS) + 3)
+    values[bisect_left(BUCKETS, seconds)] += 1
+    values[-2] += seconds
+    values[-1] += 1
+
+
+@contextmanager
+def timed(name, **labels):
+    """Time a block (or, as a decorator, a function) into histogram `name`
+
+    Upstream timings get an outcome label of ok or error. Inside a traced
+    request the block is also a span, e.g. "upstream deepseek".
+    """
+    started = time.perf_counter()
+    outcome = 'ok'
+    span_name = SPAN_NAMES.get(name, name)
+    if labels:
+        span_name += ' ' + str(next(iter(labels.values())))
+    try:
+        with span(span_name, **labels):
+            yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        if name == 'upstream_request_duration_seconds':
+            # A copy: as a decorator, every call shares the labels dict
+            labels = dict(labels, outcome=outcome)
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def register_collector(collect):
+    """Add a function returning [(counter_name, labels_dict, value)] read on scrape"""
+    _collectors.append(collect)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records execute and fetch time per statement kind"""
+
+    def execute(self, sql, *args):
+        self._statement = sql.split(None, 1)[0].lower() if sql.strip() else 'empty'
+        with timed('sqlite_query_duration_seconds', statement=self._statement):
+            return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        self._statement = sql.split(None, 1)[0].lower() if sql.strip() else 'empty'
+        with timed('sqlite_query_duration_seconds', statement=self._statement):
+            return super().executemany(sql, *args)
+
+    def fetchone(self):
+        with timed('sqlite_query_duration_seconds', statement=getattr(self, '_statement', 'fetch')):
+            return super().fetchone()
+
+    def fetchmany(self, *args):
+        with timed('sqlite_query_duration_seconds', statement=getattr(self, '_statement', 'fetch')):
+            return super().fetchmany(*args)
+
+    def fetchall(self):
+        with timed('sqlite_query_duration_seconds', statement=getattr(self, '_statement', 'fetch')):
+            return super().fetchall()
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=TimedConnection) to time its statements"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+def _local_totals():
+    """This process's series: {(name, labels): values} with sorted labels"""
+    totals = {}
+
+    def add(key, values):
+        key = (key[0], tuple(sorted(key[1])))
+        existing = totals.get(key)
+        if existing is None:
+            totals[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                existing[i] += value
+
+    with _registry_lock:
+        alive = []
+        for thread, shard in _shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+                continue
+            for key, values in list(shard.items()):
+                if key in _retired:
+                    for i, value in enumerate(values):
+                        _retired[key][i] += value
+                else:
+                    _retired[key] = list(values)
+        _shards[:] = alive
+        shards = [shard for _, shard in alive] + [_retired]
+        # list() of a dict is atomic under the GIL, so live shards can be read
+        for shard in shards:
+            for key, values in list(shard.items()):
+                add(key, values)
+
+    for collect in _collectors:
+        try:
+            for name, labels, value in collect():
+                add((name, tuple(labels.items())), [value])
+        except Exception as e:
+            print(f"Metrics collector error: {e}")
+    return totals
+
+
+def _reset_after_fork():
+    # Samples recorded before a preloading server forked belong to the
+    # master; children must not each report them again
+    global _local, _retired, _registry_lock
+    _local = threading.local()
+    _shards.clear()
+    _retired = {}
+    _registry_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _metrics_dir():
+    return os.environ.get('METRICS_DIR')
+
+
+def _ensure_flusher():
+    # One flush thread per process, started after any fork
+    global _flusher_pid
+    if not _metrics_dir() or _flusher_pid == os.getpid():
+        return
+    with _registry_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def _flush():
+    directory = _metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    series = [[name, list(labels), values] for (name, labels), values in _local_totals().items()]
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(series, f)
+    os.replace(path + '.tmp', path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            _flush()
+        except OSError as e:
+            print(f"Metrics flush error: {e}")
+
+
+def _host_totals():
+    totals = _local_totals()
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return totals
+    own = f'{os.getpid()}.json'
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename == own:
+            continue
+        try:
+            with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                series = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, values in series:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if key in totals:
+                for i, value in enumerate(values):
+                    totals[key][i] += value
+            else:
+                totals[key] = values
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render():
+    """Host-wide metrics in the Prometheus text exposition format"""
+    by_name = {}
+    for (name, labels), values in sorted(_host_totals().items()):
+        by_name.setdefault(name, []).append((labels, values))
+
+    lines = []
+    for name, series in by_name.items():
+        histogram = len(series[0][1]) > 1
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f"# TYPE {name} {'histogram' if histogram else 'counter'}")
+        for labels, values in series:
+            if not histogram:
+                lines.append(f'{name}{_format_labels(labels)} {values[0]}')
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), values[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-2]:.6f}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+
+    # Hit ratios derived from the summed cache counters
+    caches = {}
+    for labels, values in by_name.get('cache_requests_total', []):
+        labels = dict(labels)
+        caches.setdefault(labels['cache'], {})[labels['result']] = values[0]
+    if caches:
+        lines.append(f"# HELP cache_hit_ratio {HELP['cache_hit_ratio']}")
+        lines.append('# TYPE cache_hit_ratio gauge')
+        for cache, counts in sorted(caches.items()):
+            total = counts.get('hit', 0) + counts.get('miss', 0)
+            if total:
+                lines.append(f"cache_hit_ratio{_format_labels([('cache', cache)])} {counts.get('hit', 0) / total:.4f}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics_dir():
+    """Drop totals left by an earlier server run; call before forking workers"""
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, filename))
+
+
+def init_metrics(app):
+    """Time every request and serve GET /metrics (Bearer METRICS_TOKEN when set)"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            observe('http_request_duration_seconds', time.perf_counter() - started,
+                    route=route, method=request.method, status=str(response.status_code))
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        token = os.environ.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        response = Response(render(), mimetype='text/plain')
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,52 @@
+"""
+Run a start function in exactly one server process per host
+
+Background jobs such as the nightly archive and the geocode worker must not
+run once per worker process. Every process calls run_in_one_process(); the
+first to take an exclusive flock on `lock_path` runs `start`. The others
+retry every `retry_interval` seconds, so the jobs move to another worker
+when the holder exits (the OS drops the lock with the process).
+
+Platforms without fcntl (Windows) run only the single-process dev server,
+where `start` is simply called.
+"""
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Lock files stay open for the life of the process; closing one releases it
+_held = []
+
+
+def _try_lock(lock_file):
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def run_in_one_process(lock_path, start, retry_interval=30):
+    """Call start() now if this process wins the lock, else once it does"""
+    if fcntl is None:
+        start()
+        return True
+
+    lock_file = open(lock_path, 'a')
+    if _try_lock(lock_file):
+        _held.append(lock_file)
+        start()
+        return True
+
+    def wait_for_lock():
+        while not _try_lock(lock_file):
+            time.sleep(retry_interval)
+        _held.append(lock_file)
+        start()
+
+    threading.Thread(target=wait_for_lock, name='process-lock', daemon=True).start()
+    return False
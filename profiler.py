@@ -0,0 +1,291 @@
+"""
+On-demand sampling profiles of single requests
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>`, or at
+random with probability PROFILE_SAMPLE_RATE (default 0, off). While its
+view runs, a sampler thread records the request thread's stack every
+PROFILE_INTERVAL_MS milliseconds. This is statistical rather than
+deterministic like cProfile, so it costs the request almost nothing and
+shows time spent waiting on NewsAPI or SQLite as well as CPU time.
+
+Each kept profile is written to PROFILE_DIR as
+- <id>.collapsed: one "frame;frame;frame count" line per stack, for
+  flamegraph.pl, speedscope or inferno
+- <id>.speedscope.json: open directly at https://www.speedscope.app
+- <id>.json: the summary listed by GET /api/profiles
+
+GET /api/profiles/<id>/collapsed (or speedscope, summary) downloads them.
+Both endpoints need `Authorization: Bearer <PROFILE_TOKEN>`.
+
+Header-triggered profiles are always kept. Randomly sampled ones are kept
+only when the request took PROFILE_SLOW_MS or longer. The newest
+PROFILE_KEEP profiles are retained. The response to a kept profile has an
+X-Profile-Id header.
+
+Under the ASGI server the async views run on the event loop thread, so
+their samples include whatever else the loop ran at the same time.
+"""
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Response, abort, g, jsonify, request, send_from_directory
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'civic-lens-profiles')
+MAX_CONCURRENT = 2
+TOP_FRAMES = 8
+FILE_SUFFIXES = {'collapsed': '.collapsed', 'speedscope': '.speedscope.json', 'summary': '.json'}
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+
+
+def _setting(name, default, kind=float):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        return kind(default)
+
+
+def _frame_name(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Sampler:
+    """Samples one thread's stack on a background thread until stopped"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own_file = __file__
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # Leave out the profiler's own hooks
+                if code.co_filename != own_file:
+                    stack.append(code)
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+
+
+def collapsed(stacks):
+    """Brendan Gregg's folded format, root frame first"""
+    return ''.join(f"{';'.join(_frame_name(code) for code in stack)} {count}\n"
+                   for stack, count in stacks.most_common())
+
+
+def speedscope(stacks, name, interval):
+    """A speedscope "sampled" profile document"""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        sample = []
+        for code in stack:
+            if code not in index:
+                index[code] = len(frames)
+                frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+            sample.append(index[code])
+        samples.append(sample)
+        weights.append(count * interval)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }],
+        'name': name,
+        'exporter': 'civic-lens profiler'
+    }
+
+
+def top_frames(stacks, limit=TOP_FRAMES):
+    """Frames by self time (leaf of the stack) and total time (anywhere in it)
+
+    Total time only ranks this app's own functions: Flask and WSGI frames
+    enclose every sample and would crowd out the interesting ones.
+    """
+    total = sum(stacks.values()) or 1
+    own, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for code in set(stack):
+            if code.co_filename.startswith(APP_ROOT):
+                inclusive[code] += count
+    return {
+        'self': [{'frame': _frame_name(code), 'share': round(count / total, 3)}
+                 for code, count in own.most_common(limit)],
+        'total': [{'frame': _frame_name(code), 'share': round(count / total, 3)}
+                  for code, count in inclusive.most_common(limit)]
+    }
+
+
+def profile_dir():
+    return os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+
+
+def save_profile(sampler, summary):
+    """Write the three files of one profile; returns its id"""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', summary['path']).strip('-') or 'root'
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{slug[:40]}-{uuid.uuid4().hex[:6]}"
+    name = f"{summary['method']} {summary['path']}"
+
+    summary = dict(summary, id=profile_id, samples=sum(sampler.stacks.values()),
+                   top_frames=top_frames(sampler.stacks))
+    with open(os.path.join(directory, f'{profile_id}.collapsed'), 'w', encoding='utf-8') as f:
+        f.write(collapsed(sampler.stacks))
+    with open(os.path.join(directory, f'{profile_id}.speedscope.json'), 'w', encoding='utf-8') as f:
+        json.dump(speedscope(sampler.stacks, name, sampler.interval), f)
+    # The summary last: the index only lists profiles whose files are complete
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    _prune(directory, _setting('PROFILE_KEEP', 200, int))
+    return profile_id
+
+
+def _prune(directory, keep):
+    summaries = sorted(name for name in os.listdir(directory) if _is_summary(name))
+    for name in summaries[:-keep] if keep > 0 else summaries:
+        profile_id = name[:-len('.json')]
+        for suffix in FILE_SUFFIXES.values():
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except OSError:
+                pass
+
+
+def _is_summary(name):
+    return name.endswith('.json') and not name.endswith('.speedscope.json')
+
+
+def list_profiles(min_ms=0, limit=50):
+    """Kept profiles of at least `min_ms`, slowest first"""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not _is_summary(name):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if summary['duration_ms'] >= min_ms:
+            profiles.append(summary)
+    profiles.sort(key=lambda summary: summary['duration_ms'], reverse=True)
+    return profiles[:limit]
+
+
+def _authorized(token):
+    return bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+
+
+def init_profiling(app):
+    """Profile requests on demand and serve the index at GET /api/profiles"""
+
+    @app.before_request
+    def start_profile():
+        token = os.environ.get('PROFILE_TOKEN')
+        requested = bool(token) and request.headers.get('X-Profile') == token
+        if not requested and random.random() >= _setting('PROFILE_SAMPLE_RATE', 0):
+            return
+        # Bounded, so profiling cannot pile sampler threads onto a busy server
+        if not _slots.acquire(blocking=False):
+            return
+        sampler = Sampler(threading.get_ident(), _setting('PROFILE_INTERVAL_MS', 5) / 1000)
+        sampler.start()
+        g.profile = (sampler, requested)
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        sampler, requested = profile
+        sampler.stop()
+        _slots.release()
+        duration_ms = round(sampler.duration * 1000, 1)
+        if not requested and duration_ms < _setting('PROFILE_SLOW_MS', 250):
+            return response
+        try:
+            profile_id = save_profile(sampler, {
+                'method': request.method,
+                'path': request.path,
+                'route': request.url_rule.rule if request.url_rule is not None else None,
+                'status': response.status_code,
+                'duration_ms': duration_ms,
+                'trigger': 'header' if requested else 'sampled',
+                'interval_ms': sampler.interval * 1000,
+                'pid': os.getpid(),
+                'recorded_at': time.time()
+            })
+        except OSError as e:
+            print(f"Profile write error: {e}")
+            return response
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def abandon_profile(error=None):
+        # after_request does not run when the response itself failed
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile[0].stop()
+            _slots.release()
+
+    @app.route('/api/profiles')
+    def profile_index():
+        """Recent kept profiles, slowest first, with their top frames"""
+        if not _authorized(os.environ.get('PROFILE_TOKEN')):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        try:
+            min_ms = float(request.args.get('min_ms', 0))
+            limit = max(1, min(500, int(request.args.get('limit', 50))))
+        except ValueError:
+            return jsonify({'error': 'min_ms and limit must be numbers'}), 400
+        response = jsonify({'directory': profile_dir(), 'profiles': list_profiles(min_ms, limit)})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.route('/api/profiles/<profile_id>/<any(collapsed, speedscope, summary):kind>')
+    def profile_file(profile_id, kind):
+        """Download one profile's collapsed stacks, speedscope document or summary"""
+        if not _authorized(os.environ.get('PROFILE_TOKEN')):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        if not re.fullmatch(r'[A-Za-z0-9-]+', profile_id):
+            abort(404)
+        return send_from_directory(profile_dir(), profile_id + FILE_SUFFIXES[kind], max_age=0)
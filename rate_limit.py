@@ -0,0 +1,163 @@
+"""
+Per-client rate limits and load shedding for expensive endpoints
+
+Views are tagged with an endpoint class, @rate_limit('llm'), and
+init_rate_limits(app) registers a before_request hook that admits or
+rejects each request to a tagged view:
+
+- Every (class, client IP) pair has a token bucket. RATE_LIMIT_<CLASS> is
+  "<requests>/<seconds>", e.g. the default "10/60" for llm allows a burst of
+  10 and then one request every 6 seconds. An empty bucket answers 429
+  with Retry-After set to when the next token arrives.
+- Classes that call third-party services (UPSTREAM_CLASSES) also need one
+  of UPSTREAM_CONCURRENCY slots for the whole request. When all are taken,
+  the request is answered 429 with Retry-After: 1 at once, instead of
+  queueing behind slow upstream calls.
+
+One abusive client therefore uses up only its own budget, and a flood from
+many clients is turned away in microseconds. Requests that are admitted
+keep their latency.
+
+The client IP is the address FORWARDED_HOPS entries from the right of
+X-Forwarded-For, which is the address the nearest trusted proxy saw.
+FORWARDED_HOPS defaults to 1, which fits Railway and Vercel. Entries further
+left are client-supplied and could be forged to dodge the limit. Set it to 0
+when clients connect directly.
+
+Each of the WEB_CONCURRENCY server processes holds its share of every
+budget, so the limits apply per host.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request
+
+DEFAULT_LIMITS = {
+    'llm': '10/60',
+    'geocode': '30/60',
+    'write': '20/60'
+}
+UPSTREAM_CLASSES = ('llm', 'geocode')
+MAX_CLIENTS = 100000
+
+
+def rate_limit(endpoint_class, upstream=None):
+    """Tag a view with its endpoint class, enforced by the before_request hook
+
+    upstream=False charges the class budget without taking an upstream slot,
+    for views that only queue the upstream work.
+    """
+    def decorator(view):
+        view.rate_limit = endpoint_class
+        view.rate_limit_upstream = endpoint_class in UPSTREAM_CLASSES if upstream is None else upstream
+        return view
+    return decorator
+
+
+def client_ip():
+    """Address of the client, as seen by the nearest trusted proxy"""
+    hops = int(os.environ.get('FORWARDED_HOPS', 1))
+    forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+    if hops > 0 and forwarded:
+        return forwarded[-min(hops, len(forwarded))]
+    return request.remote_addr or 'unknown'
+
+
+def parse_limit(text):
+    """(capacity, refill per second) from "<requests>/<seconds>" """
+    requests_allowed, seconds = text.split('/')
+    capacity, seconds = float(requests_allowed), float(seconds)
+    if capacity <= 0 or seconds <= 0:
+        raise ValueError(f"rate limit must be positive: {text}")
+    return capacity, capacity / seconds
+
+
+class RateLimiter:
+    """Token buckets per (class, client), least recently used ones evicted"""
+
+    def __init__(self, limits, processes=1, max_clients=MAX_CLIENTS):
+        # Each process holds 1/processes of the budget; the burst stays at
+        # least one request so a client is never locked out entirely
+        self.limits = {name: (max(1.0, capacity / processes), rate / processes)
+                       for name, (capacity, rate) in limits.items()}
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def acquire(self, endpoint_class, client):
+        """0 if admitted, else seconds until the client may retry"""
+        capacity, rate = self.limits[endpoint_class]
+        key = (endpoint_class, client)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            admitted = tokens >= 1
+            if admitted:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            self._count(endpoint_class, 'admitted_total' if admitted else 'limited_total')
+        return 0 if admitted else (1 - tokens) / rate
+
+    def count(self, endpoint_class, outcome):
+        with self._lock:
+            self._count(endpoint_class, outcome)
+
+    def metrics(self):
+        with self._lock:
+            stats = {name: dict(counts) for name, counts in self._stats.items()}
+            stats['tracked_clients'] = len(self._buckets)
+        return stats
+
+    def _count(self, endpoint_class, outcome):
+        # Caller holds self._lock
+        counts = self._stats.setdefault(endpoint_class, {'admitted_total': 0, 'limited_total': 0, 'shed_total': 0})
+        counts[outcome] += 1
+
+
+def _too_many(message, retry_after):
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_rate_limits(app):
+    """Enforce @rate_limit classes; returns the limiter for stats"""
+    processes = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+    limits = {name: parse_limit(os.environ.get(f'RATE_LIMIT_{name.upper()}', default))
+              for name, default in DEFAULT_LIMITS.items()}
+    limiter = RateLimiter(limits, processes)
+    upstream_slots = threading.BoundedSemaphore(
+        max(1, int(os.environ.get('UPSTREAM_CONCURRENCY', 32)) // processes))
+
+    @app.before_request
+    def admit_request():
+        view = current_app.view_functions.get(request.endpoint)
+        endpoint_class = getattr(view, 'rate_limit', None)
+        if endpoint_class is None:
+            return None
+
+        retry_after = limiter.acquire(endpoint_class, client_ip())
+        if retry_after:
+            return _too_many('Too many requests, please slow down', retry_after)
+
+        if view.rate_limit_upstream:
+            if not upstream_slots.acquire(blocking=False):
+                limiter.count(endpoint_class, 'shed_total')
+                return _too_many('Server is busy, please retry shortly', 1)
+            g.upstream_slot = True
+        return None
+
+    @app.teardown_request
+    def release_upstream_slot(error=None):
+        if g.pop('upstream_slot', False):
+            upstream_slots.release()
+
+    return limiter
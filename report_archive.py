@@ -0,0 +1,236 @@
+"""
+Hot/cold partitioning of reports
+
+Reports older than a retention age are moved out of news_reports.db into an
+archive database with one table per month (reports_YYYY_MM) and a registry
+of partitions. The live `reports` table, its indexes and its FTS index then
+only hold recent rows, which keeps the hot working set small enough to stay
+in the page cache. Listing and search reach archived rows by ATTACHing the
+archive database; since archived rows are always older than live ones,
+they simply continue the newest-first order after the live rows.
+
+Archiving a report removes it from the map tile grid (maps show current
+events) but not from the dashboard rollups, which count all reports ever
+submitted.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from report_search import fold_text
+from report_tiles import add_report_to_grid
+
+ARCHIVE_SCHEMA = 'archive'
+ARCHIVE_BATCH_SIZE = 1000
+# VACUUM only when at least this share of the file is free pages
+VACUUM_FREE_RATIO = 0.2
+
+REPORT_COLUMNS = ('id', 'title', 'content', 'url', 'report_type', 'location', 'latitude',
+                  'longitude', 'timestamp', 'credibility_score', 'user_ip')
+
+_MONTH_PATTERN = re.compile(r'^(\d{4})-(\d{2})$')
+
+
+def attach_archive(conn, archive_path):
+    """ATTACH the archive database as `archive`; False if it does not exist yet"""
+    if not os.path.exists(archive_path):
+        return False
+    conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path,))
+    return True
+
+
+def archive_partitions(cursor):
+    """Archive partition table names, newest month first (archive must be attached)"""
+    cursor.execute(f'SELECT table_name FROM {ARCHIVE_SCHEMA}.archive_partitions ORDER BY month DESC')
+    return [f'{ARCHIVE_SCHEMA}.{row[0]}' for row in cursor.fetchall()]
+
+
+def _create_archive_schema(cursor):
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.archive_partitions (
+            month TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # Contentful FTS index: archived rows are searched without touching partitions
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.reports_fts USING fts5(
+            title, content,
+            url UNINDEXED, report_type UNINDEXED, location UNINDEXED,
+            timestamp UNINDEXED, credibility_score UNINDEXED,
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+
+
+def _partition_for(cursor, month):
+    """Table name for a 'YYYY-MM' month, creating the partition if needed"""
+    match = _MONTH_PATTERN.match(month or '')
+    month = month if match else 'undated'
+    table = f'reports_{match.group(1)}_{match.group(2)}' if match else 'reports_undated'
+
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{table} (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            url TEXT,
+            report_type TEXT NOT NULL,
+            location TEXT,
+            latitude REAL,
+            longitude REAL,
+            timestamp DATETIME,
+            credibility_score INTEGER,
+            user_ip TEXT
+        )
+    ''')
+    # Same listing indexes as the live table so filtered paging stays indexed
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_timestamp_id ON {table} (timestamp, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_type_timestamp ON {table} (report_type, timestamp, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_location_timestamp ON {table} (location, timestamp, id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_score ON {table} (credibility_score)')
+    cursor.execute(f'''
+        INSERT INTO {ARCHIVE_SCHEMA}.archive_partitions (month, table_name) VALUES (?, ?)
+        ON CONFLICT (month) DO NOTHING
+    ''', (month, table))
+    return month, table
+
+
+def archive_reports(db_path, archive_path, max_age_days, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+    """Move reports older than max_age_days into monthly archive partitions
+
+    Each batch is one transaction across both databases, so a row is
+    always in exactly one place. Returns the number of rows moved.
+    """
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+    columns = ', '.join(REPORT_COLUMNS)
+    moved = 0
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path,))
+        cursor = conn.cursor()
+        _create_archive_schema(cursor)
+
+        while True:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'''
+                SELECT {columns}, substr(timestamp, 1, 7)
+                FROM main.reports
+                WHERE timestamp < ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', (cutoff, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute('COMMIT')
+                break
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(row[-1], []).append(row[:-1])
+
+            for month, month_rows in by_month.items():
+                month, table = _partition_for(cursor, month)
+                placeholders = ', '.join('?' * len(REPORT_COLUMNS))
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{table} ({columns}) VALUES ({placeholders})',
+                    month_rows
+                )
+                cursor.execute(f'''
+                    UPDATE {ARCHIVE_SCHEMA}.archive_partitions SET row_count = row_count + ? WHERE month = ?
+                ''', (len(month_rows), month))
+
+            cursor.executemany(f'''
+                INSERT INTO {ARCHIVE_SCHEMA}.reports_fts
+                    (rowid, title, content, url, report_type, location, timestamp, credibility_score)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(row[0], fold_text(row[1]), fold_text(row[2]), row[3], row[4], row[5], row[8], row[9])
+                  for row in rows])
+
+            for row in rows:
+                if row[6] is not None and row[7] is not None:
+                    add_report_to_grid(cursor, row[6], row[7], row[4], row[9], count=-1)
+
+            # The FTS delete trigger on main.reports drops the live index entries
+            cursor.executemany('DELETE FROM main.reports WHERE id = ?', [(row[0],) for row in rows])
+            cursor.execute('COMMIT')
+            moved += len(rows)
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return moved
+
+
+def vacuum_if_fragmented(db_path, min_free_ratio=VACUUM_FREE_RATIO):
+    """VACUUM the database when enough of it is free pages; True if it ran"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not page_count or free_pages / page_count < min_free_ratio:
+            return False
+        conn.execute('VACUUM')
+        return True
+    finally:
+        conn.close()
+
+
+def run_maintenance(db_path, archive_path, max_age_days):
+    """Archive old reports, then compact the live database if worthwhile"""
+    started = time.perf_counter()
+    moved = archive_reports(db_path, archive_path, max_age_days)
+    vacuumed = vacuum_if_fragmented(db_path)
+    print(f"Archive maintenance: moved {moved} reports, vacuum={'yes' if vacuumed else 'no'}, "
+          f"took {time.perf_counter() - started:.1f}s")
+    return moved, vacuumed
+
+
+class MaintenanceScheduler:
+    """Daemon thread that runs run_maintenance once a day at an off-peak hour (UTC)"""
+
+    def __init__(self, db_path, archive_path, max_age_days, hour_utc=3):
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.max_age_days = max_age_days
+        self.hour_utc = hour_utc
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='archive-maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def seconds_until_next_run(self, now=None):
+        now = now or datetime.utcnow()
+        next_run = now.replace(hour=self.hour_utc, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def _run(self):
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                run_maintenance(self.db_path, self.archive_path, self.max_age_days)
+            except Exception as e:
+                print(f"Archive maintenance error: {e}")
+
+
+if __name__ == "__main__":
+    run_maintenance(
+        'news_reports.db',
+        os.environ.get('ARCHIVE_DB_PATH', 'news_reports_archive.db'),
+        int(os.environ.get('ARCHIVE_MAX_AGE_DAYS', 90))
+    )
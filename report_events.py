@@ -0,0 +1,342 @@
+"""
+Server-Sent Events feed of new reports and report-count deltas
+
+Triggers on the reports table append a row to report_events whenever a
+report is inserted or gains coordinates (after background geocoding), in the
+same transaction as the write. One ReportEventFeed thread per process tails
+that table every `poll_interval` seconds and fans new events out to every
+connected client from an in-memory buffer, so the database sees one small
+indexed query per interval no matter how many tabs are open, and writers in
+other processes (bulk ingest, the geocode worker) are picked up too.
+
+Event ids are report_events ids. A reconnecting client sends Last-Event-ID
+and is replayed what it missed straight from the table, up to RESUME_LIMIT
+events; past that it gets a `reset` event and should reload from the
+regular endpoints. Idle connections receive a comment line every
+`heartbeat` seconds so proxies keep them open.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+POLL_INTERVAL = 0.5
+HEARTBEAT_SECONDS = 15
+RECONNECT_MS = 3000
+BUFFER_SIZE = 1000
+RESUME_LIMIT = 500
+FETCH_LIMIT = 500
+CONTENT_PREVIEW_CHARS = 300
+# report_events rows older than this are pruned; resuming needs only minutes
+RETENTION_SECONDS = 24 * 3600
+PRUNE_INTERVAL = 3600
+# How long a new subscriber waits for the feed's first poll before a 503
+START_TIMEOUT = 5
+
+
+def create_report_events(cursor):
+    """Event log table plus the triggers that fill it"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_report_events_created ON report_events (created_at)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS report_events_created AFTER INSERT ON reports
+        BEGIN
+            INSERT INTO report_events (report_id, kind) VALUES (NEW.id, 'created');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS report_events_located AFTER UPDATE OF latitude, longitude ON reports
+        WHEN OLD.latitude IS NULL AND NEW.latitude IS NOT NULL
+        BEGIN
+            INSERT INTO report_events (report_id, kind) VALUES (NEW.id, 'located');
+        END
+    ''')
+
+
+_EVENT_QUERY = f'''
+    SELECT e.id, e.kind, r.id, r.title, substr(r.content, 1, {CONTENT_PREVIEW_CHARS}), r.report_type,
+           r.location, r.latitude, r.longitude, r.credibility_score, r.timestamp
+    FROM report_events e
+    LEFT JOIN reports r ON r.id = e.report_id
+'''
+
+
+def _report_event(row):
+    return row[0], {
+        'id': row[2],
+        'kind': row[1],
+        'title': row[3],
+        'content': row[4],
+        'type': row[5],
+        'location': row[6],
+        'lat': row[7],
+        'lng': row[8],
+        'credibility_score': row[9],
+        'timestamp': row[10]
+    }
+
+
+def parse_event_filters(args):
+    """(bbox, types) from query args; bbox is (min_lat, min_lng, max_lat, max_lng) or None
+
+    Raises ValueError for a malformed bbox.
+    """
+    bbox = None
+    if args.get('bbox'):
+        try:
+            bbox = tuple(float(value) for value in args['bbox'].split(','))
+        except ValueError:
+            raise ValueError('bbox must be min_lat,min_lng,max_lat,max_lng')
+        if len(bbox) != 4 or bbox[0] > bbox[2]:
+            raise ValueError('bbox must be min_lat,min_lng,max_lat,max_lng')
+    types = {value for value in args.get('type', '').split(',') if value} or None
+    return bbox, types
+
+
+def _matches(report, bbox, types):
+    if types is not None and report['type'] not in types:
+        return False
+    if bbox is None:
+        return True
+    if report['lat'] is None or report['lng'] is None:
+        return False
+    min_lat, min_lng, max_lat, max_lng = bbox
+    if not min_lat <= report['lat'] <= max_lat:
+        return False
+    if min_lng <= max_lng:
+        return min_lng <= report['lng'] <= max_lng
+    # Box crossing the antimeridian
+    return report['lng'] >= min_lng or report['lng'] <= max_lng
+
+
+def format_event(event, data, event_id=None):
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    return message + f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+class ReportEventFeed:
+    """Tails report_events and fans new events out to SSE subscribers"""
+
+    def __init__(self, db_path, poll_interval=POLL_INTERVAL, heartbeat=HEARTBEAT_SECONDS,
+                 max_subscribers=500):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        # (position, event, event_id, data); position counts every event ever buffered
+        self._buffer = deque(maxlen=BUFFER_SIZE)
+        self._position = 0
+        self._last_id = None
+        self._subscribers = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stats = {
+            'events_total': 0,
+            'polls_total': 0,
+            'poll_errors_total': 0,
+            'resumes_total': 0,
+            'resets_total': 0,
+            'rejected_total': 0,
+            'last_poll_seconds': 0.0
+        }
+
+    def metrics(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['subscribers'] = self._subscribers
+            stats['last_event_id'] = self._last_id
+        return stats
+
+    def subscribe(self, last_event_id=None, bbox=None, types=None):
+        """Iterable of SSE messages for one client; close() it to free the slot
+
+        The slot is reserved here, under the lock, so concurrent connects
+        cannot overshoot max_subscribers. Raises RuntimeError when all
+        slots are taken, or when the feed has not managed to read the event
+        log within START_TIMEOUT seconds.
+        """
+        self._ensure_started()
+        with self._condition:
+            if self._subscribers >= self.max_subscribers:
+                self._stats['rejected_total'] += 1
+                raise RuntimeError('Too many open event streams')
+            self._subscribers += 1
+            # Wait for the first poll so resume has a fixed upper bound
+            if not self._condition.wait_for(lambda: self._last_id is not None, START_TIMEOUT):
+                self._subscribers -= 1
+                raise RuntimeError('Event feed is not ready yet')
+            position, high_water = self._position, self._last_id
+        return _Subscription(self, self._stream(position, high_water, last_event_id, bbox, types))
+
+    def _release(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def _stream(self, position, high_water, last_event_id, bbox, types):
+        yield f'retry: {RECONNECT_MS}\n\n'
+        if last_event_id is not None and last_event_id < high_water:
+            yield from self._replay(last_event_id, high_water, bbox, types)
+        last_sent = time.monotonic()
+
+        while True:
+            with self._condition:
+                if self._position == position:
+                    self._condition.wait(self.heartbeat)
+                oldest = self._position - len(self._buffer)
+                if position < oldest:
+                    # Fell further behind than the buffer holds
+                    self._stats['resets_total'] += 1
+                    pending = None
+                else:
+                    pending = list(self._buffer)[position - oldest:]
+                position = self._position
+
+            if pending is None:
+                yield format_event('reset', {})
+                last_sent = time.monotonic()
+                continue
+            for _, event, event_id, data in pending:
+                if event == 'report' and not _matches(data, bbox, types):
+                    continue
+                yield format_event(event, data, event_id)
+                last_sent = time.monotonic()
+            # Busy feeds whose events are all filtered out still need heartbeats
+            if time.monotonic() - last_sent >= self.heartbeat:
+                yield ': ping\n\n'
+                last_sent = time.monotonic()
+
+    def _replay(self, last_event_id, high_water, bbox, types):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(_EVENT_QUERY + ' WHERE e.id > ? AND e.id <= ? ORDER BY e.id DESC LIMIT ?',
+                                (last_event_id, high_water, RESUME_LIMIT + 1)).fetchall()
+        finally:
+            conn.close()
+
+        with self._condition:
+            self._stats['resumes_total'] += 1
+        if len(rows) > RESUME_LIMIT:
+            with self._condition:
+                self._stats['resets_total'] += 1
+            yield format_event('reset', {})
+            return
+        for event_id, report in map(_report_event, reversed(rows)):
+            if report['id'] is not None and _matches(report, bbox, types):
+                yield format_event('report', report, event_id)
+        # A stats delta for what was replayed would double count reports the
+        # client already loaded, so only live deltas are sent
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='report-events', daemon=True)
+                self._thread.start()
+
+    def _open(self):
+        """Connection and current high-water id, retried until the database answers"""
+        while True:
+            conn = None
+            try:
+                conn = sqlite3.connect(self.db_path)
+                create_report_events(conn.cursor())
+                conn.commit()
+                return conn, conn.execute('SELECT COALESCE(MAX(id), 0) FROM report_events').fetchone()[0]
+            except sqlite3.Error as e:
+                # E.g. the database is locked while another process starts up
+                print(f"Report event feed error: {e}")
+                with self._condition:
+                    self._stats['poll_errors_total'] += 1
+                if conn is not None:
+                    conn.close()
+                time.sleep(self.poll_interval)
+
+    def _run(self):
+        conn, last_id = self._open()
+        last_prune = 0.0
+        with self._condition:
+            self._last_id = last_id
+            self._condition.notify_all()
+
+        while True:
+            time.sleep(self.poll_interval)
+            started = time.perf_counter()
+            try:
+                rows = conn.execute(_EVENT_QUERY + ' WHERE e.id > ? ORDER BY e.id LIMIT ?',
+                                    (last_id, FETCH_LIMIT)).fetchall()
+                if rows:
+                    last_id = rows[-1][0]
+                if time.time() - last_prune > PRUNE_INTERVAL:
+                    conn.execute('DELETE FROM report_events WHERE created_at < ?',
+                                 (time.time() - RETENTION_SECONDS,))
+                    conn.commit()
+                    last_prune = time.time()
+            except sqlite3.Error as e:
+                print(f"Report event feed error: {e}")
+                with self._condition:
+                    self._stats['poll_errors_total'] += 1
+                continue
+            self._publish(rows, last_id, time.perf_counter() - started)
+
+    def _publish(self, rows, last_id, elapsed):
+        # Events whose report was deleted or archived meanwhile are skipped
+        events = [('report', *_report_event(row)) for row in rows if row[2] is not None]
+        by_type = {}
+        for _, _, report in events:
+            if report['kind'] == 'created':
+                by_type[report['type']] = by_type.get(report['type'], 0) + 1
+        if by_type:
+            events.append(('stats', None, {'reports': sum(by_type.values()), 'by_type': by_type}))
+
+        with self._condition:
+            for event, event_id, data in events:
+                self._position += 1
+                self._buffer.append((self._position, event, event_id, data))
+            self._last_id = last_id
+            self._stats['events_total'] += len(rows)
+            self._stats['polls_total'] += 1
+            self._stats['last_poll_seconds'] = elapsed
+            if events:
+                self._condition.notify_all()
+
+
+class _Subscription:
+    """One client's stream; releases its subscriber slot exactly once on close()
+
+    The WSGI server calls close() when the response ends or the client goes
+    away, including before the first message, which a bare generator's
+    finally block would miss.
+    """
+
+    def __init__(self, feed, stream):
+        self._feed = feed
+        self._stream = stream
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stream.close()
+        self._feed._release()
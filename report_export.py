@@ -0,0 +1,194 @@
+"""
+Streaming export of reports as CSV, NDJSON or Parquet
+
+Rows are read in keyset batches of FETCH_SIZE on (timestamp, id), each its
+own short query, so an export never holds the whole result in memory and
+never holds a read lock on the database for longer than one batch. Every
+format is produced incrementally: CSV and NDJSON per batch, Parquet one
+row group at a time, and gzip through a streaming compressor. Memory use
+is bounded by the batch and row group sizes, not by the table size.
+
+Parquet needs the optional pyarrow package.
+"""
+import csv
+import io
+import json
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from report_listing import filter_conditions, parse_listing_args
+
+FETCH_SIZE = 1000
+PARQUET_ROW_GROUP_SIZE = 5000
+
+# user_ip is left out on purpose: exports leave the server
+EXPORT_COLUMNS = ('id', 'title', 'content', 'url', 'report_type', 'location', 'latitude',
+                  'longitude', 'timestamp', 'credibility_score')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def parse_export_args(args):
+    """Export format, gzip flag and report filters from request query args
+
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    export_format = args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if export_format == 'parquet' and pq is None:
+        raise ValueError('Parquet export requires the pyarrow package')
+
+    options = parse_listing_args(args)
+    filters = {key: options[key] for key in ('report_type', 'location', 'min_score', 'max_score')}
+    compress = args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    return export_format, compress, filters
+
+
+def iter_report_batches(cursor, tables=('reports',), fetch_size=FETCH_SIZE, **filters):
+    """Lists of report rows, oldest first, reading `tables` in order"""
+    base_conditions, base_params = filter_conditions(**filters)
+    columns = ', '.join(EXPORT_COLUMNS)
+
+    for table in tables:
+        after = None
+        while True:
+            conditions = list(base_conditions)
+            params = list(base_params)
+            if after is not None:
+                conditions.append('(timestamp, id) > (?, ?)')
+                params.extend(after)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+            cursor.execute(f'''
+                SELECT {columns}
+                FROM {table}
+                {where}
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', params + [fetch_size])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield rows
+            if len(rows) < fetch_size:
+                break
+            after = (rows[-1][8], rows[-1][0])
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _ndjson_chunks(batches):
+    for rows in batches:
+        lines = [json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) for row in rows]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('title', pa.string()),
+        ('content', pa.string()),
+        ('url', pa.string()),
+        ('report_type', pa.string()),
+        ('location', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('timestamp', pa.string()),
+        ('credibility_score', pa.int64())
+    ])
+
+
+def _parquet_chunks(batches, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    pending = []
+
+    def write_row_group():
+        columns = list(zip(*pending))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        ), row_group_size=len(pending))
+        pending.clear()
+
+    for rows in batches:
+        pending.extend(rows)
+        if len(pending) >= row_group_size:
+            write_row_group()
+            yield sink.drain()
+    if pending:
+        write_row_group()
+    writer.close()
+    yield sink.drain()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_reports(cursor, export_format, compress=False, tables=('reports',), **filters):
+    """Generator of export file bytes for the matching reports"""
+    batches = iter_report_batches(cursor, tables, **filters)
+    if export_format == 'csv':
+        chunks = _csv_chunks(batches)
+    elif export_format == 'ndjson':
+        chunks = _ndjson_chunks(batches)
+    else:
+        chunks = _parquet_chunks(batches)
+    return _gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,133 @@
+"""
+Keyset-paginated report listing
+
+Pages are ordered newest first on (timestamp, id) and continue from an
+opaque cursor instead of an OFFSET, so page 500 costs the same index range
+scan as page 1. Content is cut down to a preview inside SQLite so full
+article bodies never leave the database for list views.
+"""
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def create_listing_indexes(cursor):
+    """Indexes backing the listing order and its filters"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_timestamp_id ON reports (timestamp, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_type_timestamp ON reports (report_type, timestamp, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_location_timestamp ON reports (location, timestamp, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_score ON reports (credibility_score)')
+
+
+def encode_cursor(timestamp, report_id):
+    """Opaque page cursor for the position after (timestamp, id)"""
+    raw = json.dumps([timestamp, report_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, report_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(timestamp), int(report_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_listing_args(args, default_limit=DEFAULT_PAGE_SIZE):
+    """Read paging and filter options from request query args
+
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    try:
+        limit = int(args.get('limit', default_limit))
+        min_score = args.get('min_score')
+        max_score = args.get('max_score')
+        min_score = int(min_score) if min_score not in (None, '') else None
+        max_score = int(max_score) if max_score not in (None, '') else None
+    except ValueError:
+        raise ValueError('limit, min_score and max_score must be integers')
+
+    cursor_token = args.get('cursor')
+    return {
+        'limit': max(1, min(MAX_PAGE_SIZE, limit)),
+        'after': decode_cursor(cursor_token) if cursor_token else None,
+        'report_type': args.get('type') or args.get('report_type') or None,
+        'location': args.get('location') or None,
+        'min_score': min_score,
+        'max_score': max_score
+    }
+
+
+def filter_conditions(report_type=None, location=None, min_score=None, max_score=None):
+    """WHERE conditions and parameters for the shared report filters"""
+    conditions = []
+    params = []
+    if report_type:
+        conditions.append('report_type = ?')
+        params.append(report_type)
+    if location:
+        conditions.append('location = ?')
+        params.append(location)
+    if min_score is not None:
+        conditions.append('credibility_score >= ?')
+        params.append(min_score)
+    if max_score is not None:
+        conditions.append('credibility_score <= ?')
+        params.append(max_score)
+    return conditions, params
+
+
+def list_reports(cursor, limit=DEFAULT_PAGE_SIZE, after=None, report_type=None, location=None,
+                 min_score=None, max_score=None, preview_chars=200, tables=('reports',)):
+    """One page of reports, newest first
+
+    `tables` are read in order until the page is full; pass the live table
+    followed by archive partitions (newest first) to page into the archive.
+    Returns (reports, next_cursor); next_cursor is None on the last page.
+    """
+    conditions, params = filter_conditions(report_type, location, min_score, max_score)
+    if after is not None:
+        conditions.insert(0, '(timestamp, id) < (?, ?)')
+        params[:0] = after
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    # One extra character tells us whether the preview was cut; one extra row
+    # tells us whether there is another page
+    rows = []
+    for table in tables:
+        cursor.execute(f'''
+            SELECT id, title, substr(content, 1, ?), url, report_type, location, timestamp,
+                   credibility_score
+            FROM {table}
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', [preview_chars + 1] + params + [limit + 1 - len(rows)])
+        rows.extend(cursor.fetchall())
+        if len(rows) > limit:
+            break
+
+    reports = []
+    for row in rows[:limit]:
+        content = row[2] or ''
+        reports.append({
+            'id': row[0],
+            'title': row[1],
+            'content': content[:preview_chars] + '...' if len(content) > preview_chars else content,
+            'url': row[3],
+            'report_type': row[4],
+            'location': row[5],
+            'timestamp': row[6],
+            'credibility_score': row[7]
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = reports[-1]
+        next_cursor = encode_cursor(last['timestamp'], last['id'])
+
+    return reports, next_cursor
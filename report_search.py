@@ -0,0 +1,247 @@
+"""
+Full-text search over reports and chat analyses (SQLite FTS5)
+
+Each searchable table gets an external-content FTS5 index kept in sync by
+triggers, so every insert path (single, bulk, write-behind) is covered
+without application code. The unicode61 tokenizer folds case and strips
+Latin and Arabic diacritics; the content views additionally fold Arabic
+alef variants and tatweel, and the query builder matches Arabic words with
+or without the definite article. Ranking is BM25 with titles weighted
+above bodies, and pages continue from a (score, rowid, tier) cursor.
+"""
+import base64
+import html
+import json
+import re
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+SNIPPET_TOKENS = 16
+
+# Applied identically when indexing (as SQL) and when querying (in Python)
+ARABIC_FOLDING = [('أ', 'ا'), ('إ', 'ا'), ('آ', 'ا'), ('ٱ', 'ا'), ('ـ', '')]
+ARABIC_LETTERS = re.compile(r'[؀-ۿ]')
+
+# Highlight markers that cannot appear in normal text; swapped for <mark>
+# after the snippet has been HTML-escaped
+_MARK_OPEN = '\x02'
+_MARK_CLOSE = '\x03'
+
+# Searchable tables: indexed columns, their BM25 weights and the extra
+# columns returned with each hit
+SEARCH_SOURCES = {
+    'reports': {
+        'table': 'reports',
+        'columns': ('title', 'content'),
+        'weights': (10.0, 1.0),
+        'fields': ('title', 'url', 'report_type', 'location', 'timestamp', 'credibility_score')
+    },
+    'chat': {
+        'table': 'chat_history',
+        'columns': ('user_message', 'bot_response'),
+        'weights': (2.0, 1.0),
+        'fields': ('timestamp',)
+    }
+}
+
+# Sources an anonymous caller may search. Chat history holds other users'
+# messages and stays internal until sessions are tied to real accounts.
+PUBLIC_SOURCES = ('reports',)
+
+
+def _folded_sql(expression):
+    for original, replacement in ARABIC_FOLDING:
+        expression = f"replace({expression}, '{original}', '{replacement}')"
+    return expression
+
+
+def fold_text(text):
+    """Python twin of the SQL folding used by the content views"""
+    for original, replacement in ARABIC_FOLDING:
+        text = text.replace(original, replacement)
+    return text
+
+
+def create_search_index(conn, source):
+    """Create the FTS table, content view and sync triggers for one source
+
+    Backfills the index from existing rows the first time it is created.
+    """
+    spec = SEARCH_SOURCES[source]
+    table = spec['table']
+    fts = f'{table}_fts'
+    view = f'{table}_search'
+    columns = spec['columns']
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,))
+    exists = cursor.fetchone() is not None
+
+    folded = ', '.join(f'{_folded_sql(column)} AS {column}' for column in columns)
+    cursor.execute(f'CREATE VIEW IF NOT EXISTS {view} AS SELECT id, {folded} FROM {table}')
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {', '.join(columns)},
+            content='{view}',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    column_list = ', '.join(columns)
+    new_values = ', '.join(_folded_sql(f'new.{column}') for column in columns)
+    old_values = ', '.join(_folded_sql(f'old.{column}') for column in columns)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+
+    if not exists:
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+
+def create_search_indexes(conn):
+    """Create FTS indexes for every searchable source"""
+    for source in SEARCH_SOURCES:
+        create_search_index(conn, source)
+
+
+def build_match_query(text):
+    """Turn free text into a safe FTS5 MATCH expression
+
+    Every word is quoted, so FTS syntax in user input is treated literally.
+    A trailing * keeps prefix search. Arabic words also match with the
+    definite article (ال) added or removed.
+    """
+    terms = []
+    for word in fold_text(text).split():
+        prefix = word.endswith('*')
+        word = re.sub(r'["*]', '', word).strip()
+        if not word:
+            continue
+
+        variants = [word]
+        if ARABIC_LETTERS.search(word):
+            if word.startswith('ال') and len(word) > 3:
+                variants.append(word[2:])
+            elif not word.startswith('ال'):
+                variants.append('ال' + word)
+
+        star = '*' if prefix else ''
+        quoted = [f'"{variant}"{star}' for variant in variants]
+        terms.append(quoted[0] if len(quoted) == 1 else f"({' OR '.join(quoted)})")
+
+    return ' AND '.join(terms)
+
+
+def encode_cursor(score, rowid, tier=0):
+    raw = json.dumps([score, rowid, tier]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Cursor as (score, rowid, tier); tier 0 is live rows, 1 the archive"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        tier = int(values[2]) if len(values) > 2 else 0
+        return float(values[0]), int(values[1]), tier
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _snippet_html(snippet):
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def _search_tier(cursor, match, fts, weights, from_sql, fields_sql, after, limit):
+    """Rows (rowid, score, snippet, *fields) from one FTS index, best first"""
+    bm25 = f"bm25({fts}, {', '.join(str(weight) for weight in weights)})"
+
+    # bm25() is lower-is-better, so pages run in ascending (score, rowid)
+    query = f'''
+        SELECT {fts}.rowid, {bm25} AS score,
+               snippet({fts}, -1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_TOKENS}),
+               {fields_sql}
+        FROM {from_sql}
+        WHERE {fts} MATCH ?
+    '''
+    params = [match]
+    if after is not None:
+        query += f' AND ({bm25} > ? OR ({bm25} = ? AND {fts}.rowid > ?))'
+        params += [after[0], after[0], after[1]]
+    query += f' ORDER BY score, {fts}.rowid LIMIT ?'
+    params.append(limit)
+
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def search(cursor, text, source='reports', limit=DEFAULT_PAGE_SIZE, after=None, include_archived=False):
+    """One page of BM25-ranked matches for `text` in `source`
+
+    With include_archived (reports only, archive database attached), the
+    archive's own FTS index is searched once live matches run out, so
+    archived hits rank after all live ones. Returns (results, next_cursor).
+    Raises ValueError for an unknown source or an empty query.
+    """
+    if source not in SEARCH_SOURCES:
+        raise ValueError(f"source must be one of {', '.join(SEARCH_SOURCES)}")
+    match = build_match_query(text or '')
+    if not match:
+        raise ValueError('Search query is empty')
+
+    spec = SEARCH_SOURCES[source]
+    table = spec['table']
+    fts = f'{table}_fts'
+    limit = max(1, min(MAX_PAGE_SIZE, limit))
+
+    # (tier, FROM clause, selected fields); tier 1 reads everything from the
+    # contentful archive index
+    tiers = [(0, f'{fts} JOIN {table} t ON t.id = {fts}.rowid', ', '.join(f't.{field}' for field in spec['fields']))]
+    if include_archived and source == 'reports':
+        tiers.append((1, f'archive.{fts}', ', '.join(spec['fields'])))
+
+    rows = []
+    for tier, from_sql, fields_sql in tiers:
+        if after is not None and after[2] > tier:
+            continue
+        tier_after = after[:2] if after is not None and after[2] == tier else None
+        tier_rows = _search_tier(cursor, match, fts, spec['weights'], from_sql, fields_sql,
+                                 tier_after, limit + 1 - len(rows))
+        rows.extend((tier,) + tuple(row) for row in tier_rows)
+        if len(rows) > limit:
+            break
+
+    results = []
+    for row in rows[:limit]:
+        result = {
+            'id': row[1],
+            'source': source,
+            'archived': row[0] > 0,
+            'score': round(-row[2], 4),
+            'snippet': _snippet_html(row[3])
+        }
+        result.update(zip(spec['fields'], row[4:]))
+        results.append(result)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last[2], last[1], last[0])
+
+    return results, next_cursor
@@ -0,0 +1,193 @@
+"""
+Incrementally maintained report rollups for dashboard statistics
+
+A trigger on `reports` upserts one row per (bucket, dimension, value) into
+report_rollups whenever a report is inserted or re-classified, for hourly,
+daily and all-time buckets. Dimensions are the report type, the location,
+the credibility score decile and an overall total. /api/stats reads only
+these rows, so a dashboard poll is a primary-key range scan whose cost
+depends on the time window, not on how many reports exist.
+
+Rollups record every report ever submitted: deleting or archiving a
+report does not decrement them.
+"""
+from datetime import datetime, timedelta
+
+BUCKET_SIZES = ('hour', 'day', 'all')
+DEFAULT_WINDOWS = {'hour': 24, 'day': 30}
+MAX_WINDOW = 24 * 90
+TOP_LOCATIONS = 10
+
+# SQL for the bucket start of a row's timestamp, per bucket size
+_BUCKET_SQL = {
+    'hour': "strftime('%Y-%m-%d %H:00:00', COALESCE({row}.timestamp, CURRENT_TIMESTAMP))",
+    'day': "date(COALESCE({row}.timestamp, CURRENT_TIMESTAMP))",
+    'all': "''"
+}
+
+# SQL for the value a row contributes to each dimension
+_DIMENSION_SQL = {
+    'total': "''",
+    'type': "{row}.report_type",
+    'location': "COALESCE(NULLIF({row}.location, ''), 'Unknown')",
+    'score': ("CASE WHEN {row}.credibility_score IS NULL THEN 'unscored' "
+              "ELSE CAST(MIN(MAX({row}.credibility_score, 0), 99) / 10 * 10 AS TEXT) END")
+}
+
+
+def _upsert_statements(row, sign):
+    statements = []
+    for bucket_size, bucket_sql in _BUCKET_SQL.items():
+        for dimension, value_sql in _DIMENSION_SQL.items():
+            statements.append(f'''
+            INSERT INTO report_rollups (bucket_size, bucket_start, dimension, value,
+                                        report_count, score_sum, score_count)
+            VALUES ('{bucket_size}', {bucket_sql.format(row=row)}, '{dimension}',
+                    {value_sql.format(row=row)}, {sign},
+                    {sign} * COALESCE({row}.credibility_score, 0),
+                    {sign} * ({row}.credibility_score IS NOT NULL))
+            ON CONFLICT (bucket_size, bucket_start, dimension, value) DO UPDATE SET
+                report_count = report_count + excluded.report_count,
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + excluded.score_count;''')
+    return ''.join(statements)
+
+
+def create_rollups(conn):
+    """Create the rollup table and triggers; backfill on first creation"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_rollups'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_rollups (
+            bucket_size TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            report_count INTEGER NOT NULL DEFAULT 0,
+            score_sum INTEGER NOT NULL DEFAULT 0,
+            score_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_size, bucket_start, dimension, value)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS report_rollups_insert AFTER INSERT ON reports BEGIN
+            {_upsert_statements('new', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS report_rollups_update
+        AFTER UPDATE OF report_type, location, credibility_score, timestamp ON reports BEGIN
+            {_upsert_statements('old', -1)}
+            {_upsert_statements('new', 1)}
+        END
+    ''')
+
+    if not exists:
+        rebuild_rollups(conn)
+    conn.commit()
+
+
+def rebuild_rollups(conn):
+    """Recompute all rollups from the reports table"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM report_rollups')
+    for bucket_size, bucket_sql in _BUCKET_SQL.items():
+        for dimension, value_sql in _DIMENSION_SQL.items():
+            bucket = bucket_sql.format(row='reports')
+            value = value_sql.format(row='reports')
+            cursor.execute(f'''
+                INSERT INTO report_rollups (bucket_size, bucket_start, dimension, value,
+                                            report_count, score_sum, score_count)
+                SELECT '{bucket_size}', {bucket}, '{dimension}', {value}, COUNT(*),
+                       COALESCE(SUM(credibility_score), 0), COUNT(credibility_score)
+                FROM reports
+                GROUP BY 2, 4
+            ''')
+    conn.commit()
+
+
+def _bucket_start(moment, bucket_size):
+    if bucket_size == 'hour':
+        return moment.strftime('%Y-%m-%d %H:00:00')
+    return moment.strftime('%Y-%m-%d')
+
+
+def _score_label_order(item):
+    label = item[0]
+    # Deciles in numeric order, 'unscored' last
+    return (1, 0) if label == 'unscored' else (0, int(label.split('-')[0]))
+
+
+def _average(score_sum, score_count):
+    return round(score_sum / score_count, 1) if score_count else None
+
+
+def get_stats(cursor, bucket_size='hour', window=None, now=None):
+    """Dashboard statistics for the last `window` buckets, read from rollups
+
+    Raises ValueError for an unknown bucket size or a bad window.
+    """
+    if bucket_size not in BUCKET_SIZES:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKET_SIZES)}")
+
+    if bucket_size == 'all':
+        since = ''
+        window = None
+    else:
+        window = DEFAULT_WINDOWS[bucket_size] if window is None else int(window)
+        if not 1 <= window <= MAX_WINDOW:
+            raise ValueError(f'window must be between 1 and {MAX_WINDOW}')
+        # Timestamps are stored in UTC by CURRENT_TIMESTAMP
+        now = now or datetime.utcnow()
+        step = timedelta(hours=1) if bucket_size == 'hour' else timedelta(days=1)
+        since = _bucket_start(now - step * (window - 1), bucket_size)
+
+    cursor.execute('''
+        SELECT bucket_start, dimension, value, report_count, score_sum, score_count
+        FROM report_rollups
+        WHERE bucket_size = ? AND bucket_start >= ?
+    ''', (bucket_size, since))
+
+    totals = {'reports': 0, 'score_sum': 0, 'score_count': 0}
+    by_type = {}
+    by_location = {}
+    score_distribution = {}
+    series = {}
+
+    for bucket_start, dimension, value, count, score_sum, score_count in cursor.fetchall():
+        if count <= 0:
+            continue
+        if dimension == 'total':
+            totals['reports'] += count
+            totals['score_sum'] += score_sum
+            totals['score_count'] += score_count
+            series[bucket_start] = {
+                'bucket_start': bucket_start,
+                'reports': count,
+                'avg_credibility_score': _average(score_sum, score_count)
+            }
+        elif dimension == 'type':
+            by_type[value] = by_type.get(value, 0) + count
+        elif dimension == 'location':
+            by_location[value] = by_location.get(value, 0) + count
+        elif dimension == 'score':
+            label = value if value == 'unscored' else f'{value}-{int(value) + 9}'
+            score_distribution[label] = score_distribution.get(label, 0) + count
+
+    top_locations = sorted(by_location.items(), key=lambda item: (-item[1], item[0]))[:TOP_LOCATIONS]
+
+    return {
+        'bucket': bucket_size,
+        'window': window,
+        'since': since or None,
+        'totals': {
+            'reports': totals['reports'],
+            'avg_credibility_score': _average(totals['score_sum'], totals['score_count'])
+        },
+        'by_type': by_type,
+        'by_location': dict(top_locations),
+        'score_distribution': dict(sorted(score_distribution.items(), key=_score_label_order)),
+        'series': [series[key] for key in sorted(series)] if bucket_size != 'all' else []
+    }
@@ -0,0 +1,221 @@
+"""
+Storage backends for the serverless entry point (api/index.py)
+
+REPORTS_STORE picks one:
+
+- memory: in-process SQLite, created and seeded with sample reports on
+  every cold start. Reports vanish when the instance recycles.
+- file: a SQLite file at REPORTS_DB_PATH, e.g. on a mounted volume. The
+  schema and seed are created once, and reports persist across instances
+  that share the volume.
+- snapshot: a prebuilt database (REPORTS_SNAPSHOT_PATH) opened read-only
+  and immutable with its pages memory-mapped. A cold start does no schema
+  or seed work, and reads are the same on every instance. The first write
+  copies the snapshot to REPORTS_SCRATCH_PATH and carries on there, so
+  submitted reports last as long as the instance, as with memory.
+
+The default is snapshot when the snapshot file exists, memory otherwise.
+Opened connections are module state and are reused by warm invocations.
+
+`python report_store.py build [source_db] [snapshot]` builds the snapshot
+from the reports in source_db (default news_reports.db). Reporter IPs are
+not copied.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+from report_listing import create_listing_indexes
+from report_stats import create_rollups
+from report_tiles import ensure_grid
+
+STORES = ('memory', 'file', 'snapshot')
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT_SECONDS = 5
+
+REPORT_COLUMNS = ('title', 'content', 'url', 'report_type', 'location', 'latitude', 'longitude',
+                  'timestamp', 'credibility_score')
+
+
+def create_schema(conn, populate=None):
+    """Reports table, listing indexes, rollups and map grid
+
+    `populate(conn)` fills a newly created reports table before the rollups
+    and grid are backfilled from it.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports'")
+    created = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            url TEXT,
+            report_type TEXT NOT NULL,
+            location TEXT,
+            latitude REAL,
+            longitude REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            credibility_score INTEGER DEFAULT 0,
+            user_ip TEXT
+        )
+    ''')
+    if created and populate is not None:
+        populate(conn)
+
+    # Indexes for keyset-paginated listings
+    create_listing_indexes(cursor)
+    conn.commit()
+
+    # Dashboard rollups, kept in sync by triggers
+    create_rollups(conn)
+
+    # Precomputed map clusters for the tile endpoint
+    ensure_grid(conn)
+
+
+def seed_sample_reports(conn):
+    """Sample data for demonstration"""
+    now = datetime.now().isoformat()
+    conn.executemany('''
+        INSERT INTO reports (title, content, url, report_type, location, latitude, longitude, timestamp, credibility_score, user_ip)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        ("Traffic Disruption Downtown", "Major road closure affecting commuter routes", "https://example.com/traffic", "critical_event", "Downtown Area", 40.7128, -74.0060, now, 85, "127.0.0.1"),
+        ("Weather Alert Issued", "Severe weather warning for metropolitan area", "https://example.com/weather", "critical_event", "Metro Area", 40.7589, -73.9851, now, 92, "127.0.0.1"),
+        ("Community Safety Notice", "Enhanced security measures in downtown district", "https://example.com/safety", "critical_event", "Downtown", 40.7505, -73.9934, now, 78, "127.0.0.1")
+    ])
+
+
+def build_snapshot(snapshot_path, source_path=None):
+    """Write a compact, read-only-ready database of the source reports
+
+    Without a source the snapshot holds the sample reports.
+    """
+    columns = ', '.join(REPORT_COLUMNS)
+
+    def populate(conn):
+        if source_path is None:
+            seed_sample_reports(conn)
+            return
+        conn.execute('ATTACH DATABASE ? AS source', (f'file:{quote(os.path.abspath(source_path))}?mode=ro',))
+        conn.execute(f'INSERT INTO reports (id, {columns}) SELECT id, {columns} FROM source.reports ORDER BY id')
+        conn.commit()
+        conn.execute('DETACH DATABASE source')
+
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = snapshot_path + '.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    conn = sqlite3.connect(temporary)
+    try:
+        # Rollback journal rather than WAL: immutable readers need one file
+        conn.execute('PRAGMA journal_mode=DELETE')
+        create_schema(conn, populate)
+        count = conn.execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+        conn.execute('ANALYZE')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    os.replace(temporary, snapshot_path)
+    return count
+
+
+class ReportStore:
+    """The serverless instance's report database, opened once and reused"""
+
+    def __init__(self, kind, db_path=None, snapshot_path=None, scratch_path=None):
+        if kind not in STORES:
+            raise ValueError(f"REPORTS_STORE must be one of {', '.join(STORES)}")
+        self.kind = kind
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.scratch_path = scratch_path
+        self._conn = None
+        self._read_only = False
+        self._lock = threading.Lock()
+        self._stats = {'open_seconds': None, 'copied_on_write': False}
+
+    def connection(self, write=False):
+        """Shared connection; `write` moves a snapshot store to its writable copy first"""
+        with self._lock:
+            if self._conn is None:
+                started = time.perf_counter()
+                self._conn = self._open()
+                self._stats['open_seconds'] = round(time.perf_counter() - started, 6)
+            if write and self._read_only:
+                self._copy_on_write()
+            return self._conn
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats, read_only=self._read_only)
+        stats['store'] = self.kind
+        return stats
+
+    def _connect(self, target, **kwargs):
+        # One connection serves every request of the instance, as before
+        conn = sqlite3.connect(target, check_same_thread=False, timeout=BUSY_TIMEOUT_SECONDS, **kwargs)
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        return conn
+
+    def _open(self):
+        if self.kind == 'memory':
+            conn = self._connect(':memory:')
+            create_schema(conn, seed_sample_reports)
+            return conn
+
+        if self.kind == 'file':
+            conn = self._connect(self.db_path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            create_schema(conn, seed_sample_reports)
+            return conn
+
+        # A writable copy left by an earlier process on this instance is newer
+        if self.scratch_path and os.path.exists(self.scratch_path):
+            return self._connect(self.scratch_path)
+        self._read_only = True
+        return self._connect(f'file:{quote(os.path.abspath(self.snapshot_path))}?mode=ro&immutable=1', uri=True)
+
+    def _copy_on_write(self):
+        # Caller holds self._lock
+        temporary = self.scratch_path + '.tmp'
+        copy = sqlite3.connect(temporary)
+        self._conn.backup(copy)
+        copy.close()
+        os.replace(temporary, self.scratch_path)
+        self._conn.close()
+        self._conn = self._connect(self.scratch_path)
+        self._read_only = False
+        self._stats['copied_on_write'] = True
+
+
+def store_from_env(default_snapshot, default_scratch):
+    snapshot_path = os.environ.get('REPORTS_SNAPSHOT_PATH', default_snapshot)
+    default_kind = 'snapshot' if os.path.exists(snapshot_path) else 'memory'
+    return ReportStore(
+        os.environ.get('REPORTS_STORE', default_kind),
+        db_path=os.environ.get('REPORTS_DB_PATH', 'reports.db'),
+        snapshot_path=snapshot_path,
+        scratch_path=os.environ.get('REPORTS_SCRATCH_PATH', default_scratch)
+    )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != 'build':
+        sys.exit("usage: python report_store.py build [source_db] [snapshot]")
+    root = os.path.dirname(os.path.abspath(__file__))
+    source = args[1] if len(args) > 1 else os.path.join(root, 'news_reports.db')
+    target = args[2] if len(args) > 2 else os.path.join(root, 'data', 'reports_snapshot.db')
+    try:
+        total = build_snapshot(target, source if os.path.exists(source) else None)
+    except sqlite3.Error as e:
+        sys.exit(f"Snapshot build failed: {e}")
+    print(f"Wrote {total} reports to {target}")
@@ -0,0 +1,162 @@
+"""
+Server-side clustering of geotagged reports into Web Mercator map tiles
+
+Every geotagged report is counted into a grid cell at each zoom level from
+0 to MAX_GRID_ZOOM (the cells are the standard slippy-map tiles). A tile
+request then only reads the precomputed cells inside that tile, one grid
+level deeper by CLUSTER_BITS, so the cost and payload of a tile depend on
+the viewport and never on the number of reports.
+"""
+import math
+import sqlite3
+
+MAX_GRID_ZOOM = 20
+CLUSTER_BITS = 3  # 2**3 x 2**3 = up to 64 clusters per tile
+MAX_MERCATOR_LAT = 85.0511287798
+
+
+def create_grid_table(cursor):
+    """Create the report_grid aggregate table"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_grid (
+            zoom INTEGER NOT NULL,
+            cell_x INTEGER NOT NULL,
+            cell_y INTEGER NOT NULL,
+            report_type TEXT NOT NULL,
+            report_count INTEGER NOT NULL DEFAULT 0,
+            score_sum INTEGER NOT NULL DEFAULT 0,
+            score_count INTEGER NOT NULL DEFAULT 0,
+            lat_sum REAL NOT NULL DEFAULT 0,
+            lng_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (zoom, cell_x, cell_y, report_type)
+        ) WITHOUT ROWID
+    ''')
+
+
+def tile_for_point(lat, lng, zoom):
+    """Web Mercator tile (x, y) containing a point at the given zoom"""
+    n = 1 << zoom
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def is_valid_tile(z, x, y):
+    """Check tile coordinates are inside the supported pyramid"""
+    return 0 <= z <= MAX_GRID_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def add_report_to_grid(cursor, lat, lng, report_type, credibility_score, count=1):
+    """Add (count=1) or remove (count=-1) one report from every grid level
+
+    Runs in the caller's transaction so the grid stays consistent with
+    the reports table.
+    """
+    has_score = credibility_score is not None
+    rows = []
+    for zoom in range(MAX_GRID_ZOOM + 1):
+        cell_x, cell_y = tile_for_point(lat, lng, zoom)
+        rows.append((
+            zoom, cell_x, cell_y, report_type, count,
+            count * (credibility_score or 0), count * int(has_score),
+            count * lat, count * lng
+        ))
+
+    cursor.executemany('''
+        INSERT INTO report_grid (zoom, cell_x, cell_y, report_type, report_count,
+                                 score_sum, score_count, lat_sum, lng_sum)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (zoom, cell_x, cell_y, report_type) DO UPDATE SET
+            report_count = report_count + excluded.report_count,
+            score_sum = score_sum + excluded.score_sum,
+            score_count = score_count + excluded.score_count,
+            lat_sum = lat_sum + excluded.lat_sum,
+            lng_sum = lng_sum + excluded.lng_sum
+    ''', rows)
+
+    if count < 0:
+        cursor.execute('DELETE FROM report_grid WHERE report_count <= 0')
+
+
+def rebuild_grid(conn):
+    """Recompute the whole grid from the reports table"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM report_grid')
+    cursor.execute('''
+        SELECT latitude, longitude, report_type, credibility_score
+        FROM reports
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    ''')
+    for lat, lng, report_type, credibility_score in cursor.fetchall():
+        add_report_to_grid(cursor, lat, lng, report_type, credibility_score)
+    conn.commit()
+
+
+def ensure_grid(conn):
+    """Create the grid table and backfill it when it is empty"""
+    cursor = conn.cursor()
+    create_grid_table(cursor)
+    cursor.execute('SELECT 1 FROM report_grid LIMIT 1')
+    if cursor.fetchone() is None:
+        rebuild_grid(conn)
+    conn.commit()
+
+
+def get_tile_clusters(cursor, z, x, y, report_type=None):
+    """Aggregated clusters for one tile, read from the precomputed grid"""
+    cell_zoom = min(z + CLUSTER_BITS, MAX_GRID_ZOOM)
+    shift = cell_zoom - z
+
+    query = '''
+        SELECT cell_x, cell_y, report_type, report_count, score_sum, score_count,
+               lat_sum, lng_sum
+        FROM report_grid
+        WHERE zoom = ?
+          AND cell_x BETWEEN ? AND ?
+          AND cell_y BETWEEN ? AND ?
+    '''
+    params = [cell_zoom, x << shift, ((x + 1) << shift) - 1, y << shift, ((y + 1) << shift) - 1]
+    if report_type:
+        query += ' AND report_type = ?'
+        params.append(report_type)
+    cursor.execute(query, params)
+
+    cells = {}
+    for cell_x, cell_y, cell_type, count, score_sum, score_count, lat_sum, lng_sum in cursor.fetchall():
+        cell = cells.setdefault((cell_x, cell_y), {
+            'count': 0, 'score_sum': 0, 'score_count': 0,
+            'lat_sum': 0.0, 'lng_sum': 0.0, 'types': {}
+        })
+        cell['count'] += count
+        cell['score_sum'] += score_sum
+        cell['score_count'] += score_count
+        cell['lat_sum'] += lat_sum
+        cell['lng_sum'] += lng_sum
+        cell['types'][cell_type] = count
+
+    clusters = []
+    for (cell_x, cell_y), cell in sorted(cells.items()):
+        if cell['count'] <= 0:
+            continue
+        clusters.append({
+            'lat': round(cell['lat_sum'] / cell['count'], 6),
+            'lng': round(cell['lng_sum'] / cell['count'], 6),
+            'count': cell['count'],
+            'avg_credibility_score': (
+                round(cell['score_sum'] / cell['score_count'], 1) if cell['score_count'] else None
+            ),
+            # Ties go to the alphabetically first type so the output is stable
+            'dominant_report_type': min(cell['types'], key=lambda t: (-cell['types'][t], t))
+        })
+
+    return clusters
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect('news_reports.db')
+    create_grid_table(conn.cursor())
+    rebuild_grid(conn)
+    total = conn.execute('SELECT COALESCE(SUM(report_count), 0) FROM report_grid WHERE zoom = 0').fetchone()[0]
+    conn.close()
+    print(f"Rebuilt report grid for {total} geotagged reports")
@@ -0,0 +1,265 @@
+"""
+Offline reverse geocoding against a local GeoNames cities file
+
+The gazetteer (e.g. cities15000.txt from download.geonames.org, tab
+separated) is loaded once into flat NumPy arrays sorted by 1-degree grid
+cell, with a CSR-style offset table per cell; names are kept in one joined
+string with offsets instead of one Python object per city. A lookup scans the
+query's cell and widens ring by ring only until no unseen cell can hold a
+closer city, so it touches a few dozen candidates and makes no network call.
+
+Run `python reverse_geocoder.py [path]` for a lookups-per-second benchmark,
+and `python reverse_geocoder.py --fetch [path]` to download the file from
+GeoNames when it is missing (deploy start commands run this before the app).
+"""
+import io
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from array import array
+
+import numpy as np
+import requests
+
+GEONAMES_URL = 'https://download.geonames.org/export/dump/cities15000.zip'
+FETCH_TIMEOUT = 60
+# After a failed download, wait this long before trying again
+FETCH_RETRY_SECONDS = 600
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 1.0
+# Beyond this no place is reported (open ocean, polar regions)
+MAX_DISTANCE_KM = 250.0
+
+_GRID_ROWS = int(180 / CELL_DEGREES)
+_GRID_COLS = int(360 / CELL_DEGREES)
+
+
+def _cell_of(lats, lngs):
+    rows = np.clip(((lats + 90.0) / CELL_DEGREES).astype(np.int64), 0, _GRID_ROWS - 1)
+    cols = np.clip(((lngs + 180.0) / CELL_DEGREES).astype(np.int64), 0, _GRID_COLS - 1)
+    return rows, cols
+
+
+class Gazetteer:
+    """Nearest-city index over a GeoNames-format cities file"""
+
+    def __init__(self, names, country_codes, admin1_codes, lats, lngs, populations):
+        rows, cols = _cell_of(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+        cells = rows * _GRID_COLS + cols
+        order = np.argsort(cells, kind='stable')
+
+        self.lats = np.asarray(lats, dtype=np.float32)[order]
+        self.lngs = np.asarray(lngs, dtype=np.float32)[order]
+        self.populations = np.asarray(populations, dtype=np.int64)[order]
+        self.country_codes = np.asarray(country_codes, dtype='S2')[order]
+        self.admin1_codes = np.asarray(admin1_codes, dtype='S20')[order]
+        # Radians precomputed once; array.array gives fast scalar reads in
+        # the per-lookup loop without a Python float object per city
+        lat_rad = np.radians(self.lats.astype(np.float64))
+        self._lat_rad = array('d', lat_rad.tobytes())
+        self._lng_rad = array('d', np.radians(self.lngs.astype(np.float64)).tobytes())
+        self._cos_lat = array('d', np.cos(lat_rad).tobytes())
+
+        ordered_names = [names[i] for i in order]
+        lengths = np.fromiter((len(name) for name in ordered_names), dtype=np.int64, count=len(ordered_names))
+        self._name_offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self._names = ''.join(ordered_names)
+
+        counts = np.bincount(cells[order], minlength=_GRID_ROWS * _GRID_COLS)
+        self._cell_start = array('q', np.concatenate(([0], np.cumsum(counts))).astype(np.int64).tobytes())
+
+    def __len__(self):
+        return len(self.lats)
+
+    @classmethod
+    def load(cls, path, min_population=0):
+        """Read a GeoNames cities file (geoname table columns, tab separated)"""
+        names, country_codes, admin1_codes, lats, lngs, populations = [], [], [], [], [], []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 15:
+                    continue
+                population = int(fields[14] or 0)
+                if population < min_population:
+                    continue
+                names.append(fields[1])
+                lats.append(float(fields[4]))
+                lngs.append(float(fields[5]))
+                country_codes.append(fields[8])
+                admin1_codes.append(fields[10])
+                populations.append(population)
+        return cls(names, country_codes, admin1_codes, lats, lngs, populations)
+
+    def name(self, index):
+        return self._names[self._name_offsets[index]:self._name_offsets[index + 1]]
+
+    def _scan_row(self, query, row, first_col, last_col, best):
+        """Update best = [a, index] with the cities in one row's column span"""
+        if last_col < first_col:
+            return
+        if last_col - first_col + 1 >= _GRID_COLS:
+            spans = [(0, _GRID_COLS - 1)]
+        else:
+            # Wrap across the antimeridian
+            last_col -= first_col - first_col % _GRID_COLS
+            first_col %= _GRID_COLS
+            if last_col >= _GRID_COLS:
+                spans = [(first_col, _GRID_COLS - 1), (0, last_col - _GRID_COLS)]
+            else:
+                spans = [(first_col, last_col)]
+
+        lat_rad, lng_rad, cos_lat = query
+        lats, lngs, coss = self._lat_rad, self._lng_rad, self._cos_lat
+        base = row * _GRID_COLS
+        for c0, c1 in spans:
+            for i in range(self._cell_start[base + c0], self._cell_start[base + c1 + 1]):
+                # Haversine's inner term is monotonic in distance, so compare it directly
+                a = math.sin((lats[i] - lat_rad) / 2) ** 2 + \
+                    cos_lat * coss[i] * math.sin((lngs[i] - lng_rad) / 2) ** 2
+                if a < best[0]:
+                    best[0], best[1] = a, i
+
+    def nearest(self, lat, lng, max_distance_km=MAX_DISTANCE_KM):
+        """(index, distance_km) of the nearest city, or (None, None)"""
+        row = min(_GRID_ROWS - 1, max(0, int((lat + 90.0) / CELL_DEGREES)))
+        col = min(_GRID_COLS - 1, max(0, int((lng + 180.0) / CELL_DEGREES)))
+        lat_rad = math.radians(lat)
+        query = (lat_rad, math.radians(lng), math.cos(lat_rad))
+        km_per_cell = math.pi * EARTH_RADIUS_KM * CELL_DEGREES / 180.0
+        max_ring = int(math.ceil(max_distance_km / km_per_cell))
+
+        best = [math.inf, None]
+        scanned = {}
+        for ring in range(max_ring + 1):
+            # After ring r every unscanned city is at least r cells away in
+            # latitude; longitude spans widen with 1/cos of the band's most
+            # poleward latitude so they cover the same ground distance
+            band_lat = min(89.0, abs(lat) + ring * CELL_DEGREES)
+            lng_ring = min(_GRID_COLS // 2, int(math.ceil(ring / math.cos(math.radians(band_lat)))))
+
+            for r in range(max(0, row - ring), min(_GRID_ROWS, row + ring + 1)):
+                previous = scanned.get(r)
+                if previous is None:
+                    self._scan_row(query, r, col - lng_ring, col + lng_ring, best)
+                elif previous < lng_ring and 2 * previous + 1 < _GRID_COLS:
+                    # Only the columns this ring adds on either side
+                    right = min(col + lng_ring, col - previous - 1 + _GRID_COLS)
+                    self._scan_row(query, r, col - lng_ring, col - previous - 1, best)
+                    if right > col + previous:
+                        self._scan_row(query, r, col + previous + 1, right, best)
+                scanned[r] = max(lng_ring, previous or 0)
+
+            if best[1] is not None and 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(best[0], 1.0))) <= ring * km_per_cell:
+                break
+
+        if best[1] is None:
+            return None, None
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(best[0], 1.0)))
+        if distance > max_distance_km:
+            return None, None
+        return best[1], distance
+
+    def reverse(self, lat, lng, max_distance_km=MAX_DISTANCE_KM):
+        """Nearest place as a dict, or None when nothing is within range"""
+        index, distance = self.nearest(lat, lng, max_distance_km)
+        if index is None:
+            return None
+        name = self.name(index)
+        country_code = self.country_codes[index].decode('ascii')
+        return {
+            'name': name,
+            'country_code': country_code,
+            'admin1_code': self.admin1_codes[index].decode('ascii'),
+            'display_name': f'{name}, {country_code}' if country_code else name,
+            'lat': round(float(self.lats[index]), 5),
+            'lng': round(float(self.lngs[index]), 5),
+            'population': int(self.populations[index]),
+            'distance_km': round(distance, 2)
+        }
+
+
+def fetch_gazetteer(path, url=GEONAMES_URL, timeout=FETCH_TIMEOUT):
+    """Download and unpack a GeoNames cities zip to `path` unless it exists
+
+    Returns True when the file is in place. The file is written under a
+    temporary name and renamed, so a failed download never leaves a partial
+    gazetteer behind.
+    """
+    if os.path.exists(path):
+        return True
+    try:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            member = next(name for name in archive.namelist() if name.endswith('.txt'))
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=directory, delete=False) as target:
+                target.write(archive.read(member))
+            os.replace(target.name, path)
+    except (requests.RequestException, zipfile.BadZipFile, StopIteration, OSError) as e:
+        print(f"Gazetteer download from {url} failed: {e}")
+        return False
+    print(f"Downloaded gazetteer to {path}")
+    return True
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+_fetch_failed_at = -FETCH_RETRY_SECONDS
+
+
+def get_gazetteer(path, fetch=False):
+    """Process-wide Gazetteer, loaded on first use; None if the file is missing
+
+    With fetch, a missing file is downloaded first (for hosts whose deploy
+    step cannot run the fetch, e.g. serverless); failures are retried at
+    most every FETCH_RETRY_SECONDS.
+    """
+    global _gazetteer, _fetch_failed_at
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None and not os.path.exists(path) and fetch and \
+                    time.monotonic() - _fetch_failed_at > FETCH_RETRY_SECONDS:
+                if not fetch_gazetteer(path):
+                    _fetch_failed_at = time.monotonic()
+            if _gazetteer is None and os.path.exists(path):
+                started = time.perf_counter()
+                _gazetteer = Gazetteer.load(path)
+                print(f"Loaded gazetteer with {len(_gazetteer)} places in {time.perf_counter() - started:.1f}s")
+    return _gazetteer
+
+
+def benchmark(gazetteer, lookups=100000, seed=0):
+    """Lookups per second for random points over populated latitudes"""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(-55, 70, lookups)
+    lngs = rng.uniform(-180, 180, lookups)
+    started = time.perf_counter()
+    for lat, lng in zip(lats.tolist(), lngs.tolist()):
+        gazetteer.nearest(lat, lng)
+    elapsed = time.perf_counter() - started
+    return lookups / elapsed, elapsed / lookups * 1e6
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    fetch = '--fetch' in args
+    args = [arg for arg in args if arg != '--fetch']
+    path = args[0] if args else os.environ.get('GAZETTEER_PATH', 'data/cities15000.txt')
+    if fetch:
+        # Never fail the deploy: without the file the endpoint answers 503
+        # and clients fall back to a public reverse geocoder
+        fetch_gazetteer(path, os.environ.get('GAZETTEER_URL', GEONAMES_URL))
+        sys.exit(0)
+    gazetteer = get_gazetteer(path)
+    if gazetteer is None:
+        sys.exit(f"Gazetteer file not found: {path}")
+    per_second, micros = benchmark(gazetteer)
+    print(f"{per_second:,.0f} lookups/s ({micros:.1f} µs per lookup)")
@@ -0,0 +1,111 @@
+"""
+Production server: `python serve.py`
+
+Runs the app under gunicorn with WEB_CONCURRENCY worker processes and
+WEB_THREADS threads each:
+
+- SERVER_MODE=asgi (default) serves asgi.py on uvicorn workers. Upstream
+  calls are async there, and the Flask routes run on WEB_THREADS threads
+  per process.
+- SERVER_MODE=wsgi serves app.py on gthread workers. Every open
+  /api/events stream holds one of the WEB_THREADS threads.
+
+The app is imported and the database initialized once in the master
+(preload), then forked, so workers start warm and share those pages.
+Background jobs run in one worker per host (see process_lock.py), and
+cached LLM, NewsAPI and parsed-post results are shared through
+SHARED_CACHE_PATH (see shared_cache.py). GET /metrics on any worker reports
+for all of them (see metrics.py).
+
+Signals to the master process:
+- HUP restarts the workers gracefully. In-flight requests finish, but the
+  preloaded code is kept.
+- USR2 starts a new master running the new code. TERM the old one once
+  the new one is up, for a zero-downtime code deploy.
+- TERM or INT stops gracefully within WEB_GRACEFUL_TIMEOUT seconds.
+"""
+import os
+import sys
+import tempfile
+
+from metrics import reset_metrics_dir
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+SERVER_MODES = ('asgi', 'wsgi')
+
+
+def server_options():
+    """gunicorn settings from the environment"""
+    mode = os.environ.get('SERVER_MODE', 'asgi')
+    if mode not in SERVER_MODES:
+        sys.exit(f"SERVER_MODE must be one of {', '.join(SERVER_MODES)}")
+    options = {
+        'bind': f"0.0.0.0:{os.environ.get('PORT', 8080)}",
+        'workers': int(os.environ['WEB_CONCURRENCY']),
+        'threads': int(os.environ['WEB_THREADS']),
+        'worker_class': 'uvicorn.workers.UvicornWorker' if mode == 'asgi' else 'gthread',
+        'preload_app': True,
+        'timeout': int(os.environ.get('WEB_TIMEOUT', 60)),
+        'graceful_timeout': int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': 5,
+        'post_fork': _post_fork
+    }
+    if os.environ.get('WEB_PIDFILE'):
+        options['pidfile'] = os.environ['WEB_PIDFILE']
+    return mode, options
+
+
+def _post_fork(server, worker):
+    # ASGI workers start the jobs from the lifespan startup event instead
+    if os.environ.get('SERVER_MODE', 'asgi') == 'wsgi':
+        import app
+        app.start_background_jobs()
+
+
+if BaseApplication is not None:
+    class Server(BaseApplication):
+        """gunicorn application serving app.py or asgi.py"""
+
+        def __init__(self, mode, options):
+            self.mode = mode
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            if self.mode == 'asgi':
+                from asgi import app
+            else:
+                from app import app
+            return app
+
+
+def main():
+    if BaseApplication is None:
+        sys.exit("gunicorn is not installed (pip install -r requirements.txt); use python app.py for development")
+
+    # Read by app.py and asgi.py at import time, so set before loading them
+    os.environ.setdefault('WEB_CONCURRENCY', str(min(2 * (os.cpu_count() or 1), 8)))
+    os.environ.setdefault('WEB_THREADS', '32')
+    os.environ.setdefault('ASGI_WSGI_THREADS', os.environ['WEB_THREADS'])
+
+    # Workers pool their /metrics totals here; totals of an earlier run are dropped
+    os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'civic-lens-metrics'))
+    reset_metrics_dir()
+
+    mode, options = server_options()
+    import app
+    app.init_db()
+    print(f"Serving {mode} with {options['workers']} processes x {options['threads']} threads on {options['bind']}")
+    Server(mode, options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Cache shared by every server process on a host, stored in one SQLite file
+
+Each worker process of `python serve.py` (and each uvicorn worker) has its
+own memory, so an in-process cache would be cold and duplicated per worker.
+SharedCache keeps JSON-serializable values in a WAL-mode SQLite file
+instead. A value computed by one worker is a local read for all the others,
+and it survives restarts.
+
+Entries expire after their TTL and are pruned every PRUNE_INTERVAL seconds.
+Concurrent misses for the same key within a process are coalesced onto one
+computation; across processes a miss may be computed more than once, which
+is harmless for the idempotent values cached here.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PRUNE_INTERVAL = 600
+BUSY_TIMEOUT_SECONDS = 5
+
+
+def cache_key(*parts):
+    """Stable key for JSON-serializable parts, hashed to a fixed length"""
+    text = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class SharedCache:
+    """TTL key-value cache in a SQLite file, safe across threads and processes"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._computing = {}
+        self._last_prune = 0.0
+        self._stats = {}
+
+    def get(self, namespace, key):
+        """Cached value, or None when missing or expired"""
+        row = self._execute('SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?',
+                            (namespace, key)).fetchone()
+        hit = row is not None and row[1] > time.time()
+        self._count(namespace, 'hits' if hit else 'misses')
+        return json.loads(row[0]) if hit else None
+
+    def set(self, namespace, key, value, ttl):
+        self._execute('INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                      (namespace, key, json.dumps(value, ensure_ascii=False), time.time() + ttl))
+        self._maybe_prune()
+
+    def get_or_set(self, namespace, key, ttl, compute, cacheable=None):
+        """Cached value, or compute() stored for `ttl` seconds
+
+        `cacheable(value)` can veto storing a result, e.g. an error reply.
+        Cache failures never fail the caller; the value is then computed
+        uncached.
+        """
+        try:
+            value = self.get(namespace, key)
+        except sqlite3.Error as e:
+            print(f"Shared cache read error: {e}")
+            return compute()
+        if value is not None:
+            return value
+
+        # Threads missing on the same key wait for the first one's result
+        with self._lock:
+            event = self._computing.get((namespace, key))
+            owner = event is None
+            if owner:
+                event = self._computing[(namespace, key)] = threading.Event()
+        if not owner:
+            event.wait()
+            try:
+                value = self.get(namespace, key)
+            except sqlite3.Error:
+                value = None
+            return compute() if value is None else value
+
+        try:
+            value = compute()
+            if value is not None and (cacheable is None or cacheable(value)):
+                try:
+                    self.set(namespace, key, value, ttl)
+                except sqlite3.Error as e:
+                    print(f"Shared cache write error: {e}")
+            return value
+        finally:
+            with self._lock:
+                del self._computing[(namespace, key)]
+            event.set()
+
+    def metrics(self):
+        """Per-namespace hits, misses and hit ratio for this process"""
+        with self._lock:
+            stats = {namespace: dict(counts) for namespace, counts in self._stats.items()}
+        for counts in stats.values():
+            total = counts['hits'] + counts['misses']
+            counts['hit_ratio'] = round(counts['hits'] / total, 3) if total else None
+        return stats
+
+    def _count(self, namespace, outcome):
+        with self._lock:
+            counts = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork: a preloading
+        # server imports this module before forking its workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            ''')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _execute(self, sql, params):
+        return self._connection().execute(sql, params)
+
+    def _maybe_prune(self):
+        now = time.time()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        self._execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,))
@@ -74,43 +74,54 @@ function updateCityOptions() {
     }
 }
 
+// Rollup bucket and window for each time range option
+const STATS_RANGES = {
+    '24h': { bucket: 'hour', window: 24 },
+    '7d': { bucket: 'day', window: 7 },
+    '30d': { bucket: 'day', window: 30 },
+    '90d': { bucket: 'day', window: 90 }
+};
+
+// Score deciles counted as verified, and report types counted as fake
+const CREDIBLE_DECILES = ['70-79', '80-89', '90-99'];
+const FAKE_REPORT_TYPES = ['fake_news', 'misinformation'];
+
+let dashboardStats = null;
+
 // Load dashboard data based on current selections
 function loadDashboardData() {
     const country = document.getElementById('countrySelect').value;
     const city = document.getElementById('citySelect').value;
-    const timeRange = document.getElementById('timeRange').value;
+    const range = STATS_RANGES[document.getElementById('timeRange').value] || STATS_RANGES['24h'];
     
-    // Simulate API call with sample data
-    const data = generateSampleData(country, city, timeRange);
+    // Counters and charts come from the server-side rollups
+    fetch(`/api/stats?bucket=${range.bucket}&window=${range.window}`)
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(stats => {
+            dashboardStats = stats;
+            updateMetrics(getStatsMetrics(stats));
+            const activeChart = document.querySelector('.chart-btn.active');
+            updateChart(activeChart ? activeChart.dataset.chart : 'trends');
+            updateGeoChart(stats.by_location);
+        })
+        .catch(error => console.error('Error loading stats:', error));
     
-    // Update metrics
-    updateMetrics(data.metrics);
+    loadRecentActivity();
     
-    // Update charts
-    updateChartsData(data.charts);
-    
-    // Update activity
-    updateActivity(data.activity);
-    
-    // Update sources
-    updateSources(data.sources);
+    // Reports carry no news-source field, so this panel stays illustrative
+    updateSources(generateSourcesData(getLocationMultiplier(country, city)));
 }
 
-// Generate sample data based on selections
-function generateSampleData(country, city, timeRange) {
-    const baseMultiplier = getLocationMultiplier(country, city);
-    const timeMultiplier = getTimeMultiplier(timeRange);
-    
+// Headline counters from an /api/stats response
+function getStatsMetrics(stats) {
+    const sum = (counts, keys) => keys.reduce((total, key) => total + (counts[key] || 0), 0);
     return {
-        metrics: {
-            totalNews: Math.floor(1000 * baseMultiplier * timeMultiplier),
-            fakeNews: Math.floor(80 * baseMultiplier * timeMultiplier),
-            verifiedNews: Math.floor(920 * baseMultiplier * timeMultiplier),
-            avgResponseTime: (2.3 + Math.random() * 0.5).toFixed(1)
-        },
-        charts: generateChartData(baseMultiplier, timeMultiplier),
-        activity: generateActivityData(country, city),
-        sources: generateSourcesData(baseMultiplier)
+        totalNews: stats.totals.reports,
+        fakeNews: sum(stats.by_type, FAKE_REPORT_TYPES),
+        verifiedNews: sum(stats.score_distribution, CREDIBLE_DECILES)
     };
 }
 
@@ -142,23 +153,15 @@ function getLocationMultiplier(country, city) {
     return multiplier;
 }
 
-// Get time-based multiplier
-function getTimeMultiplier(timeRange) {
-    const multipliers = {
-        '24h': 1.0,
-        '7d': 7.0,
-        '30d': 30.0,
-        '90d': 90.0
-    };
-    return multipliers[timeRange] || 1.0;
-}
-
 // Update metrics display
 function updateMetrics(metrics) {
     document.getElementById('totalNews').textContent = metrics.totalNews.toLocaleString();
     document.getElementById('fakeNews').textContent = metrics.fakeNews.toLocaleString();
     document.getElementById('verifiedNews').textContent = metrics.verifiedNews.toLocaleString();
-    document.getElementById('avgResponseTime').textContent = metrics.avgResponseTime + 's';
+    // Analysis timings are not collected yet; the card keeps its template value
+    if (metrics.avgResponseTime !== undefined) {
+        document.getElementById('avgResponseTime').textContent = metrics.avgResponseTime + 's';
+    }
 }
 
 // Initialize charts
@@ -220,7 +223,11 @@ function initializeCharts() {
                     '#3b82f6',
                     '#f59e0b',
                     '#ef4444',
-                    '#8b5cf6'
+                    '#8b5cf6',
+                    '#14b8a6',
+                    '#ec4899',
+                    '#64748b',
+                    '#eab308'
                 ]
             }]
         },
@@ -240,98 +247,90 @@ function initializeCharts() {
     });
 }
 
-// Generate chart data
-function generateChartData(baseMultiplier, timeMultiplier) {
-    const days = timeMultiplier <= 7 ? Math.ceil(timeMultiplier) : 7;
-    const labels = [];
-    const verifiedData = [];
-    const fakeData = [];
-    
-    for (let i = days - 1; i >= 0; i--) {
-        const date = new Date();
-        date.setDate(date.getDate() - i);
-        labels.push(date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' }));
-        
-        verifiedData.push(Math.floor((80 + Math.random() * 40) * baseMultiplier));
-        fakeData.push(Math.floor((5 + Math.random() * 10) * baseMultiplier));
+// Label for a rollup bucket ('YYYY-MM-DD HH:00:00' or 'YYYY-MM-DD', UTC)
+function formatBucket(bucketStart, bucket) {
+    const date = new Date(bucketStart.replace(' ', 'T') + (bucketStart.length > 10 ? 'Z' : 'T00:00:00Z'));
+    if (bucket === 'hour') {
+        return date.toLocaleTimeString('en-US', { hour: 'numeric' });
     }
-    
-    return {
-        trends: { labels, verifiedData, fakeData },
-        geographic: {
-            labels: ['North America', 'Europe', 'Asia', 'South America', 'Africa', 'Oceania'],
-            data: [35, 28, 20, 8, 6, 3]
-        }
-    };
+    return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric', timeZone: 'UTC' });
 }
 
-// Update charts with new data
-function updateChartsData(chartData) {
-    // Update trends chart
-    window.trendsChart.data.labels = chartData.trends.labels;
-    window.trendsChart.data.datasets[0].data = chartData.trends.verifiedData;
-    window.trendsChart.data.datasets[1].data = chartData.trends.fakeData;
-    window.trendsChart.update();
+// Update chart display based on selected type
+function updateChart(chartType) {
+    if (!dashboardStats) return;
+    const chart = window.trendsChart;
+    const [primary, secondary] = chart.data.datasets;
     
-    // Update geographic chart
-    window.geoChart.data.labels = chartData.geographic.labels;
-    window.geoChart.data.datasets[0].data = chartData.geographic.data;
-    window.geoChart.update();
+    if (chartType === 'categories') {
+        chart.data.labels = Object.keys(dashboardStats.by_type).map(type => type.replace(/_/g, ' '));
+        primary.label = 'Reports by type';
+        primary.data = Object.values(dashboardStats.by_type);
+        secondary.data = [];
+        secondary.hidden = true;
+    } else if (chartType === 'sources') {
+        // Credibility score deciles of the reported items
+        chart.data.labels = Object.keys(dashboardStats.score_distribution);
+        primary.label = 'Reports by credibility score';
+        primary.data = Object.values(dashboardStats.score_distribution);
+        secondary.data = [];
+        secondary.hidden = true;
+    } else {
+        const series = dashboardStats.series;
+        chart.data.labels = series.map(point => formatBucket(point.bucket_start, dashboardStats.bucket));
+        primary.label = 'Reports';
+        primary.data = series.map(point => point.reports);
+        secondary.label = 'Avg credibility score';
+        secondary.data = series.map(point => point.avg_credibility_score);
+        secondary.hidden = false;
+    }
+    chart.update();
 }
 
-// Update chart display based on selected type
-function updateChart(chartType) {
-    // This would switch between different chart views
-    console.log('Switching to chart type:', chartType);
+// Reports per location (top locations from the rollups)
+function updateGeoChart(byLocation) {
+    window.geoChart.data.labels = Object.keys(byLocation);
+    window.geoChart.data.datasets[0].data = Object.values(byLocation);
+    window.geoChart.update();
 }
 
-// Generate activity data
-function generateActivityData(country, city) {
-    const activities = [
-        {
-            type: 'fake-news',
-            title: `Fake news detected in ${getLocationName(country, city)}`,
-            description: 'Misleading article about local politics flagged by AI',
-            time: '2 minutes ago',
-            status: 'High Risk'
-        },
-        {
-            type: 'verified',
-            title: `Article verified in ${getLocationName(country, city)}`,
-            description: 'Breaking news story confirmed by multiple sources',
-            time: '5 minutes ago',
-            status: 'Verified'
-        },
-        {
-            type: 'analysis',
-            title: 'AI analysis completed',
-            description: `Batch processing of 50 articles from ${getLocationName(country, city)}`,
-            time: '8 minutes ago',
-            status: 'Processed'
-        }
-    ];
-    
-    return activities;
+// Latest community reports as activity items
+function loadRecentActivity() {
+    return fetch('/api/recent-reports?limit=3')
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(reports => updateActivity(reports.map(reportToActivity)))
+        .catch(error => console.error('Error loading recent activity:', error));
 }
 
-// Get location name for display
-function getLocationName(country, city) {
-    if (city !== 'all') {
-        return city.charAt(0).toUpperCase() + city.slice(1).replace('-', ' ');
-    }
-    
-    const countryNames = {
-        'global': 'Global',
-        'us': 'United States',
-        'uk': 'United Kingdom',
-        'ca': 'Canada',
-        'au': 'Australia',
-        'de': 'Germany',
-        'fr': 'France',
-        'jp': 'Japan'
+function reportToActivity(report) {
+    const score = report.credibility_score;
+    const type = score === null ? 'analysis' : score < 40 ? 'fake-news' : score >= 70 ? 'verified' : 'analysis';
+    return {
+        type,
+        title: `${report.type.replace(/_/g, ' ')} reported in ${report.location}`,
+        description: report.title,
+        time: formatRelativeTime(report.timestamp),
+        status: type === 'fake-news' ? 'High Risk' : type === 'verified' ? 'Verified' : 'Processed'
     };
-    
-    return countryNames[country] || 'Global';
+}
+
+// Report timestamps are UTC 'YYYY-MM-DD HH:MM:SS'
+function formatRelativeTime(timestamp) {
+    const minutes = Math.max(0, Math.round((Date.now() - new Date(timestamp.replace(' ', 'T') + 'Z')) / 60000));
+    if (minutes < 60) return `${minutes} minute${minutes === 1 ? '' : 's'} ago`;
+    const hours = Math.round(minutes / 60);
+    if (hours < 24) return `${hours} hour${hours === 1 ? '' : 's'} ago`;
+    const days = Math.round(hours / 24);
+    return `${days} day${days === 1 ? '' : 's'} ago`;
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
 }
 
 // Update activity display
@@ -351,8 +350,8 @@ function updateActivity(activities) {
                 <i class="fas ${getActivityIcon(activity.type)}"></i>
             </div>
             <div class="activity-content">
-                <div class="activity-title">${activity.title}</div>
-                <div class="activity-description">${activity.description}</div>
+                <div class="activity-title">${escapeHtml(activity.title)}</div>
+                <div class="activity-description">${escapeHtml(activity.description)}</div>
                 <div class="activity-time">${activity.time}</div>
             </div>
             <div class="activity-status">
@@ -436,17 +435,12 @@ function updateSourcesDisplay(filterType) {
 
 // Refresh activity data
 function refreshActivity() {
-    const country = document.getElementById('countrySelect').value;
-    const city = document.getElementById('citySelect').value;
-    
     const refreshBtn = document.querySelector('.refresh-btn');
     refreshBtn.innerHTML = '<i class="fas fa-sync-alt fa-spin"></i> Refreshing...';
     
-    setTimeout(() => {
-        const newActivity = generateActivityData(country, city);
-        updateActivity(newActivity);
+    loadRecentActivity().finally(() => {
         refreshBtn.innerHTML = '<i class="fas fa-sync-alt"></i> Refresh';
-    }, 1000);
+    });
 }
 
 // Navigation functionality
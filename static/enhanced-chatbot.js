@@ -460,6 +460,6 @@ const typingCSS = `
 `;
 
 // Inject typing CSS
-const style = document.createElement('style');
-style.textContent = typingCSS;
-document.head.appendChild(style);
+const typingStyle = document.createElement('style');
+typingStyle.textContent = typingCSS;
+document.head.appendChild(typingStyle);
@@ -68,6 +68,13 @@ class NearMePage {
         // Add some sample markers
         this.addSampleMarkers();
 
+        // Reported news as server-side clusters, fetched per visible tile so
+        // the payload depends on the viewport, not on the number of reports
+        this.clusterLayer = L.layerGroup().addTo(this.map);
+        this.clusterTiles = new Map();
+        this.map.on('moveend', () => this.loadReportClusters());
+        this.loadReportClusters();
+
         // Map event listeners
         this.map.on('click', (e) => {
             this.onMapClick(e);
@@ -125,6 +132,86 @@ class NearMePage {
         });
     }
 
+    visibleTiles() {
+        const zoom = Math.min(Math.round(this.map.getZoom()), 20);
+        const bounds = this.map.getPixelBounds();
+        const min = bounds.min.divideBy(256).floor();
+        const max = bounds.max.divideBy(256).floor();
+        const n = 1 << zoom;
+        const tiles = [];
+        for (let y = Math.max(min.y, 0); y <= Math.min(max.y, n - 1); y++) {
+            for (let x = min.x; x <= max.x; x++) {
+                // Wrap across the antimeridian
+                tiles.push({ z: zoom, x: ((x % n) + n) % n, y });
+            }
+        }
+        return tiles;
+    }
+
+    loadReportClusters() {
+        const tiles = this.visibleTiles();
+        const visible = new Set(tiles.map(({ z, x, y }) => `${z}/${x}/${y}`));
+
+        // Drop tiles that scrolled out of view or belong to another zoom
+        for (const key of this.clusterTiles.keys()) {
+            if (!visible.has(key)) {
+                this.clusterLayer.removeLayer(this.clusterTiles.get(key));
+                this.clusterTiles.delete(key);
+            }
+        }
+
+        tiles.forEach(({ z, x, y }) => {
+            const key = `${z}/${x}/${y}`;
+            if (this.clusterTiles.has(key)) return;
+            const group = L.layerGroup();
+            this.clusterTiles.set(key, group);
+
+            // Tiles are cacheable (ETag, max-age=60), so panning back is cheap
+            fetch(`/api/reports/tiles/${key}`)
+                .then(response => {
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    return response.json();
+                })
+                .then(tile => {
+                    if (this.clusterTiles.get(key) !== group) return;
+                    tile.clusters.forEach(cluster => this.addClusterMarker(group, cluster));
+                    group.addTo(this.clusterLayer);
+                })
+                .catch(error => {
+                    console.error('Error loading report tile:', error);
+                    this.clusterTiles.delete(key);
+                });
+        });
+    }
+
+    addClusterMarker(group, cluster) {
+        const score = cluster.avg_credibility_score;
+        const color = score === null ? '#6c757d' : score >= 70 ? '#28a745' : score >= 40 ? '#ffc107' : '#dc3545';
+        const type = cluster.dominant_report_type.replace(/_/g, ' ');
+        L.circleMarker([cluster.lat, cluster.lng], {
+            radius: Math.min(8 + 4 * Math.log2(cluster.count), 30),
+            color,
+            fillColor: color,
+            fillOpacity: 0.5,
+            weight: 2
+        })
+            .bindTooltip(String(cluster.count), { permanent: cluster.count > 1, direction: 'center',
+                                                  className: 'cluster-count' })
+            .bindPopup(`
+                <div class="marker-popup">
+                    <h4>${cluster.count} report${cluster.count === 1 ? '' : 's'}</h4>
+                    <p>Mostly ${this.escapeHtml(type)}${score === null ? '' : ` · average credibility ${score}/100`}</p>
+                </div>
+            `)
+            .addTo(group);
+    }
+
+    escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
     getMarkerIcon(type) {
         const iconColors = {
             news: '#182d43',
@@ -197,13 +284,24 @@ class NearMePage {
     }
 
     reverseGeocode(lat, lng) {
-        // Simple reverse geocoding using Nominatim
-        fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lng}`)
-            .then(response => response.json())
-            .then(data => {
-                const address = data.display_name || 'Unknown location';
-                const shortAddress = address.split(',').slice(0, 2).join(',');
-                this.updateLocationBadge(shortAddress, 'success');
+        // Offline reverse geocoding served by our own gazetteer
+        fetch(`/api/reverse-geocode?lat=${lat}&lng=${lng}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(data => data.display_name)
+            .catch(() => {
+                // Gazetteer not provisioned on this deploy: fall back to Nominatim
+                return fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lng}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        const address = data.display_name || 'Unknown location';
+                        return address.split(',').slice(0, 2).join(',');
+                    });
+            })
+            .then(name => {
+                this.updateLocationBadge(name, 'success');
             })
             .catch(error => {
                 console.error('Reverse geocoding error:', error);
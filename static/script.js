@@ -194,11 +194,17 @@ function initialize3DEffects() {
 
 // Start real-time updates
 function startRealTimeUpdates() {
-    // Update stats every 30 seconds
+    // Cosmetic counters tick locally; the report total is loaded once and
+    // then kept current by pushed deltas
     setInterval(updateLiveStats, 30000);
+    loadReportsCount();
     
-    // Check for new nearby news every 2 minutes
-    setInterval(loadNearbyNews, 120000);
+    // New reports are pushed over /api/events; polling is only the fallback
+    if (window.EventSource) {
+        subscribeToReportEvents();
+    } else {
+        startPollingFallback();
+    }
     
     // Update location every 5 minutes if watching
     if (navigator.geolocation && userLocation) {
@@ -574,18 +580,10 @@ function detectLocation() {
                 const lon = position.coords.longitude;
                 
                 // Use reverse geocoding to get location name
-                fetch(`https://api.opencagedata.com/geocode/v1/json?q=${lat}+${lon}&key=YOUR_API_KEY`)
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.results && data.results[0]) {
-                            const location = data.results[0].formatted;
-                            document.getElementById('location').value = location;
-                        }
-                    })
-                    .catch(error => {
-                        console.log('Geocoding error:', error);
-                        document.getElementById('location').value = `Lat: ${lat.toFixed(4)}, Lon: ${lon.toFixed(4)}`;
-                    });
+                reverseGeocode(lat, lon).then(location => {
+                    document.getElementById('location').value =
+                        location || `Lat: ${lat.toFixed(4)}, Lon: ${lon.toFixed(4)}`;
+                });
             },
             function(error) {
                 console.log('Geolocation error:', error);
@@ -639,7 +637,17 @@ function updateLocationDisplay(location, errorMessage = null) {
 
 async function reverseGeocode(lat, lng) {
     try {
-        // Using a free geocoding service
+        // Offline reverse geocoding served by our own gazetteer
+        const response = await fetch(`/api/reverse-geocode?lat=${lat}&lng=${lng}`);
+        if (response.ok) {
+            const data = await response.json();
+            return data.display_name;
+        }
+    } catch (error) {
+        console.log('Geocoding error:', error);
+    }
+    try {
+        // Gazetteer not provisioned on this deploy: use a free geocoding service
         const response = await fetch(`https://api.bigdatacloud.net/data/reverse-geocode-client?latitude=${lat}&longitude=${lng}&localityLanguage=en`);
         const data = await response.json();
         return data.city ? `${data.city}, ${data.countryName}` : data.locality;
@@ -680,6 +688,67 @@ async function geocodeLocation(address) {
     }
 }
 
+// Server-Sent Events: one held connection per tab instead of interval polling
+let reportEvents = null;
+let reportEventsKey = null;
+let nearbyReloadTimer = null;
+let pollingFallback = false;
+
+function subscribeToReportEvents(radius) {
+    const params = new URLSearchParams();
+    if (userLocation) {
+        // Bounding box of the nearby-news radius, so only relevant reports arrive
+        const km = parseFloat(radius || 10);
+        const dLat = km / 111.32;
+        const dLng = km / (111.32 * Math.max(Math.cos(userLocation.lat * Math.PI / 180), 0.01));
+        params.set('bbox', [
+            userLocation.lat - dLat, userLocation.lng - dLng,
+            userLocation.lat + dLat, userLocation.lng + dLng
+        ].map(value => value.toFixed(4)).join(','));
+    }
+    const key = params.toString();
+    if (reportEvents && reportEventsKey === key) return;
+    
+    if (reportEvents) reportEvents.close();
+    reportEventsKey = key;
+    reportEvents = new EventSource(`/api/events${key ? '?' + key : ''}`);
+    
+    reportEvents.addEventListener('report', scheduleNearbyReload);
+    reportEvents.addEventListener('reset', () => {
+        scheduleNearbyReload();
+        loadReportsCount();
+    });
+    reportEvents.addEventListener('stats', event => {
+        const delta = JSON.parse(event.data);
+        const reportsCount = document.getElementById('reportsCount');
+        if (reportsCount) {
+            const current = parseInt(reportsCount.textContent.replace(/[^0-9]/g, '')) || 0;
+            reportsCount.textContent = (current + delta.reports).toLocaleString();
+        }
+    });
+    reportEvents.onerror = () => {
+        // The browser reconnects with Last-Event-ID on its own; a closed
+        // stream means the server refused it (e.g. no SSE support)
+        if (reportEvents.readyState === EventSource.CLOSED) {
+            reportEvents = null;
+            startPollingFallback();
+        }
+    };
+}
+
+function scheduleNearbyReload() {
+    // Coalesce bursts such as bulk imports into one reload
+    clearTimeout(nearbyReloadTimer);
+    nearbyReloadTimer = setTimeout(loadNearbyNews, 250);
+}
+
+function startPollingFallback() {
+    if (pollingFallback) return;
+    pollingFallback = true;
+    setInterval(loadReportsCount, 30000);
+    setInterval(loadNearbyNews, 120000);
+}
+
 // Load nearby news based on user location
 async function loadNearbyNews() {
     if (!userLocation) return;
@@ -687,19 +756,20 @@ async function loadNearbyNews() {
     const radius = document.getElementById('radiusSelect')?.value || 10;
     const nearbyNewsGrid = document.getElementById('nearbyNewsGrid');
     
+    // Follow location and radius changes with the event subscription
+    if (window.EventSource && !pollingFallback) {
+        subscribeToReportEvents(radius);
+    }
+    
     if (nearbyNewsGrid) {
         try {
-            const response = await fetch('/nearby-news', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    lat: userLocation.lat,
-                    lng: userLocation.lng,
-                    radius: radius
-                })
+            // GET so the browser revalidates repeat polls and gets 304s
+            const params = new URLSearchParams({
+                lat: userLocation.lat,
+                lng: userLocation.lng,
+                radius: radius
             });
+            const response = await fetch(`/nearby-news?${params}`);
             
             const nearbyNews = await response.json();
             displayNearbyNews(nearbyNews);
@@ -797,7 +867,6 @@ function reset3DCardEffect(e) {
 function updateLiveStats() {
     const analyzedCount = document.getElementById('analyzedCount');
     const accuracyRate = document.getElementById('accuracyRate');
-    const reportsCount = document.getElementById('reportsCount');
     
     if (analyzedCount) {
         const current = parseInt(analyzedCount.textContent.replace(/[^0-9]/g, ''));
@@ -811,6 +880,21 @@ function updateLiveStats() {
     }
 }
 
+function loadReportsCount() {
+    const reportsCount = document.getElementById('reportsCount');
+    if (!reportsCount) return;
+    
+    // All-time total comes straight from the server-side rollups
+    fetch('/api/stats?bucket=all')
+        .then(response => response.json())
+        .then(stats => {
+            if (stats.totals) {
+                reportsCount.textContent = stats.totals.reports.toLocaleString();
+            }
+        })
+        .catch(error => console.error('Error loading stats:', error));
+}
+
 // Enhanced chat with typing indicators
 function addTypingIndicator() {
     const chatMessages = document.getElementById('chatMessages');
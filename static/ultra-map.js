@@ -508,10 +508,30 @@ function showNotification(message, type = 'info', duration = 3000) {
 }
 
 function startLiveUpdates() {
-    setInterval(() => {
+    const refresh = () => {
         if (document.getElementById('filtersPanel').classList.contains('active')) return;
         loadUltraNewsData();
-    }, 30000); // Update every 30 seconds
+    };
+    
+    if (!window.EventSource) {
+        setInterval(refresh, 30000); // Update every 30 seconds
+        return;
+    }
+    
+    // Refresh when the server pushes a new report instead of on a timer
+    let refreshTimer = null;
+    const scheduleRefresh = () => {
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(refresh, 250);
+    };
+    const events = new EventSource('/api/events');
+    events.addEventListener('report', scheduleRefresh);
+    events.addEventListener('reset', scheduleRefresh);
+    events.onerror = () => {
+        if (events.readyState === EventSource.CLOSED) {
+            setInterval(refresh, 30000);
+        }
+    };
 }
 
 // FAB functionality
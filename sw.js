@@ -1,23 +1,12 @@
 // Service Worker for Civic Lens Solutions PWA
+// `python assets.py` generates static/dist/sw.js from this file, replacing
+// CACHE_NAME and urlsToCache with the current fingerprinted bundles.
 const CACHE_NAME = 'civic-lens-solutions-v1';
 const urlsToCache = [
   '/',
-  '/index.html',
-  '/chatbot.html',
-  '/report.html',
-  '/map.html',
-  '/static/style.css',
-  '/static/style-professional.css',
-  '/static/style-enhanced.css',
-  '/static/style-boost.css',
-  '/static/style-2025.css',
-  '/static/style-3d-chatbot.css',
-  '/static/script.js',
-  '/static/mobile-2025.js',
-  '/static/chatbot-3d.js',
-  'https://i.ibb.co/DP6QRJLS/Untitled-design-29.png',
-  'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
-  'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap'
+  '/map',
+  '/report',
+  '/chatbot'
 ];
 
 // Install event
@@ -28,21 +17,37 @@ self.addEventListener('install', function(event) {
         console.log('Opened cache');
         return cache.addAll(urlsToCache);
       })
+      .then(function() {
+        // A new build replaces the old worker without waiting for tabs to close
+        return self.skipWaiting();
+      })
   );
 });
 
 // Fetch event
 self.addEventListener('fetch', function(event) {
+  if (event.request.method !== 'GET') {
+    return;
+  }
+  const url = new URL(event.request.url);
+
+  // Fingerprinted bundles never change: serve from cache when present
+  if (url.pathname.startsWith('/static/dist/')) {
+    event.respondWith(
+      caches.match(event.request)
+        .then(function(response) {
+          return response || fetch(event.request);
+        })
+    );
+    return;
+  }
+
+  // Pages and everything else: network first, cached copy when offline
   event.respondWith(
-    caches.match(event.request)
-      .then(function(response) {
-        // Return cached version or fetch from network
-        if (response) {
-          return response;
-        }
-        return fetch(event.request);
-      }
-    )
+    fetch(event.request)
+      .catch(function() {
+        return caches.match(event.request);
+      })
   );
 });
 
@@ -57,6 +62,8 @@ self.addEventListener('activate', function(event) {
           }
         })
       );
+    }).then(function() {
+      return self.clients.claim();
     })
   );
 });
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import time
+
+from analysis_jobs import JobQueue, create_job_queue
+
+
+def make_queue(tmp_path, handlers, **options):
+    db_path = str(tmp_path / 'jobs.db')
+    conn = sqlite3.connect(db_path)
+    create_job_queue(conn.cursor())
+    conn.commit()
+    conn.close()
+    return JobQueue(db_path, handlers, **options)
+
+
+def lease_expires(queue, job_id):
+    conn = sqlite3.connect(queue.db_path)
+    try:
+        return conn.execute('SELECT lease_expires FROM analysis_jobs WHERE id = ?', (job_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_stale_attempt_does_not_overwrite_newer_one(tmp_path):
+    queue = make_queue(tmp_path, {'echo': lambda payload: payload})
+    conn = queue._connect()
+    conn.execute('''
+        INSERT INTO analysis_jobs (id, kind, lane, payload, max_attempts, created_at, run_after)
+        VALUES ('job', 'echo', 'interactive', '{"n": 1}', 3, 0, 0)
+    ''')
+    conn.commit()
+    first = queue.claim(conn)
+    # The first worker stalled past its lease; the job was requeued and claimed again
+    conn.execute("UPDATE analysis_jobs SET status = 'queued', lease_expires = NULL WHERE id = 'job'")
+    conn.commit()
+    second = queue.claim(conn)
+    assert (first[4], second[4]) == (1, 2)
+
+    queue._execute(conn, *first)
+    job = queue.get('job')
+    assert (job['status'], job['attempts'], job['result']) == ('running', 2, None)
+    assert queue.metrics()['interactive']['succeeded_total'] == 0
+
+    queue._execute(conn, *second)
+    assert queue.get('job')['status'] == 'succeeded'
+    conn.close()
+
+
+def test_lease_is_renewed_while_handler_runs(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(payload):
+        started.set()
+        release.wait(5)
+        return 'done'
+
+    queue = make_queue(tmp_path, {'slow': slow}, workers=1, lease_seconds=0.3, poll_interval=0.05)
+    try:
+        job_id = queue.submit('slow', {})
+        assert started.wait(5)
+        first = lease_expires(queue, job_id)
+        time.sleep(0.5)
+        assert lease_expires(queue, job_id) > first
+        release.set()
+        deadline = time.monotonic() + 5
+        while queue.get(job_id)['status'] != 'succeeded' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        job = queue.get(job_id)
+        assert (job['status'], job['attempts'], job['result']) == ('succeeded', 1, 'done')
+    finally:
+        release.set()
+        queue.stop()
@@ -0,0 +1,54 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+pytest.importorskip('gunicorn')
+pytest.importorskip('uvicorn')
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize('mode', ['asgi', 'wsgi'])
+def test_serve_boots_and_answers(tmp_path, mode):
+    port = free_port()
+    env = dict(os.environ, SERVER_MODE=mode, PORT=str(port), WEB_CONCURRENCY='1', WEB_THREADS='4',
+               METRICS_DIR=str(tmp_path / 'metrics'), PYTHONPATH=ROOT)
+    env.pop('METRICS_TOKEN', None)
+    # From a scratch directory, so the server's databases and lock files land there
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py')], cwd=tmp_path, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        base = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 60
+        while True:
+            assert server.poll() is None, server.stdout.read()
+            try:
+                home = requests.get(f'{base}/', timeout=5)
+                break
+            except requests.ConnectionError:
+                assert time.monotonic() < deadline, 'server did not start within 60s'
+                time.sleep(0.5)
+        assert home.status_code == 200
+
+        metrics = requests.get(f'{base}/metrics', timeout=5)
+        assert metrics.status_code == 200
+        assert 'http_request_duration_seconds' in metrics.text
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
@@ -0,0 +1,122 @@
+import queue
+import sqlite3
+import threading
+
+import pytest
+
+from write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'write_behind.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT NOT NULL)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def insert(value):
+    def write(cursor):
+        cursor.execute('INSERT INTO items (value) VALUES (?)', (value,))
+        return cursor.lastrowid
+    return write
+
+
+def stored_values(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute('SELECT value FROM items ORDER BY id')]
+    finally:
+        conn.close()
+
+
+def test_failed_write_does_not_sink_its_batch(db_path):
+    # A long flush interval puts all three writes in one transaction
+    writer = WriteBehindQueue(db_path, flush_interval=0.5, batch_size=3)
+    good = writer.submit(insert('first'))
+    bad = writer.submit(insert(None))
+    last = writer.submit(insert('last'))
+
+    assert good.result(timeout=5) > 0
+    assert last.result(timeout=5) > 0
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=5)
+    assert stored_values(db_path) == ['first', 'last']
+
+    stats = writer.metrics()
+    assert stats['written_total'] == 2
+    assert stats['failed_total'] == 1
+    assert stats['flushes_total'] == 1
+    writer.stop()
+
+
+def test_stop_flushes_queued_writes(db_path):
+    writer = WriteBehindQueue(db_path, flush_interval=10, batch_size=1000)
+    futures = [writer.submit(insert(f'value-{i}')) for i in range(50)]
+    writer.stop()
+
+    assert all(future.done() for future in futures)
+    assert len(stored_values(db_path)) == 50
+
+
+def test_submit_after_stop_writes_synchronously(db_path):
+    writer = WriteBehindQueue(db_path)
+    writer.stop()
+
+    future = writer.submit(insert('late'))
+    assert future.done()
+    assert future.result() > 0
+    assert stored_values(db_path) == ['late']
+
+
+def test_full_queue_raises_and_counts_rejection(db_path):
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_write(cursor):
+        started.set()
+        release.wait(5)
+        return insert('blocked')(cursor)
+
+    writer = WriteBehindQueue(db_path, flush_interval=0, batch_size=1, max_queue=1, enqueue_timeout=0.05)
+    first = writer.submit(blocking_write)
+    assert started.wait(5)
+    # The writer thread is busy, so the single slot fills up
+    queued = writer.submit(insert('queued'))
+    with pytest.raises(queue.Full):
+        writer.submit(insert('rejected'))
+    assert writer.metrics()['rejected_total'] == 1
+
+    release.set()
+    first.result(timeout=5)
+    queued.result(timeout=5)
+    writer.stop()
+    assert stored_values(db_path) == ['blocked', 'queued']
+
+
+
+def test_submit_racing_stop_is_written(db_path):
+    writer = WriteBehindQueue(db_path, flush_interval=0.01)
+    writer.submit(insert('first')).result(timeout=5)
+    entered = threading.Event()
+    put = writer._queue.put
+
+    def slow_put(item, **kwargs):
+        # The submit has seen the queue open but not yet enqueued
+        entered.set()
+        threading.Event().wait(0.2)
+        put(item, **kwargs)
+
+    writer._queue.put = slow_put
+    futures = []
+    submitter = threading.Thread(target=lambda: futures.append(writer.submit(insert('racing'))))
+    submitter.start()
+    assert entered.wait(5)
+    writer._queue.put = put
+    writer.stop()
+    submitter.join()
+
+    assert futures[0].result(timeout=2) > 0
+    assert stored_values(db_path) == ['first', 'racing']
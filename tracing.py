@@ -0,0 +1,358 @@
+"""
+Lightweight request tracing: nested spans kept in memory, optional OTLP file
+
+init_tracing(app) opens a root span for every request (joining the
+caller's trace when a W3C `traceparent` header is sent) and closes it with
+the response status. Inside a request, `with span(name, **attributes)`
+records a child of whatever span is open; metrics.timed() opens one for
+every upstream call, SQLite statement, scorer and parse it times. Outside
+a request span() does nothing, so background jobs cost nothing.
+
+The current span lives in a context variable, so spans follow the request
+through async views. A thread pool has to run work in a copy of the
+caller's context (contextvars.copy_context().run), as asgi.run_blocking
+does.
+
+Finished traces go into a ring buffer of the last TRACE_BUFFER_SIZE
+traces, served by GET /api/traces (summaries, slowest first) and GET
+/api/traces/<trace_id> (the span tree and its critical path; add
+?format=text for an indented waterfall). Both need a Bearer TRACE_TOKEN,
+and are closed while it is unset. With TRACE_EXPORT_PATH set, each
+trace is also appended there as one line of OTLP/JSON, the format the
+OpenTelemetry Collector's otlpjsonfile receiver reads. No collector needs to
+run while the app serves.
+"""
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import Response, before_render_template, g, jsonify, request, template_rendered
+
+BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', 200))
+MAX_SPANS = 1000
+SERVICE_NAME = 'civic-lens'
+
+_current = contextvars.ContextVar('current_span', default=None)
+_finished = deque(maxlen=BUFFER_SIZE)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """Spans of one request; spans beyond MAX_SPANS are counted, not kept"""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, span):
+        # list.append is atomic, so threads of one request can share a trace
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+
+class Span:
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+
+class _NoSpan:
+    """Stand-in yielded outside a trace, so callers can always call set()"""
+
+    def set(self, key, value):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Child span of the current one; a no-op outside a traced request"""
+    parent = _current.get()
+    if parent is None:
+        yield NO_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    parent.trace.add(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.status = 'error'
+        child.set('error', type(e).__name__)
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+
+
+def current_span():
+    """The open span, or NO_SPAN outside a traced request"""
+    return _current.get() or NO_SPAN
+
+
+def _parse_traceparent(header):
+    # version-traceid-parentid-flags, e.g. 00-4bf9...-00f0...-01
+    match = re.fullmatch(r'[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}', (header or '').strip())
+    if match and match.group(1) != '0' * 32:
+        return match.group(1), match.group(2)
+    return None, None
+
+
+def start_trace(name, attributes=None, traceparent=None):
+    """Open a root span and make it current; returns (span, reset token)"""
+    trace_id, parent_id = _parse_traceparent(traceparent)
+    trace = Trace(trace_id or os.urandom(16).hex())
+    root = Span(trace, name, parent_id, attributes)
+    trace.add(root)
+    return root, _current.set(root)
+
+
+def finish_trace(root, token):
+    root.end()
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Opened in another context, e.g. a request whose hooks ran on two threads
+        _current.set(None)
+    _finished.append(root)
+    path = os.environ.get('TRACE_EXPORT_PATH')
+    if path:
+        try:
+            export_otlp(root.trace, path)
+        except OSError as e:
+            print(f"Trace export error: {e}")
+
+
+# --- OTLP/JSON export ---
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(span, root):
+    otlp = {
+        'traceId': span.trace.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        # SERVER for the request span, INTERNAL for the rest
+        'kind': 2 if span is root else 1,
+        'startTimeUnixNano': str(int(span.start * 1e9)),
+        'endTimeUnixNano': str(int((span.start + (span.duration or 0)) * 1e9)),
+        'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+        'status': {'code': 2 if span.status == 'error' else 1}
+    }
+    if span.parent_id:
+        otlp['parentSpanId'] = span.parent_id
+    return otlp
+
+
+def export_otlp(trace, path):
+    """Append one trace as an OTLP/JSON ExportTraceServiceRequest line"""
+    root = trace.spans[0]
+    document = {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}},
+                                    {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}]},
+        'scopeSpans': [{
+            'scope': {'name': SERVICE_NAME},
+            'spans': [_otlp_span(span, root) for span in trace.spans if span.duration is not None]
+        }]
+    }]}
+    line = json.dumps(document, separators=(',', ':')) + '\n'
+    with _export_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+# --- Viewer ---
+
+def summarize(root):
+    return {
+        'trace_id': root.trace.trace_id,
+        'name': root.name,
+        'start': root.start,
+        'duration_ms': round(root.duration * 1000, 3),
+        'status': root.attributes.get('http.status_code'),
+        'span_count': len(root.trace.spans),
+        'dropped_spans': root.trace.dropped
+    }
+
+
+def span_tree(trace):
+    """Nested span dicts under the request span, children in start order"""
+    nodes = {span.span_id: dict(span.to_dict(), children=[]) for span in trace.spans}
+    root = nodes[trace.spans[0].span_id]
+    for span in sorted(trace.spans[1:], key=lambda span: span.start):
+        # Spans whose parent was dropped hang off the request span
+        nodes.get(span.parent_id, root)['children'].append(nodes[span.span_id])
+    return root
+
+
+def critical_path(node):
+    """Span names from the root down, following the child that finished last
+
+    The last child to finish is the one the parent was waiting on, so this
+    is the chain whose latency the request's latency is made of.
+    """
+    path = []
+    while node is not None:
+        path.append({'name': node['name'], 'duration_ms': node.get('duration_ms'),
+                     'attributes': node.get('attributes', {})})
+        finished = [child for child in node['children'] if child['duration_ms'] is not None]
+        node = max(finished, key=lambda child: child['start'] + child['duration_ms'] / 1000, default=None)
+    return path
+
+
+def waterfall(node, origin=None, depth=0):
+    """Indented text view: offset, duration, name and attributes per span"""
+    origin = node['start'] if origin is None else origin
+    duration = f"{node['duration_ms']:.1f}ms" if node['duration_ms'] is not None else 'open'
+    attributes = ' '.join(f'{key}={value}' for key, value in node['attributes'].items())
+    line = f"{(node['start'] - origin) * 1000:8.1f}ms {duration:>10}  {'  ' * depth}{node['name']}"
+    if node['status'] == 'error':
+        line += ' [error]'
+    lines = [f'{line}  {attributes}'.rstrip()]
+    for child in node['children']:
+        lines.extend(waterfall(child, origin, depth + 1))
+    return lines
+
+
+def _authorized():
+    # Traces carry URLs, queries and timings; without a token nobody reads them
+    token = os.environ.get('TRACE_TOKEN')
+    return bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+
+
+def init_tracing(app):
+    """Trace every request (at TRACE_SAMPLE_RATE) and serve GET /api/traces"""
+
+    @app.before_request
+    def open_request_span():
+        # Looking at traces should not push them out of the buffer
+        if request.endpoint in ('list_traces', 'get_trace'):
+            return
+        if random.random() >= float(os.environ.get('TRACE_SAMPLE_RATE', 1.0)):
+            return
+        g.trace = start_trace(f'{request.method} {request.url_rule.rule if request.url_rule else "unmatched"}', {
+            'http.method': request.method,
+            'http.target': request.full_path.rstrip('?')
+        }, request.headers.get('traceparent'))
+
+    @app.after_request
+    def close_request_span(response):
+        opened = g.pop('trace', None)
+        if opened is not None:
+            root, token = opened
+            close_failed_renders()
+            root.set('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                root.status = 'error'
+            finish_trace(root, token)
+            response.headers['traceparent'] = f'00-{root.trace.trace_id}-{root.span_id}-01'
+        return response
+
+    @app.teardown_request
+    def close_failed_request_span(error=None):
+        # after_request is skipped when building the response itself failed
+        opened = g.pop('trace', None)
+        if opened is not None:
+            close_failed_renders()
+            opened[0].status = 'error'
+            finish_trace(*opened)
+
+    # Template rendering as "render <template>" spans. There is no signal
+    # for a failed render, so spans still open at the end are failures.
+    def open_render_span(sender, template, context, **extra):
+        parent = _current.get()
+        if parent is not None:
+            child = Span(parent.trace, f"render {template.name or 'string'}", parent.span_id)
+            parent.trace.add(child)
+            g.setdefault('render_spans', []).append(child)
+
+    def close_render_span(sender, template, context, **extra):
+        opened = g.get('render_spans')
+        if opened:
+            opened.pop().end()
+
+    def close_failed_renders():
+        for child in g.pop('render_spans', []):
+            child.status = 'error'
+            child.end()
+
+    # Strong references: blinker would otherwise drop these local functions
+    before_render_template.connect(open_render_span, app, weak=False)
+    template_rendered.connect(close_render_span, app, weak=False)
+
+    @app.route('/api/traces')
+    def list_traces():
+        """Recent traces, slowest first; filter with min_ms and name"""
+        if not _authorized():
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        try:
+            min_ms = float(request.args.get('min_ms', 0))
+            limit = max(1, min(BUFFER_SIZE, int(request.args.get('limit', 50))))
+        except ValueError:
+            return jsonify({'error': 'min_ms and limit must be numbers'}), 400
+        name = request.args.get('name')
+        traces = [summarize(root) for root in list(_finished)
+                  if root.duration * 1000 >= min_ms and (not name or name in root.name)]
+        traces.sort(key=lambda summary: summary['duration_ms'], reverse=True)
+        response = jsonify({'traces': traces[:limit], 'buffered': len(_finished)})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.route('/api/traces/<trace_id>')
+    def get_trace(trace_id):
+        """One trace's span tree and critical path"""
+        if not _authorized():
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        root = next((root for root in list(_finished) if root.trace.trace_id == trace_id), None)
+        if root is None:
+            return jsonify({'error': 'Trace not found (it may have left the buffer)'}), 404
+        tree = span_tree(root.trace)
+        if request.args.get('format') == 'text':
+            response = Response('\n'.join(waterfall(tree)) + '\n', mimetype='text/plain')
+        else:
+            response = jsonify(dict(summarize(root), critical_path=critical_path(tree), root=tree))
+        response.headers['Cache-Control'] = 'no-store'
+        return response
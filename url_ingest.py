@@ -0,0 +1,284 @@
+"""
+Readable text of pasted links, fetched once and shared through the cache
+
+UrlIngester turns a URL into {'url', 'final_url', 'title', 'text'}:
+
+- URLs are canonicalized (scheme and host lowercased, default port,
+  fragment and tracking parameters such as utm_* dropped, query sorted), so
+  the variants of a shared link are one cache entry.
+- Fetches run on a pool of `concurrency` threads sharing one pooled
+  requests session. A burst of links waits for a free thread instead of
+  opening a connection each, and a link already being fetched in this
+  process is not fetched again.
+- Each fetch has a connect/read timeout and an overall deadline. A
+  declared Content-Length above max_bytes is refused, and other bodies are
+  cut at max_bytes. Only HTML and plain text are read.
+- Only public addresses are fetched, checked again after every redirect,
+  so a pasted link cannot reach the host's own or internal services.
+- Pages are stored in the SharedCache 'url' namespace for `ttl` seconds.
+  For `fresh_for` seconds they are served without a request. After that
+  they are revalidated with If-None-Match and If-Modified-Since, and a 304
+  keeps the stored text.
+
+Main text is extracted with html_parser.extract_article_text. Failures
+return None and are never cached, so the caller analyzes what it has.
+"""
+import ipaddress
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from html_parser import extract_article_text
+from metrics import timed
+from shared_cache import cache_key
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"\'`]+', re.IGNORECASE)
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|ref_src)$', re.IGNORECASE)
+TEXT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 65536
+USER_AGENT = 'CivicLens/1.0 (news credibility checks)'
+
+
+class FetchError(Exception):
+    """A link that could not be turned into text; `reason` labels the metric"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def find_urls(text, limit=3):
+    """The first `limit` distinct http(s) links in free text"""
+    urls = []
+    for match in URL_PATTERN.finditer(text or ''):
+        # Sentence punctuation and closing brackets are rarely part of a link
+        url = match.group(0).rstrip('.,;:!?)]}')
+        if url not in urls:
+            urls.append(url)
+        if len(urls) >= limit:
+            break
+    return urls
+
+
+def canonical_url(url):
+    """Normalized http(s) URL, or None when it is not one"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if ':' in host:
+        host = f'[{host}]'
+    if port is not None and port != {'http': 80, 'https': 443}[scheme]:
+        host = f'{host}:{port}'
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(key)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def is_public_host(host, port):
+    """True when every address `host` resolves to is publicly routable"""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return False
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return False
+    return bool(infos)
+
+
+class UrlIngester:
+    """Bounded, pooled fetching of link text through a revalidating cache"""
+
+    def __init__(self, cache, concurrency=8, timeout=10.0, max_bytes=2 * 1024 * 1024,
+                 max_chars=20000, fresh_for=600, ttl=86400, allow_private=False):
+        self.cache = cache
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.fresh_for = fresh_for
+        self.ttl = ttl
+        self.allow_private = allow_private
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._pool = ThreadPoolExecutor(concurrency, thread_name_prefix='url-fetch')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'fresh_total': 0, 'fetched_total': 0, 'not_modified_total': 0, 'errors_total': {}}
+
+    def fetch(self, url):
+        """Page dict for one link, or None"""
+        return self.fetch_many([url])[0]
+
+    def fetch_many(self, urls):
+        """Page dicts (or None) in the order of `urls`, fetched concurrently
+
+        Waits at most twice the fetch timeout; a fetch still queued or
+        running then finishes in the background and fills the cache.
+        """
+        futures = [self._submit(url) for url in urls]
+        pages = []
+        deadline = time.monotonic() + 2 * self.timeout
+        for future in futures:
+            if future is None:
+                pages.append(None)
+                continue
+            try:
+                pages.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                self._count_error('timeout')
+                pages.append(None)
+        return pages
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats, errors_total=dict(self._stats['errors_total']))
+        stats['in_flight'] = len(self._inflight)
+        return stats
+
+    def _submit(self, url):
+        canonical = canonical_url(url)
+        if canonical is None:
+            return None
+        with self._lock:
+            # Everyone asking for a link that is already being fetched shares the fetch
+            future = self._inflight.get(canonical)
+            if future is None:
+                future = self._inflight[canonical] = self._pool.submit(self._ingest, canonical)
+                future.add_done_callback(lambda _: self._forget(canonical))
+        return future
+
+    def _forget(self, canonical):
+        with self._lock:
+            self._inflight.pop(canonical, None)
+
+    def _ingest(self, canonical):
+        key = cache_key(canonical)
+        try:
+            cached = self.cache.get('url', key)
+        except Exception as e:
+            print(f"URL cache read error: {e}")
+            cached = None
+        if cached is not None and time.time() - cached['fetched_at'] < self.fresh_for:
+            self._count('fresh_total')
+            return cached
+
+        try:
+            page = self._fetch(canonical, cached)
+        except FetchError as e:
+            print(f"URL fetch error for {canonical}: {e}")
+            self._count_error(e.reason)
+            # A stale copy beats nothing when the site is down
+            return cached
+        except Exception as e:
+            print(f"URL fetch error for {canonical}: {e}")
+            self._count_error('error')
+            return cached
+
+        try:
+            self.cache.set('url', key, page, self.ttl)
+        except Exception as e:
+            print(f"URL cache write error: {e}")
+        return page
+
+    def _fetch(self, canonical, cached):
+        headers = {'Accept': 'text/html,application/xhtml+xml,text/plain;q=0.9'}
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        deadline = time.monotonic() + self.timeout
+        url = canonical
+        with timed('upstream_request_duration_seconds', upstream='url_fetch'):
+            for _ in range(MAX_REDIRECTS + 1):
+                parts = urlsplit(url)
+                if parts.scheme not in ('http', 'https') or not parts.hostname:
+                    raise FetchError('blocked', f'not an http(s) URL: {url}')
+                if not self.allow_private and not is_public_host(
+                        parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)):
+                    raise FetchError('blocked', f'{parts.hostname} is not a public address')
+                response = self._session.get(url, headers=headers, stream=True, allow_redirects=False,
+                                             timeout=(min(3.05, self.timeout), self.timeout))
+                if response.status_code in REDIRECT_STATUSES and response.headers.get('Location'):
+                    response.close()
+                    url = urljoin(url, response.headers['Location'])
+                    continue
+                break
+            else:
+                raise FetchError('redirects', f'more than {MAX_REDIRECTS} redirects')
+
+            with response:
+                if response.status_code == 304 and cached is not None:
+                    self._count('not_modified_total')
+                    return dict(cached, fetched_at=time.time())
+                if response.status_code != 200:
+                    raise FetchError('status', f'HTTP {response.status_code}')
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and content_type not in TEXT_TYPES:
+                    raise FetchError('content_type', f'unsupported content type {content_type}')
+                if int(response.headers.get('Content-Length') or 0) > self.max_bytes:
+                    raise FetchError('too_large', f"{response.headers['Content-Length']} bytes")
+                body = self._read(response, deadline)
+
+        with timed('html_parse_duration_seconds', source='url'):
+            if content_type == 'text/plain':
+                title, text = '', body.decode(response.encoding or 'utf-8', errors='replace').strip()
+            else:
+                # Without a charset header, BeautifulSoup reads the page's <meta charset>
+                charset = 'charset=' in response.headers.get('Content-Type', '').lower()
+                title, text = extract_article_text(
+                    body.decode(response.encoding, errors='replace') if charset else body)
+
+        self._count('fetched_total')
+        return {
+            'url': canonical,
+            'final_url': url,
+            'title': title,
+            'text': text[:self.max_chars],
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+
+    def _read(self, response, deadline):
+        """Body up to max_bytes, abandoned when the deadline passes"""
+        chunks, size = [], 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if time.monotonic() > deadline:
+                raise FetchError('timeout', f'body not read within {self.timeout}s')
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                break
+        return b''.join(chunks)[:self.max_bytes]
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def _count_error(self, reason):
+        with self._lock:
+            errors = self._stats['errors_total']
+            errors[reason] = errors.get(reason, 0) + 1
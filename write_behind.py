@@ -0,0 +1,198 @@
+"""
+Write-behind queue that batches SQLite inserts off the request thread
+
+Request handlers submit small write callables; a single background thread
+drains the queue and runs them together in one transaction, flushing every
+`flush_interval` seconds or as soon as `batch_size` writes are waiting.
+One commit (and one fsync) then covers a whole batch instead of every
+request paying for its own.
+
+Writes are acknowledged once they are in the bounded in-process queue. They
+are flushed on interpreter shutdown, but a hard crash can lose up to one
+flush interval of acknowledged writes; callers that need the row id or a
+durability guarantee should wait on the returned future.
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Bounded queue of write callables flushed in batched transactions"""
+
+    def __init__(self, db_path, flush_interval=0.05, batch_size=200, max_queue=10000,
+                 enqueue_timeout=0.5):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        # Signalled when the last in-progress enqueue finishes, for stop()
+        self._enqueued = threading.Condition(self._lock)
+        self._enqueuing = 0
+        self._stats = {
+            'enqueued_total': 0,
+            'written_total': 0,
+            'failed_total': 0,
+            'rejected_total': 0,
+            'flushes_total': 0,
+            'last_batch_size': 0,
+            'last_flush_seconds': 0.0,
+            'max_flush_seconds': 0.0,
+            'flush_seconds_total': 0.0
+        }
+
+    def submit(self, write):
+        """Queue write(cursor) and return a Future for its return value
+
+        Blocks for at most `enqueue_timeout` when the queue is full, then
+        raises queue.Full so the caller can shed load. After shutdown the
+        write runs synchronously instead.
+        """
+        future = Future()
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                # stop() waits for this enqueue, so the write lands before _STOP
+                self._enqueuing += 1
+        if closed:
+            conn = self._connect()
+            self._write_batch(conn, [(write, future)])
+            conn.close()
+            return future
+
+        try:
+            self._ensure_started()
+            self._queue.put((write, future), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected_total'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._enqueuing -= 1
+                self._enqueued.notify_all()
+        with self._lock:
+            self._stats['enqueued_total'] += 1
+        return future
+
+    def metrics(self):
+        """Snapshot of queue depth, throughput and flush timings"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        return stats
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the writer thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Submits that saw the queue open finish putting their writes first
+            self._enqueued.wait_for(lambda: self._enqueuing == 0, timeout)
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _connect(self):
+        # Autocommit mode so each batch controls its own transaction
+        return sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write_batch(conn, batch)
+
+        # Writes that raced in behind the stop marker
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            self._write_batch(conn, leftovers)
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        written = 0
+        outcomes = []
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for write, future in batch:
+                # A savepoint per write so one bad row does not sink the batch
+                cursor.execute('SAVEPOINT write_item')
+                try:
+                    outcomes.append((future, write(cursor), None))
+                    cursor.execute('RELEASE write_item')
+                    written += 1
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_item')
+                    cursor.execute('RELEASE write_item')
+                    outcomes.append((future, None, e))
+            cursor.execute('COMMIT')
+        except sqlite3.Error as e:
+            print(f"Write-behind flush error: {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            written = 0
+            outcomes = [(future, None, e) for _, future in batch]
+
+        # Resolve futures only after COMMIT, so a returned id is durable
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['written_total'] += written
+            self._stats['failed_total'] += len(batch) - written
+            self._stats['flushes_total'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_flush_seconds'] = elapsed
+            self._stats['max_flush_seconds'] = max(self._stats['max_flush_seconds'], elapsed)
+            self._stats['flush_seconds_total'] += elapsed